@@ -0,0 +1,227 @@
+"""Time-budgeted solves with best-feasible and minimum-violation fallbacks.
+
+:func:`solve_within` gives a backend a time limit and always returns
+something usable by the deadline:
+
+* ``optimal`` – the backend finished; the gap is zero.
+* ``feasible`` – the limit was hit. The result is the better of the
+  backend's last iterate (if it is feasible) and the greedy heuristic. The
+  gap is measured against a Lagrangian lower bound, tightened by a few
+  subgradient steps from the backend's duals.
+* ``relaxed`` – the problem is infeasible. The result is an elastic
+  relaxation: every row gets a slack, the total relative violation is
+  minimised first, and cost is minimised second at that violation.
+* ``time_limit`` – no feasible point was found in time. The result is the
+  least-violating candidate.
+
+Solutions carry ``gap`` (relative to ``max(1, |objective|)``, ``None`` when
+no finite bound is known) and ``elapsed`` seconds.
+"""
+from dataclasses import replace
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .lp import (
+    FEASIBLE,
+    INFEASIBLE,
+    OPTIMAL,
+    TIME_LIMIT,
+    UNBOUNDED,
+    GreedyBackend,
+    LinearProgram,
+    LPSolution,
+    get_backend,
+)
+
+RELAXED = "relaxed"
+FEASIBILITY_TOLERANCE = 1e-6
+BOUND_ITERATIONS = 30
+
+
+def _project(lp: LinearProgram, y: np.ndarray) -> np.ndarray:
+    """Keep multipliers valid: signs match finite bounds and no column is
+    driven to an infinite bound."""
+    y = np.where(np.isfinite(lp.row_lower), y, np.minimum(y, 0.0))
+    y = np.where(np.isfinite(lp.row_upper), y, np.maximum(y, 0.0))
+    pressure = lp.matrix.T @ y
+    unbounded = np.isinf(lp.upper) & (pressure > lp.cost)
+    if unbounded.any():
+        cost = lp.cost[unbounded]
+        if (cost < 0).any():
+            return np.zeros_like(y)
+        y = y * float(np.min(cost / pressure[unbounded]))
+    return y
+
+
+def lagrangian_bound(lp: LinearProgram, y: np.ndarray) -> Tuple[float, np.ndarray]:
+    """Lower bound on the LP optimum from row multipliers ``y``.
+
+    ``y`` is positive on rows held at their lower bound and negative on rows
+    held at their upper bound, the sign convention of the backends' duals.
+
+    Returns:
+        the bound (``-inf`` when it is unbounded) and the minimising ``x``.
+    """
+    reduced = lp.cost - lp.matrix.T @ y
+    x = np.where(reduced >= 0, lp.lower, lp.upper)
+    if not np.isfinite(x[reduced != 0]).all():
+        return -np.inf, np.where(np.isfinite(x), x, 0.0)
+    x = np.where(np.isfinite(x), x, 0.0)
+    rhs = np.where(y > 0, lp.row_lower, np.where(y < 0, lp.row_upper, 0.0))
+    active = y != 0
+    return float(y[active] @ rhs[active] + reduced @ x), x
+
+
+def dual_bound(
+    lp: LinearProgram,
+    upper_bound: float,
+    duals: Optional[np.ndarray] = None,
+    iterations: int = BOUND_ITERATIONS,
+) -> float:
+    """Best Lagrangian bound from ``duals`` (or zero) after Polyak subgradient
+    steps towards ``upper_bound``."""
+    y = _project(lp, np.zeros(lp.shape[0]) if duals is None else duals)
+    best, x = lagrangian_bound(lp, y)
+    for _ in range(iterations):
+        bound, x = lagrangian_bound(lp, y)
+        best = max(best, bound)
+        if not np.isfinite(bound) or upper_bound - bound <= 1e-9:
+            break
+        activity = lp.matrix @ x
+        up = np.where(np.isfinite(lp.row_lower), lp.row_lower - activity, 0.0)
+        down = np.where(np.isfinite(lp.row_upper), lp.row_upper - activity, 0.0)
+        step = np.where(
+            y > 0,
+            up,
+            np.where(y < 0, down, np.where(up > 0, up, np.minimum(down, 0.0))),
+        )
+        norm = float(step @ step)
+        if norm == 0:
+            break
+        y = _project(lp, y + (upper_bound - bound) / norm * step)
+    return best
+
+
+def elastic_program(lp: LinearProgram) -> Tuple[LinearProgram, np.ndarray]:
+    """``lp`` with a slack per finite row bound, costing relative violation.
+
+    Returns:
+        the elastic program, whose cost is the weighted total violation, and
+        the weight row used to pin that violation in the second phase.
+    """
+    n = lp.shape[1]
+    low = np.flatnonzero(np.isfinite(lp.row_lower))
+    high = np.flatnonzero(np.isfinite(lp.row_upper))
+    rows = lp.shape[0]
+    slack = sparse.hstack(
+        [
+            sparse.csr_matrix(
+                (np.ones(len(low)), (low, np.arange(len(low)))), shape=(rows, len(low))
+            ),
+            sparse.csr_matrix(
+                (-np.ones(len(high)), (high, np.arange(len(high)))),
+                shape=(rows, len(high)),
+            ),
+        ]
+    )
+    weights = np.concatenate(
+        [
+            1.0 / np.maximum(np.abs(lp.row_lower[low]), FEASIBILITY_TOLERANCE),
+            1.0 / np.maximum(np.abs(lp.row_upper[high]), FEASIBILITY_TOLERANCE),
+        ]
+    )
+    k = len(weights)
+    elastic = LinearProgram(
+        cost=np.concatenate([np.zeros(n), weights]),
+        matrix=sparse.hstack([lp.matrix, slack], format="csr"),
+        row_lower=lp.row_lower,
+        row_upper=lp.row_upper,
+        lower=np.concatenate([lp.lower, np.zeros(k)]),
+        upper=np.concatenate([lp.upper, np.full(k, np.inf)]),
+        names=list(lp.names)
+        + [f"short:{lp.row_names[i]}" for i in low]
+        + [f"over:{lp.row_names[i]}" for i in high],
+        row_names=lp.row_names,
+    )
+    return elastic, np.concatenate([np.zeros(n), weights])
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    return max(deadline - time.perf_counter(), 1e-3)
+
+
+def _relax(lp: LinearProgram, backend, deadline: Optional[float]) -> LPSolution:
+    elastic, weights = elastic_program(lp)
+    first = backend.solve(elastic, _remaining(deadline))
+    n = lp.shape[1]
+    if first.status != OPTIMAL:
+        x = first.x[:n]
+        return replace(first, x=x, objective=float(lp.cost @ x), row_duals=None)
+    # Second phase: cheapest plan with no more than the minimum violation.
+    pinned = replace(
+        elastic,
+        cost=np.concatenate([lp.cost, np.zeros(len(weights) - n)]),
+        matrix=sparse.vstack([elastic.matrix, weights[None, :]], format="csr"),
+        row_lower=np.append(elastic.row_lower, -np.inf),
+        row_upper=np.append(
+            elastic.row_upper, first.objective * (1 + 1e-9) + 1e-9
+        ),
+        row_names=elastic.row_names + ["violation"],
+    )
+    second = backend.solve(pinned, _remaining(deadline))
+    chosen = second if second.status == OPTIMAL else first
+    x = chosen.x[:n]
+    return LPSolution(
+        status=RELAXED,
+        x=x,
+        objective=float(lp.cost @ x),
+        backend=chosen.backend,
+        gap=0.0 if chosen is second else None,
+    )
+
+
+def solve_within(
+    lp: LinearProgram,
+    backend: Optional[str] = None,
+    time_limit: Optional[float] = None,
+) -> LPSolution:
+    """Solve ``lp`` within ``time_limit`` seconds (``None``: no limit).
+
+    See the module docstring for the possible statuses; the returned
+    solution always has ``gap`` and ``elapsed`` filled in.
+    """
+    start = time.perf_counter()
+    deadline = None if time_limit is None else start + time_limit
+    solver = get_backend(backend)
+    result = solver.solve(lp, _remaining(deadline))
+    if result.status == OPTIMAL:
+        result = replace(result, gap=0.0)
+    elif result.status == UNBOUNDED:
+        pass
+    elif result.status == INFEASIBLE and solver.name != "greedy":
+        result = _relax(lp, solver, deadline)
+    else:
+        candidates = [result]
+        if solver.name != "greedy":
+            candidates.append(GreedyBackend().solve(lp))
+        feasible = [
+            c for c in candidates if lp.violation(c.x) <= FEASIBILITY_TOLERANCE
+        ]
+        if feasible:
+            best = min(feasible, key=lambda c: float(lp.cost @ c.x))
+            objective = float(lp.cost @ best.x)
+            bound = dual_bound(lp, objective, result.row_duals)
+            gap = None
+            if np.isfinite(bound):
+                gap = max(objective - bound, 0.0) / max(1.0, abs(objective))
+            result = replace(best, status=FEASIBLE, objective=objective, gap=gap)
+        else:
+            best = min(candidates, key=lambda c: lp.violation(c.x))
+            status = TIME_LIMIT if result.status == TIME_LIMIT else best.status
+            result = replace(best, status=status, objective=float(lp.cost @ best.x))
+    return replace(result, elapsed=time.perf_counter() - start)
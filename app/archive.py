@@ -0,0 +1,382 @@
+"""Columnar archive tier for old water readings.
+
+Readings older than the retention age are moved out of ``water_readings`` into
+one segment directory per month. Each segment stores its columns as ``.npy``
+files sorted by timestamp, with the ``parameter`` and ``location`` strings
+dictionary-encoded into small integer codes. Segments are opened with
+``mmap_mode="r"`` so queries slice the files in place without copying them
+into memory.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import json
+import os
+from pathlib import Path
+import shutil
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func
+from sqlmodel import Session, select
+
+from .models import EventLog, WaterReading
+
+ARCHIVE_DIR = Path(os.getenv("READING_ARCHIVE_DIR", "data/archive"))
+RETENTION_DAYS = int(os.getenv("READING_RETENTION_DAYS", "90"))
+
+# (reading_id, timestamp, value, parameter, location)
+Row = Tuple[int, datetime, float, str, Optional[str]]
+
+COLUMNS = ("reading_id", "timestamp", "value", "parameter", "location", "breach")
+_CHUNK = 50_000
+
+
+def _to_micros(timestamps: Iterable[datetime]) -> np.ndarray:
+    return np.array(list(timestamps), dtype="datetime64[us]").astype(np.int64)
+
+
+def _micros(ts: datetime) -> int:
+    return int(np.datetime64(ts, "us").astype(np.int64))
+
+
+def _from_micros(value: int) -> datetime:
+    return np.datetime64(int(value), "us").astype(datetime)
+
+
+@dataclass
+class Segment:
+    """Memory-mapped columns of one archived month."""
+
+    month: str
+    columns: Dict[str, np.ndarray]
+    parameters: List[str]
+    locations: List[Optional[str]]
+
+    def __len__(self) -> int:
+        return len(self.columns["reading_id"])
+
+    def select(
+        self,
+        parameter: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> np.ndarray:
+        """Row indices matching the filters, in timestamp order."""
+        ts = self.columns["timestamp"]
+        lo = 0 if start is None else int(np.searchsorted(ts, _micros(start), "left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, _micros(end), "right"))
+        rows = np.arange(lo, hi)
+        if parameter is not None:
+            if parameter not in self.parameters:
+                return rows[:0]
+            code = self.parameters.index(parameter)
+            rows = rows[self.columns["parameter"][lo:hi] == code]
+        return rows
+
+    def rows(self, indices: np.ndarray) -> List[Dict]:
+        """Materialise the given rows as dicts shaped like ``/readings`` output."""
+        cols = self.columns
+        return [
+            {
+                "reading_id": int(cols["reading_id"][i]),
+                "parameter": self.parameters[cols["parameter"][i]],
+                "value": float(cols["value"][i]),
+                "timestamp": _from_micros(cols["timestamp"][i]),
+                "location": self.locations[cols["location"][i]],
+                "breach": bool(cols["breach"][i]),
+            }
+            for i in indices
+        ]
+
+
+class ReadingArchive:
+    """Per-month columnar segments stored under ``directory``."""
+
+    def __init__(self, directory: Path = ARCHIVE_DIR) -> None:
+        self.directory = Path(directory)
+
+    def months(self) -> List[str]:
+        """Archived months (``YYYY-MM``) in chronological order."""
+        if not self.directory.exists():
+            return []
+        return sorted(
+            p.name for p in self.directory.iterdir() if (p / "meta.json").exists()
+        )
+
+    def segment(self, month: str) -> Segment:
+        path = self.directory / month
+        meta = json.loads((path / "meta.json").read_text())
+        columns = {
+            name: np.load(path / f"{name}.npy", mmap_mode="r") for name in COLUMNS
+        }
+        return Segment(month, columns, meta["parameters"], meta["locations"])
+
+    def newest(self) -> Optional[datetime]:
+        """Timestamp of the most recent archived reading, if any."""
+        months = self.months()
+        if not months:
+            return None
+        timestamps = self.segment(months[-1]).columns["timestamp"]
+        return _from_micros(timestamps[-1]) if len(timestamps) else None
+
+    def _segments(
+        self, start: Optional[datetime], end: Optional[datetime], newest_first: bool
+    ) -> Iterable[Segment]:
+        months = self.months()
+        if start is not None:
+            months = [m for m in months if m >= start.strftime("%Y-%m")]
+        if end is not None:
+            months = [m for m in months if m <= end.strftime("%Y-%m")]
+        if newest_first:
+            months.reverse()
+        for month in months:
+            yield self.segment(month)
+
+    def latest(
+        self,
+        parameter: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 100,
+    ) -> List[Dict]:
+        """Up to ``limit`` archived readings, newest first."""
+        results: List[Dict] = []
+        for segment in self._segments(start, end, newest_first=True):
+            remaining = limit - len(results)
+            if remaining <= 0:
+                break
+            indices = segment.select(parameter, start, end)[::-1][:remaining]
+            results.extend(segment.rows(indices))
+        return results
+
+    def scan(
+        self,
+        parameter: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterable[Dict]:
+        """Yield archived readings oldest first, one segment at a time."""
+        for segment in self._segments(start, end, newest_first=False):
+            indices = segment.select(parameter, start, end)
+            for offset in range(0, len(indices), _CHUNK):
+                yield from segment.rows(indices[offset : offset + _CHUNK])
+
+    def aggregate(
+        self,
+        parameter: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Dict[str, Dict[str, float]]:
+        """Count, sum, min and max of archived values per parameter."""
+        stats: Dict[str, Dict[str, float]] = {}
+        for segment in self._segments(start, end, newest_first=False):
+            indices = segment.select(parameter, start, end)
+            if not len(indices):
+                continue
+            codes = segment.columns["parameter"][indices]
+            values = segment.columns["value"][indices]
+            for code in np.unique(codes):
+                v = values[codes == code]
+                _merge_stats(
+                    stats,
+                    segment.parameters[int(code)],
+                    len(v),
+                    float(v.sum()),
+                    float(v.min()),
+                    float(v.max()),
+                )
+        return stats
+
+    def archive(self, session: Session, cutoff: datetime) -> int:
+        """Move readings older than ``cutoff`` into segments and delete them.
+
+        Segments are written (and merged with any existing segment for the same
+        month) before the rows are removed, so an interrupted run leaves the
+        readings in the table and the next run simply merges them again.
+        """
+        stmt = (
+            select(
+                WaterReading.reading_id,
+                WaterReading.timestamp,
+                WaterReading.value,
+                WaterReading.parameter,
+                WaterReading.location,
+            )
+            .where(WaterReading.timestamp < cutoff)
+            .order_by(WaterReading.reading_id)
+        )
+        by_month: Dict[str, List[Row]] = {}
+        max_id = 0
+        for row in session.exec(stmt.execution_options(yield_per=_CHUNK)):
+            by_month.setdefault(row[1].strftime("%Y-%m"), []).append(tuple(row))
+            max_id = max(max_id, row[0])
+        if not by_month:
+            return 0
+
+        count = 0
+        for month, rows in by_month.items():
+            breached = self._breached(session, [r[0] for r in rows])
+            self._write(month, rows, breached)
+            count += len(rows)
+
+        session.exec(
+            delete(WaterReading).where(
+                WaterReading.timestamp < cutoff, WaterReading.reading_id <= max_id
+            )
+        )
+        session.commit()
+        return count
+
+    @staticmethod
+    def _breached(session: Session, ids: List[int]) -> set:
+        breached = set()
+        for offset in range(0, len(ids), 900):
+            chunk = ids[offset : offset + 900]
+            breached.update(
+                session.exec(
+                    select(EventLog.reading_id).where(EventLog.reading_id.in_(chunk))
+                ).all()
+            )
+        return breached
+
+    def _write(self, month: str, rows: List[Row], breached: set) -> None:
+        parameters: List[str] = []
+        locations: List[Optional[str]] = []
+        existing: Optional[Segment] = None
+        if (self.directory / month / "meta.json").exists():
+            existing = self.segment(month)
+            parameters = list(existing.parameters)
+            locations = list(existing.locations)
+
+        def code(values: List, item) -> int:
+            if item not in values:
+                values.append(item)
+            return values.index(item)
+
+        reading_ids, timestamps, values, params, locs = zip(*rows)
+        new = {
+            "reading_id": np.array(reading_ids, dtype=np.int64),
+            "timestamp": _to_micros(timestamps),
+            "value": np.array(values, dtype=np.float64),
+            "parameter": np.array([code(parameters, p) for p in params], dtype=np.int32),
+            "location": np.array([code(locations, loc) for loc in locs], dtype=np.int32),
+            "breach": np.array([i in breached for i in reading_ids], dtype=bool),
+        }
+        if existing is not None:
+            new = {
+                name: np.concatenate([np.asarray(existing.columns[name]), new[name]])
+                for name in COLUMNS
+            }
+            del existing
+        _, unique = np.unique(new["reading_id"], return_index=True)
+        order = unique[np.argsort(new["timestamp"][unique], kind="stable")]
+
+        tmp = self.directory / f".{month}.tmp"
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir(parents=True)
+        for name in COLUMNS:
+            np.save(tmp / f"{name}.npy", new[name][order])
+        (tmp / "meta.json").write_text(
+            json.dumps(
+                {"parameters": parameters, "locations": locations, "rows": len(order)}
+            )
+        )
+        target = self.directory / month
+        if target.exists():
+            old = self.directory / f".{month}.old"
+            target.rename(old)
+            tmp.rename(target)
+            shutil.rmtree(old)
+        else:
+            tmp.rename(target)
+
+
+def _merge_stats(
+    stats: Dict[str, Dict[str, float]],
+    parameter: str,
+    count: int,
+    total: float,
+    minimum: float,
+    maximum: float,
+) -> None:
+    current = stats.get(parameter)
+    if current is None:
+        stats[parameter] = {
+            "count": count,
+            "sum": total,
+            "min": minimum,
+            "max": maximum,
+        }
+        return
+    current["count"] += count
+    current["sum"] += total
+    current["min"] = min(current["min"], minimum)
+    current["max"] = max(current["max"], maximum)
+
+
+def merge_latest(
+    recent: List[Dict], archived: List[Dict], limit: int
+) -> List[Dict]:
+    """Combine newest-first rows from the table and the archive."""
+    merged = sorted(recent + archived, key=lambda r: r["timestamp"], reverse=True)
+    return merged[:limit]
+
+
+def aggregate_readings(
+    session: Session,
+    archive: ReadingArchive,
+    parameter: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Dict[str, Dict[str, float]]:
+    """Per-parameter count/min/max/mean over both the table and the archive."""
+    stmt = select(
+        WaterReading.parameter,
+        func.count(WaterReading.reading_id),
+        func.sum(WaterReading.value),
+        func.min(WaterReading.value),
+        func.max(WaterReading.value),
+    ).group_by(WaterReading.parameter)
+    if parameter:
+        stmt = stmt.where(WaterReading.parameter == parameter)
+    if start:
+        stmt = stmt.where(WaterReading.timestamp >= start)
+    if end:
+        stmt = stmt.where(WaterReading.timestamp <= end)
+
+    stats = archive.aggregate(parameter, start, end)
+    for name, count, total, minimum, maximum in session.exec(stmt):
+        _merge_stats(stats, name, count, total, minimum, maximum)
+    return {
+        name: {
+            "count": s["count"],
+            "min": s["min"],
+            "max": s["max"],
+            "mean": s["sum"] / s["count"],
+        }
+        for name, s in sorted(stats.items())
+    }
+
+
+def _cli(days: int, directory: Path) -> None:
+    """Archive readings older than ``days`` days."""
+    from .database import get_engine
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    with Session(get_engine()) as session:
+        moved = ReadingArchive(directory).archive(session, cutoff)
+    print(f"Archived {moved} readings older than {cutoff:%Y-%m-%d}")
+
+
+archive = ReadingArchive()
+
+
+if __name__ == "__main__":  # pragma: no cover - manual utility
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Archive old water readings")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS)
+    parser.add_argument("--directory", type=Path, default=ARCHIVE_DIR)
+    args = parser.parse_args()
+    _cli(args.days, args.directory)
@@ -0,0 +1,333 @@
+"""Benchmark the menu and feed optimizers on synthetic catalogs.
+
+Each case generates a random catalog of ``items`` ingredients over
+``nutrients`` nutrients, with caps, stock and preferences. It then builds the
+menu and feed LPs and solves them with every available backend, including
+the greedy fallback. Requirements are set from a hidden feasible mix, so
+every case has a solution.
+
+Results are plain JSON (see :func:`run`). Two runs, for example before and
+after a change, can be compared with :func:`compare` or
+``python -m app.benchmark --compare baseline.json``.
+"""
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .lp import available_backends, get_backend
+from .optimization import feed_program, menu_program
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+DEFAULT_NUTRIENTS = (5, 50, 200)
+FULL_SIZES = (10, 100, 1000, 10000, 50000)
+PROBLEMS = ("menu", "feed")
+
+
+def synthetic_catalog(
+    items: int, nutrients: int, density: float = 0.3, seed: int = 0
+) -> Dict:
+    """A random but always feasible catalog.
+
+    Roughly ``density`` of the nutrient amounts are non-zero. About a fifth
+    of the ingredients are capped, half have limited stock, and a tenth
+    carry a persona preference. Menu and feed requirements are 90% of what a
+    hidden random mix supplies, and that mix respects every cap and stock
+    limit.
+
+    Returns:
+        dict with ``ingredients``, ``menu_requirements``,
+        ``feed_requirements``, ``caps``, ``inventory`` and ``preferences``.
+    """
+    rng = np.random.default_rng(seed)
+    names = [f"i{j}" for j in range(items)]
+    nutrient_names = [f"n{k}" for k in range(nutrients)]
+    present = rng.random((items, nutrients)) < density
+    amounts = rng.random((items, nutrients)) * present
+    # Every nutrient needs at least one supplier.
+    amounts[rng.integers(0, items, nutrients), np.arange(nutrients)] += 0.5
+    cost = rng.uniform(0.5, 5.0, items)
+
+    mix = min(items, 20)
+    chosen = rng.choice(items, mix, replace=False)
+    menu_mix = np.zeros(items)
+    menu_mix[chosen] = rng.uniform(0.1, 1.0, mix)
+    feed_mix = np.zeros(items)
+    feed_mix[chosen] = rng.dirichlet(np.ones(mix))
+
+    capped = rng.random(items) < 0.2
+    cap = np.maximum(rng.uniform(0.05, 0.5, items), feed_mix)
+    limited = rng.random(items) < 0.5
+    stock = np.maximum(rng.uniform(0.0, 2.0, items), np.maximum(menu_mix, feed_mix))
+    cap_menu = np.maximum(cap, menu_mix)
+    preferred = rng.random(items) < 0.1
+    bonus = rng.uniform(0.0, 0.5, items)
+
+    ingredients = [
+        {
+            "name": name,
+            "cost": float(cost[j]),
+            "nutrients": {
+                nutrient_names[k]: float(amounts[j, k])
+                for k in np.flatnonzero(amounts[j])
+            },
+        }
+        for j, name in enumerate(names)
+    ]
+    menu_need = (0.9 * menu_mix @ amounts).tolist()
+    feed_need = (0.9 * feed_mix @ amounts).tolist()
+    return {
+        "ingredients": ingredients,
+        "menu_requirements": dict(zip(nutrient_names, menu_need)),
+        "feed_requirements": dict(zip(nutrient_names, feed_need)),
+        "caps": {names[j]: float(cap_menu[j]) for j in np.flatnonzero(capped)},
+        "inventory": {names[j]: float(stock[j]) for j in np.flatnonzero(limited)},
+        "preferences": {names[j]: float(bonus[j]) for j in np.flatnonzero(preferred)},
+    }
+
+
+def _program(problem: str, catalog: Dict):
+    if problem == "menu":
+        return menu_program(
+            catalog["ingredients"],
+            catalog["menu_requirements"],
+            catalog["preferences"],
+            catalog["caps"],
+            catalog["inventory"],
+        )
+    return feed_program(
+        catalog["ingredients"],
+        catalog["feed_requirements"],
+        catalog["caps"],
+        catalog["inventory"],
+    )
+
+
+def _timed(function, repeat: int):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def run_case(
+    items: int,
+    nutrients: int,
+    backends: Optional[Sequence[str]] = None,
+    problems: Sequence[str] = PROBLEMS,
+    repeat: int = 3,
+    density: float = 0.3,
+    seed: int = 0,
+) -> List[Dict]:
+    """Time every backend on one synthetic catalog.
+
+    ``optimum`` is the best objective any LP backend reached; ``gap`` is
+    each backend's excess over it, relative to ``max(1, |optimum|)``.
+    """
+    backends = list(backends or available_backends())
+    catalog = synthetic_catalog(items, nutrients, density, seed)
+    records = []
+    for problem in problems:
+        build, lp = _timed(lambda: _program(problem, catalog), repeat)
+        rows = []
+        for name in backends:
+            backend = get_backend(name)
+            solve, solution = _timed(lambda: backend.solve(lp), repeat)
+            rows.append(
+                {
+                    "problem": problem,
+                    "items": items,
+                    "nutrients": nutrients,
+                    "nnz": int(lp.matrix.nnz),
+                    "backend": name,
+                    "build_s": build,
+                    "solve_s": solve,
+                    "status": solution.status,
+                    "objective": solution.objective if solution.ok else None,
+                    "violation": float(lp.violation(solution.x)),
+                }
+            )
+        exact = [
+            r["objective"]
+            for r in rows
+            if r["backend"] != "greedy" and r["objective"] is not None
+        ]
+        optimum = min(exact) if exact else None
+        for row in rows:
+            row["optimum"] = optimum
+            row["gap"] = None
+            if optimum is not None and row["objective"] is not None:
+                row["gap"] = (row["objective"] - optimum) / max(1.0, abs(optimum))
+        records.extend(rows)
+    return records
+
+
+def _commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _versions() -> Dict[str, Optional[str]]:
+    versions: Dict[str, Optional[str]] = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+    for module in ("scipy", "ortools"):
+        try:
+            versions[module] = __import__(module).__version__
+        except Exception:
+            versions[module] = None
+    return versions
+
+
+def run(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    nutrients: Sequence[int] = DEFAULT_NUTRIENTS,
+    backends: Optional[Sequence[str]] = None,
+    problems: Sequence[str] = PROBLEMS,
+    repeat: int = 3,
+    density: float = 0.3,
+    seed: int = 0,
+) -> Dict:
+    """Run the grid of ``sizes x nutrients`` cases.
+
+    Returns:
+        ``{"meta": {...}, "results": [...]}``. The metadata records the
+        commit, library versions and machine; there is one result per
+        problem, case and backend.
+    """
+    results: List[Dict] = []
+    for items in sizes:
+        for count in nutrients:
+            results.extend(
+                run_case(items, count, backends, problems, repeat, density, seed)
+            )
+    return {
+        "meta": {
+            "commit": _commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "versions": _versions(),
+            "repeat": repeat,
+            "density": density,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def _key(record: Dict):
+    return record["problem"], record["items"], record["nutrients"], record["backend"]
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = 1.2) -> List[Dict]:
+    """Cases present in both runs, with solve-time ratios and gap changes.
+
+    A case is flagged ``regression`` when it solves more than ``threshold``
+    times slower, or when it loses more than 1e-6 of quality.
+    """
+    before = {_key(r): r for r in baseline["results"]}
+    rows = []
+    for record in current["results"]:
+        old = before.get(_key(record))
+        if old is None:
+            continue
+        ratio = record["solve_s"] / old["solve_s"] if old["solve_s"] else None
+        gap_change = None
+        if record["gap"] is not None and old["gap"] is not None:
+            gap_change = record["gap"] - old["gap"]
+        rows.append(
+            {
+                "problem": record["problem"],
+                "items": record["items"],
+                "nutrients": record["nutrients"],
+                "backend": record["backend"],
+                "solve_ratio": ratio,
+                "build_ratio": (
+                    record["build_s"] / old["build_s"] if old["build_s"] else None
+                ),
+                "gap_change": gap_change,
+                "regression": bool(
+                    (ratio is not None and ratio > threshold)
+                    or (gap_change is not None and gap_change > 1e-6)
+                    or (old["status"] != record["status"])
+                ),
+            }
+        )
+    return rows
+
+
+def _cli(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the optimizers")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument(
+        "--nutrients", type=int, nargs="+", default=list(DEFAULT_NUTRIENTS)
+    )
+    parser.add_argument(
+        "--full", action="store_true", help=f"use sizes {list(FULL_SIZES)}"
+    )
+    parser.add_argument("--backends", nargs="+", default=None)
+    parser.add_argument("--problems", nargs="+", default=list(PROBLEMS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--density", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare with")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args(argv)
+
+    results = run(
+        FULL_SIZES if args.full else args.sizes,
+        args.nutrients,
+        args.backends,
+        args.problems,
+        args.repeat,
+        args.density,
+        args.seed,
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    for r in results["results"]:
+        gap = "-" if r["gap"] is None else f"{r['gap']:.2e}"
+        print(
+            f"{r['problem']:4} {r['items']:>6} x {r['nutrients']:<4} "
+            f"{r['backend']:7} build {r['build_s']:.4f}s "
+            f"solve {r['solve_s']:.4f}s {r['status']:10} gap {gap}"
+        )
+    if not args.compare:
+        return 0
+    with open(args.compare, encoding="utf-8") as f:
+        rows = compare(json.load(f), results, args.threshold)
+    for row in rows:
+        ratio = "-" if row["solve_ratio"] is None else f"{row['solve_ratio']:.2f}x"
+        flag = "REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['problem']:4} {row['items']:>6} x {row['nutrients']:<4} "
+            f"{row['backend']:7} {ratio:>8} {flag}"
+        )
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":  # pragma: no cover - manual utility
+    raise SystemExit(_cli())
@@ -0,0 +1,399 @@
+"""In-memory ingredient catalogs shared by every database-backed optimizer.
+
+Loading the menu or feed inputs used to mean reading every ingredient row,
+decoding its JSON nutrient profile and handing lists of dicts to the LP
+builders. A :class:`Catalog` holds the same data once, as arrays:
+
+* ``matrix`` – dense ``ingredients x nutrients`` amounts;
+* ``cost``, ``cap`` and ``inventory`` vectors (``inf`` where uncapped);
+* ``index`` / ``nutrient_index`` name maps and per-persona preferences.
+
+:data:`catalogs` keeps one catalog per database and kind. Committed price, stock and cap
+changes are patched into a fresh copy of the vectors (catalogs are never
+mutated, so a solve in progress keeps a consistent view); new, deleted or
+re-profiled ingredients drop the catalog so it is rebuilt on next use.
+
+Catalogs are built from the indexed nutrient rows of :mod:`app.nutrients`
+(no JSON decoding). Each request gets only the candidates for its
+requirements (:meth:`Catalog.candidates`): rows that supply a required
+nutrient or are preferred over their price and, for single solves, that are
+in stock. Unpriced reference foods therefore never reach the single-solve
+LPs, and :func:`app.utils.plan_inputs` marks them as not purchasable.
+"""
+from dataclasses import dataclass, field, replace
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlmodel import Session, select
+
+from .changes import Change, watch
+from .lp import nutrient_matrix
+from .models import FeedRequirement, Ingredient, PersonaRequirement
+from .nutrients import TABLES, load_profiles
+
+FIELDS = {"cost": "cost", "stock": "inventory", "cap": "cap"}
+
+
+@dataclass(frozen=True, eq=False)
+class Catalog:
+    """Array view of one ingredient table.
+
+    Attributes:
+        kind: ``"menu"`` or ``"feed"``.
+        names: ingredient names in row order.
+        nutrients: nutrient names in column order.
+        matrix: ``len(names) x len(nutrients)`` nutrient amounts.
+        cost: price per kg.
+        cap: maximum inclusion, ``inf`` when unset.
+        inventory: stock on hand.
+        preferences: persona -> ingredient -> objective bonus.
+        generation: bumped by :class:`CatalogCache` on every rebuild or patch.
+    """
+
+    kind: str
+    names: List[str]
+    nutrients: List[str]
+    matrix: np.ndarray
+    cost: np.ndarray
+    cap: np.ndarray
+    inventory: np.ndarray
+    preferences: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    generation: int = 0
+    index: Dict[str, int] = field(init=False, repr=False, compare=False)
+    nutrient_index: Dict[str, int] = field(init=False, repr=False, compare=False)
+    _rows: Dict[Tuple[str, ...], sparse.csr_matrix] = field(
+        init=False, repr=False, compare=False, default_factory=dict
+    )
+    _subsets: Dict[Tuple, "Catalog"] = field(
+        init=False, repr=False, compare=False, default_factory=dict
+    )
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "index", {n: j for j, n in enumerate(self.names)})
+        object.__setattr__(
+            self, "nutrient_index", {n: k for k, n in enumerate(self.nutrients)}
+        )
+
+    @classmethod
+    def from_ingredients(
+        cls,
+        kind: str,
+        ingredients: List[Dict],
+        caps: Optional[Dict[str, float]] = None,
+        inventory: Optional[Dict[str, float]] = None,
+        preferences: Optional[Dict[str, Dict[str, float]]] = None,
+        generation: int = 0,
+    ) -> "Catalog":
+        """Build a catalog from ``{"name", "cost", "nutrients"}`` dicts."""
+        names = [ing["name"] for ing in ingredients]
+        nutrients = sorted({n for ing in ingredients for n in ing["nutrients"]})
+        column = {n: k for k, n in enumerate(nutrients)}
+        matrix = np.zeros((len(names), len(nutrients)))
+        for j, ing in enumerate(ingredients):
+            for nutrient, amount in ing["nutrients"].items():
+                matrix[j, column[nutrient]] = amount or 0.0
+        caps = caps or {}
+        inventory = inventory or {}
+        return cls(
+            kind=kind,
+            names=names,
+            nutrients=nutrients,
+            matrix=matrix,
+            cost=np.array([ing.get("cost", 0) for ing in ingredients], dtype=float),
+            cap=np.array([caps.get(n, np.inf) for n in names], dtype=float),
+            inventory=np.array([inventory.get(n, np.inf) for n in names], dtype=float),
+            preferences=preferences or {},
+            generation=generation,
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def nutrient_rows(self, nutrients: List[str]) -> sparse.csr_matrix:
+        """``len(nutrients) x ingredients`` CSR matrix; unknown nutrients are zero."""
+        key = tuple(nutrients)
+        rows = self._rows.get(key)
+        if rows is None:
+            dense = np.zeros((len(nutrients), len(self.names)))
+            for i, nutrient in enumerate(nutrients):
+                k = self.nutrient_index.get(nutrient)
+                if k is not None:
+                    dense[i] = self.matrix[:, k]
+            rows = sparse.csr_matrix(dense)
+            self._rows[key] = rows
+        return rows
+
+    def vector(self, values: Optional[Dict[str, float]], default: float = 0.0):
+        """Spread a name -> value mapping over the catalog rows."""
+        out = np.full(len(self.names), default, dtype=float)
+        for name, value in (values or {}).items():
+            j = self.index.get(name)
+            if j is not None:
+                out[j] = value
+        return out
+
+    def _override(self, vector: np.ndarray, values: Optional[Dict[str, float]]):
+        known = {self.index[n]: v for n, v in (values or {}).items() if n in self.index}
+        if not known:
+            return vector
+        vector = vector.copy()
+        vector[list(known)] = list(known.values())
+        return vector
+
+    def stock(self, inventory: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """Stock on hand, with ``inventory`` overriding the catalog's values."""
+        return self._override(self.inventory, inventory)
+
+    def upper(
+        self,
+        default: float = np.inf,
+        caps: Optional[Dict[str, float]] = None,
+        inventory: Optional[Dict[str, float]] = None,
+    ) -> np.ndarray:
+        """Variable upper bounds; ``caps``/``inventory`` override the catalog's."""
+        cap = self._override(self.cap, caps)
+        return np.minimum(np.minimum(cap, self.stock(inventory)), default)
+
+    def as_dict(self, attribute: str) -> Dict[str, float]:
+        """``cost``, ``cap`` or ``inventory`` as a mapping, omitting ``inf``."""
+        values = getattr(self, attribute)
+        return {
+            name: float(v) for name, v in zip(self.names, values) if np.isfinite(v)
+        }
+
+    def subset(self, rows: np.ndarray) -> "Catalog":
+        """The catalog restricted to ``rows`` (indices, in order).
+
+        Preferences are shared unchanged; names outside the subset are
+        ignored by :meth:`vector`.
+        """
+        return Catalog(
+            kind=self.kind,
+            names=[self.names[j] for j in rows],
+            nutrients=self.nutrients,
+            matrix=self.matrix[rows],
+            cost=self.cost[rows],
+            cap=self.cap[rows],
+            inventory=self.inventory[rows],
+            preferences=self.preferences,
+            generation=self.generation,
+        )
+
+    def candidates(
+        self,
+        nutrients: Optional[Iterable[str]],
+        personas: Iterable[str] = (),
+        in_stock: bool = True,
+    ) -> "Catalog":
+        """Rows that can appear in an optimal plan, as a sub-catalog.
+
+        A row is kept if it supplies one of ``nutrients`` (every row when
+        ``None``) or one of ``personas`` prefers it by more than its price.
+        With ``in_stock`` rows without stock are dropped as well, since their
+        upper bound is zero. The result is cached on this (immutable) catalog.
+        """
+        if nutrients is not None:
+            nutrients = tuple(sorted(nutrients))
+        personas = tuple(personas)
+        key = (nutrients, personas, in_stock)
+        subset = self._subsets.get(key)
+        if subset is None:
+            if nutrients is None:
+                mask = np.ones(len(self.names), dtype=bool)
+            else:
+                index = self.nutrient_index
+                columns = [index[n] for n in nutrients if n in index]
+                mask = (self.matrix[:, columns] > 0).any(axis=1)
+            for persona in personas:
+                mask |= self.vector(self.preferences.get(persona), -np.inf) > self.cost
+            if in_stock:
+                mask &= self.inventory > 0
+            subset = self if mask.all() else self.subset(np.flatnonzero(mask))
+            self._subsets[key] = subset
+        return subset
+
+    def ingredients(self) -> List[Dict]:
+        """The catalog as ``{"name", "cost", "nutrients"}`` dicts."""
+        return [
+            {
+                "name": name,
+                "cost": float(self.cost[j]),
+                "nutrients": {
+                    self.nutrients[k]: float(self.matrix[j, k])
+                    for k in np.flatnonzero(self.matrix[j])
+                },
+            }
+            for j, name in enumerate(self.names)
+        ]
+
+
+def ingredient_columns(ingredients, nutrients: List[str]):
+    """Names, cost vector and ``nutrients x ingredients`` matrix.
+
+    ``ingredients`` is either a :class:`Catalog` or a list of dicts with
+    name, cost and nutrients, so the LP builders accept both.
+    """
+    if isinstance(ingredients, Catalog):
+        return (
+            ingredients.names,
+            ingredients.cost,
+            ingredients.nutrient_rows(nutrients),
+        )
+    return (
+        [ing["name"] for ing in ingredients],
+        np.array([ing.get("cost", 0) for ing in ingredients], dtype=float),
+        nutrient_matrix(ingredients, nutrients),
+    )
+
+
+def load_catalog(session: Session, kind: str, generation: int = 0) -> Catalog:
+    """Read one ingredient table into a :class:`Catalog`.
+
+    Nutrient amounts come from the indexed ``ingredient_nutrients`` /
+    ``feed_ingredient_nutrients`` rows rather than the JSON column.
+    """
+    model = TABLES[kind][0]
+    columns = [
+        model.ingredient_id,
+        model.name,
+        model.cost_per_kg,
+        model.stock_on_hand,
+        model.cap,
+    ]
+    if kind == "menu":
+        columns.append(Ingredient.preferences)
+    rows = session.exec(select(*columns).order_by(model.ingredient_id)).all()
+    profiles = load_profiles(session, kind)
+    ingredients: List[Dict] = []
+    caps: Dict[str, float] = {}
+    inventory: Dict[str, float] = {}
+    preferences: Dict[str, Dict[str, float]] = {}
+    for row in rows:
+        ingredient_id, name, cost, stock, cap = row[:5]
+        ingredients.append(
+            {"name": name, "cost": cost, "nutrients": profiles.get(ingredient_id, {})}
+        )
+        inventory[name] = stock
+        if cap is not None:
+            caps[name] = cap
+        if kind == "menu":
+            for persona, bonus in (row[5] or {}).items():
+                preferences.setdefault(persona, {})[name] = bonus
+    return Catalog.from_ingredients(
+        kind, ingredients, caps, inventory, preferences, generation
+    )
+
+
+class CatalogCache:
+    """One :class:`Catalog` per database and kind, kept current from commits."""
+
+    def __init__(self) -> None:
+        self._catalogs: Dict[Tuple[object, str], Catalog] = {}
+        self._generation = {"menu": 0, "feed": 0}
+        self._lock = threading.Lock()
+        self._counts = {"builds": 0, "patches": 0, "hits": 0}
+
+    def get(self, session: Session, kind: str) -> Catalog:
+        key = (session.get_bind(), kind)
+        with self._lock:
+            catalog = self._catalogs.get(key)
+            if catalog is not None:
+                self._counts["hits"] += 1
+                return catalog
+            generation = self._generation[kind]
+        catalog = load_catalog(session, kind, generation)
+        with self._lock:
+            # A commit during the load bumps the generation; keep the
+            # result for this request but do not cache it.
+            if self._generation[kind] == generation:
+                self._catalogs[key] = catalog
+            self._counts["builds"] += 1
+        return catalog
+
+    def menu_inputs(self, session: Session, persona: str, in_stock: bool = True):
+        """Menu catalog, requirements and preferences for ``persona``.
+
+        The catalog is cut down with :meth:`Catalog.candidates` to rows that
+        supply a required nutrient or that the persona prefers, and with
+        ``in_stock`` to rows with stock (planning passes ``False``, since it
+        may buy). Caps and inventory are ``None``: the catalog carries them.
+        """
+        query = select(PersonaRequirement.nutrient, PersonaRequirement.amount).where(
+            PersonaRequirement.persona == persona
+        )
+        requirements = dict(session.exec(query).all())
+        catalog = self.get(session, "menu").candidates(
+            requirements, [persona], in_stock
+        )
+        return catalog, requirements, catalog.preferences.get(persona, {}), None, None
+
+    def household_inputs(self, session: Session, personas: List[str]):
+        """Menu inputs for several personas, pruned as in :meth:`menu_inputs`."""
+        requirements: Dict[str, Dict[str, float]] = {p: {} for p in personas}
+        query = select(
+            PersonaRequirement.persona,
+            PersonaRequirement.nutrient,
+            PersonaRequirement.amount,
+        ).where(PersonaRequirement.persona.in_(personas))
+        for persona, nutrient, amount in session.exec(query).all():
+            requirements[persona][nutrient] = amount
+        nutrients = {n for req in requirements.values() for n in req}
+        catalog = self.get(session, "menu").candidates(nutrients, personas)
+        preferences = {p: catalog.preferences.get(p, {}) for p in personas}
+        return catalog, requirements, preferences, None, None
+
+    def feed_inputs(self, session: Session, in_stock: bool = True):
+        """Feed catalog and requirements.
+
+        Every row is a candidate, since even one without required nutrients
+        can serve as filler; with ``in_stock`` rows without stock are dropped.
+        """
+        catalog = self.get(session, "feed")
+        if in_stock:
+            catalog = catalog.candidates(None)
+        query = select(FeedRequirement.nutrient, FeedRequirement.amount)
+        return catalog, dict(session.exec(query).all()), None, None
+
+    def apply(self, changes: List[Change]) -> None:
+        """Patch prices, stock and caps; drop catalogs on structural changes."""
+        with self._lock:
+            for kind, name, change, value in changes:
+                if change == "rebuild" and name is not None:
+                    # Persona requirement edits leave the ingredient table alone.
+                    continue
+                self._generation[kind] += 1
+                for key in [key for key in self._catalogs if key[1] == kind]:
+                    catalog = self._catalogs[key]
+                    j = catalog.index.get(name)
+                    if change == "rebuild" or j is None:
+                        del self._catalogs[key]
+                        continue
+                    attribute = FIELDS[change]
+                    vector = getattr(catalog, attribute).copy()
+                    vector[j] = np.inf if value is None else value
+                    patched = replace(
+                        catalog,
+                        generation=self._generation[kind],
+                        **{attribute: vector},
+                    )
+                    # The nutrient matrix is shared, and so are its cached rows.
+                    object.__setattr__(patched, "_rows", catalog._rows)
+                    self._catalogs[key] = patched
+                    self._counts["patches"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._catalogs.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._counts,
+                **{f"{k}_generation": g for k, g in self._generation.items()},
+            }
+
+
+catalogs = CatalogCache()
+watch(catalogs)
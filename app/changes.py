@@ -0,0 +1,90 @@
+"""Committed changes to ingredients and requirements, broadcast to caches.
+
+Optimizer sessions, solution caches and the ingredient catalog all keep
+derived state that goes stale when an ``Ingredient``, ``FeedIngredient`` or
+requirement row changes. Changes are collected on flush and delivered to
+every watcher once the transaction commits; rolled back changes are dropped.
+"""
+import weakref
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as OrmSession
+
+from .models import FeedIngredient, FeedRequirement, Ingredient, PersonaRequirement
+
+# ORM attribute -> solver field for in-place updates
+TRACKED = {"cost_per_kg": "cost", "stock_on_hand": "stock", "cap": "cap"}
+STRUCTURAL = ("name", "nutrients", "preferences")
+
+# (kind, persona or ingredient name, field, value); field "rebuild" drops a session
+Change = Tuple[str, Optional[str], str, Optional[float]]
+
+_watchers: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def watch(listener) -> None:
+    """Call ``listener.apply(changes)`` after each commit touching ingredients.
+
+    ``changes`` is a list of :data:`Change` tuples. Listeners are held weakly.
+    """
+    if not event.contains(OrmSession, "after_flush", _collect_changes):
+        event.listen(OrmSession, "after_flush", _collect_changes)
+        event.listen(OrmSession, "after_commit", _apply_changes)
+        event.listen(OrmSession, "after_rollback", _discard_changes)
+    _watchers.add(listener)
+
+
+def unwatch(listener) -> None:
+    _watchers.discard(listener)
+
+
+def record(session: OrmSession, changes: List[Change]) -> None:
+    """Queue changes made with Core statements, which the ORM does not see.
+
+    They are delivered with the rest of the session's changes on commit.
+    """
+    session.info.setdefault("optimizer_changes", []).extend(changes)
+
+
+_KINDS = {Ingredient: "menu", FeedIngredient: "feed"}
+
+
+def _collect_changes(session: OrmSession, flush_context) -> None:
+    changes: List[Change] = session.info.setdefault("optimizer_changes", [])
+    for obj in list(session.new) + list(session.deleted):
+        if type(obj) in _KINDS:
+            changes.append((_KINDS[type(obj)], None, "rebuild", None))
+        elif isinstance(obj, PersonaRequirement):
+            changes.append(("menu", obj.persona, "rebuild", None))
+        elif isinstance(obj, FeedRequirement):
+            changes.append(("feed", None, "rebuild", None))
+    for obj in session.dirty:
+        kind = _KINDS.get(type(obj))
+        if kind is None:
+            if isinstance(obj, PersonaRequirement):
+                changes.append(("menu", None, "rebuild", None))
+            elif isinstance(obj, FeedRequirement):
+                changes.append(("feed", None, "rebuild", None))
+            continue
+        attrs = inspect(obj).attrs
+        if any(
+            name in attrs.keys() and attrs[name].history.has_changes()
+            for name in STRUCTURAL
+        ):
+            changes.append((kind, None, "rebuild", None))
+            continue
+        for attr, field in TRACKED.items():
+            if attrs[attr].history.has_changes():
+                changes.append((kind, obj.name, field, getattr(obj, attr)))
+
+
+def _apply_changes(session: OrmSession) -> None:
+    changes = session.info.pop("optimizer_changes", None)
+    if changes:
+        for registry in list(_watchers):
+            registry.apply(changes)
+
+
+def _discard_changes(session: OrmSession) -> None:
+    session.info.pop("optimizer_changes", None)
@@ -1,12 +1,14 @@
-from typing import Dict, List, Tuple
+from typing import Dict, Tuple
 from sqlmodel import SQLModel, create_engine, Session, select
 
 from .models import (
     FeedIngredient,
-    FeedRequirement,
-    Ingredient,
-    PersonaRequirement,
+    HumanFood,
+    ProcessingLossFactor,
+    SeasonalYield,
 )
+from .etl.bulk import migrate_unique_names
+from .nutrients import migrate_nutrients
 
 DATABASE_URL = "sqlite:///aquaponics.db"
 
@@ -17,57 +19,44 @@ engine = get_engine()
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    migrate_nutrients(engine)
+    migrate_unique_names(engine)
 
 def get_session():
     with Session(engine) as session:
         yield session
 
 
-def get_menu_inputs(
-    session: Session, persona: str
-) -> Tuple[List[Dict], Dict[str, float], Dict[str, float], Dict[str, float], Dict[str, float]]:
-    """Fetch ingredients, requirements and constraints for a persona."""
-
-    ingredients: List[Dict] = []
-    preferences: Dict[str, float] = {}
-    caps: Dict[str, float] = {}
-    inventory: Dict[str, float] = {}
-    for ing in session.exec(select(Ingredient)).all():
-        ingredients.append(
-            {"name": ing.name, "cost": ing.cost_per_kg, "nutrients": ing.nutrients}
+def get_seasonal_yields(
+    session: Session, periods_per_season: float = 1.0
+) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Fetch on-farm yields per planning period, net of processing losses.
+
+    Human food yields are keyed by food name under ``"menu"`` (matching
+    ``Ingredient.name``) and feed yields by ingredient name under ``"feed"``.
+    Each season's ``yield_kg`` is spread evenly over ``periods_per_season``
+    periods and reduced by every processing loss recorded for the item.
+    """
+
+    retained: Dict[Tuple, float] = {}
+    for loss in session.exec(select(ProcessingLossFactor)).all():
+        key = (loss.food_id, loss.ingredient_id)
+        retained[key] = retained.get(key, 1.0) * (1 - loss.loss_factor)
+
+    yields: Dict[str, Dict[str, Dict[str, float]]] = {"menu": {}, "feed": {}}
+    query = (
+        select(SeasonalYield, HumanFood.name, FeedIngredient.name)
+        .outerjoin(HumanFood, SeasonalYield.food_id == HumanFood.food_id)
+        .outerjoin(
+            FeedIngredient, SeasonalYield.ingredient_id == FeedIngredient.ingredient_id
         )
-        inventory[ing.name] = ing.stock_on_hand
-        if ing.cap is not None:
-            caps[ing.name] = ing.cap
-        if persona in ing.preferences:
-            preferences[ing.name] = ing.preferences[persona]
-
-    requirements: Dict[str, float] = {}
-    query = select(PersonaRequirement).where(PersonaRequirement.persona == persona)
-    for req in session.exec(query).all():
-        requirements[req.nutrient] = req.amount
-
-    return ingredients, requirements, preferences, caps, inventory
-
-
-def get_feed_inputs(
-    session: Session,
-) -> Tuple[List[Dict], Dict[str, float], Dict[str, float], Dict[str, float]]:
-    """Fetch feed formulation inputs from the database."""
-
-    ingredients: List[Dict] = []
-    caps: Dict[str, float] = {}
-    inventory: Dict[str, float] = {}
-    for ing in session.exec(select(FeedIngredient)).all():
-        ingredients.append(
-            {"name": ing.name, "cost": ing.cost_per_kg, "nutrients": ing.nutrients}
-        )
-        inventory[ing.name] = ing.stock_on_hand
-        if ing.cap is not None:
-            caps[ing.name] = ing.cap
-
-    requirements: Dict[str, float] = {}
-    for req in session.exec(select(FeedRequirement)).all():
-        requirements[req.nutrient] = req.amount
-
-    return ingredients, requirements, caps, inventory
+    )
+    for row, food, feed in session.exec(query).all():
+        kind, name = ("menu", food) if food is not None else ("feed", feed)
+        if name is None:
+            continue
+        net = row.yield_kg * retained.get((row.food_id, row.ingredient_id), 1.0)
+        by_season = yields[kind].setdefault(name, {})
+        by_season[row.season] = by_season.get(row.season, 0) + net / periods_per_season
+
+    return yields
@@ -1,17 +1,22 @@
 """ETL helpers for loading reference datasets.
 
 Each module exposes a ``load(session, data_file=None)`` function that
-reads a CSV file and populates the database.
+reads a CSV file and upserts its rows through :func:`app.etl.bulk.load_csv`.
+It returns the number of rows read. :mod:`app.etl.fdc_nutrients` instead
+streams a full FoodData Central release into the menu ingredients'
+nutrient profiles.
 """
 
 from .ausnut import load as load_ausnut
 from .fdc import load as load_fdc
+from .fdc_nutrients import load as load_fdc_nutrients
 from .feedipedia import load as load_feedipedia
 from .aquaculture import load as load_aquaculture
 
 __all__ = [
     "load_ausnut",
     "load_fdc",
+    "load_fdc_nutrients",
     "load_feedipedia",
     "load_aquaculture",
 ]
@@ -0,0 +1,188 @@
+"""Shared bulk loader for the reference CSV datasets.
+
+Rows are read with ``csv.DictReader`` in chunks of ``CHUNK``, so memory use
+does not grow with the file size. Each chunk is written as one Core
+``executemany`` of ``INSERT ... ON CONFLICT (source_tag_id, name) DO
+UPDATE``. Loading the same file again updates rows in place rather than
+duplicating them. The upsert relies on the unique
+``(source_tag_id, name)`` indexes of ``human_foods`` and
+``feed_ingredients``. :func:`migrate_unique_names` adds those indexes to
+databases created before they existed.
+"""
+import csv
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Sequence
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session
+
+from ..changes import record
+from ..models import (
+    FeedIngredient,
+    FeedIngredientNutrient,
+    HumanFood,
+    ProcessingLossFactor,
+    SeasonalYield,
+    SourceTag,
+)
+
+CHUNK = 5000
+KEY = ("source_tag_id", "name")
+_KINDS = {FeedIngredient: "feed"}
+
+
+def read_chunks(path: Path, chunk_size: int = CHUNK) -> Iterator[List[Dict[str, str]]]:
+    """Yield the rows of a CSV file as lists of at most ``chunk_size`` dicts."""
+    with open(path, newline="", encoding="utf-8") as f:
+        chunk: List[Dict[str, str]] = []
+        for row in csv.DictReader(f):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def source_tag_id(session: Session, name: str) -> int:
+    """Id of the source tag called ``name``, created if missing."""
+    tag_id = session.connection().execute(
+        select(func.min(SourceTag.tag_id)).where(SourceTag.name == name)
+    ).scalar()
+    if tag_id is None:
+        tag = SourceTag(name=name)
+        session.add(tag)
+        session.flush()
+        tag_id = tag.tag_id
+    return tag_id
+
+
+def farm_row(row: Dict[str, str], tag_id: int) -> Dict[str, object]:
+    """Columns shared by every dataset: name, source and on-farm flag."""
+    return {
+        "name": row["name"],
+        "source_tag_id": tag_id,
+        "available_on_farm": (row.get("available_on_farm") or "").lower() == "true",
+    }
+
+
+def upsert(
+    conn: Connection, table, rows: Sequence[Dict], updates: Sequence[str]
+) -> None:
+    """Insert ``rows`` or update ``updates`` columns of rows with the same key."""
+    dialect = {"sqlite": sqlite, "postgresql": postgresql}.get(conn.dialect.name)
+    if dialect is not None:
+        stmt = dialect.insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(KEY), set_={c: stmt.excluded[c] for c in updates}
+        )
+        conn.execute(stmt, list(rows))
+        return
+    # Other backends: look the keys up first, then insert or update.
+    names = [row["name"] for row in rows]
+    existing = {
+        (tag, name): key
+        for key, tag, name in conn.execute(
+            select(table.primary_key.columns[0], table.c.source_tag_id, table.c.name)
+            .where(table.c.name.in_(names))
+        )
+    }
+    new = [r for r in rows if (r["source_tag_id"], r["name"]) not in existing]
+    if new:
+        conn.execute(insert(table), new)
+    for row in rows:
+        key = existing.get((row["source_tag_id"], row["name"]))
+        if key is not None:
+            conn.execute(
+                update(table)
+                .where(table.primary_key.columns[0] == key)
+                .values({c: row[c] for c in updates})
+            )
+
+
+def load_csv(
+    session: Session,
+    data_file: Path,
+    model,
+    tag_name: str,
+    build: Callable[[Dict[str, str], int], Dict] = farm_row,
+    chunk_size: int = CHUNK,
+) -> int:
+    """Upsert every row of ``data_file`` into ``model``'s table.
+
+    Args:
+        session: database session; committed at the end.
+        data_file: CSV with at least a ``name`` column; missing files are
+            skipped.
+        model: ``HumanFood`` or ``FeedIngredient``.
+        tag_name: source tag recorded on every row.
+        build: maps a CSV row and tag id to column values.
+        chunk_size: rows per ``executemany``.
+    Returns:
+        number of CSV rows read.
+    """
+    if not data_file.exists():
+        return 0
+    tag_id = source_tag_id(session, tag_name)
+    table = model.__table__
+    conn = session.connection()
+    count = 0
+    for chunk in read_chunks(data_file, chunk_size):
+        # Later rows win, as they would on a second pass.
+        rows = {row["name"]: row for row in (build(r, tag_id) for r in chunk)}
+        updates = [c for c in next(iter(rows.values())) if c not in KEY]
+        if model is FeedIngredient:
+            for row in rows.values():
+                row.setdefault("nutrients", {})
+            updates = [c for c in updates if c != "nutrients"]
+        upsert(conn, table, list(rows.values()), updates)
+        count += len(chunk)
+    if count and model in _KINDS:
+        record(session, [(_KINDS[model], None, "rebuild", None)])
+    session.commit()
+    return count
+
+
+def migrate_unique_names(bind) -> int:
+    """Merge duplicate ``(source_tag_id, name)`` rows and add unique indexes.
+
+    References from seasonal yields and loss factors move to the lowest id
+    of each group. Nutrient rows of the removed duplicates are dropped,
+    because they mirror the JSON on the row that is kept. Returns the
+    number of rows removed; running it again removes nothing.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            return migrate_unique_names(conn)
+    removed = 0
+    for model, key in ((HumanFood, "food_id"), (FeedIngredient, "ingredient_id")):
+        table = model.__table__
+        pk = table.c[key]
+        groups = bind.execute(
+            select(table.c.source_tag_id, table.c.name, func.min(pk), func.count())
+            .where(table.c.source_tag_id.is_not(None))
+            .group_by(table.c.source_tag_id, table.c.name)
+            .having(func.count() > 1)
+        ).all()
+        for tag, name, kept, _ in groups:
+            dupes = bind.execute(
+                select(pk).where(
+                    table.c.source_tag_id == tag, table.c.name == name, pk != kept
+                )
+            ).scalars().all()
+            for ref in (SeasonalYield, ProcessingLossFactor):
+                column = ref.__table__.c[key]
+                bind.execute(
+                    update(ref.__table__).where(column.in_(dupes)).values({key: kept})
+                )
+            if model is FeedIngredient:
+                link = FeedIngredientNutrient.__table__
+                bind.execute(delete(link).where(link.c.ingredient_id.in_(dupes)))
+            bind.execute(delete(table).where(pk.in_(dupes)))
+            removed += len(dupes)
+        for index in table.indexes:
+            if index.unique:
+                index.create(bind, checkfirst=True)
+    return removed
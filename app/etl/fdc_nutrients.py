@@ -0,0 +1,306 @@
+"""Nutrient profiles from a full USDA FoodData Central CSV release.
+
+An FDC release splits foods across ``food.csv`` (one row per food),
+``nutrient.csv`` (the nutrient dictionary) and ``food_nutrient.csv`` (one
+row per food and nutrient, millions of rows). :func:`load` joins them
+without holding the large file in memory:
+
+* ``nutrient.csv`` is reduced to the FDC nutrient ids behind ``NUMBERS``;
+* foods of the selected ``data_types`` are upserted into ``ingredients``
+  with ``source = "fdc:<fdc_id>"`` (no cost or stock, so the optimizers
+  only pick them once they are priced and stocked);
+* ``food_nutrient.csv`` is streamed once. Every ``rows_per_commit`` rows the
+  amounts collected so far are merged into ``Ingredient.nutrients`` and
+  ``ingredient_nutrients`` and committed.
+
+Amounts are converted from FDC's "per 100 g" to per kg. Masses become
+kg/kg (so protein is a fraction, as elsewhere in the app) and energy
+becomes kcal/kg or kJ/kg.
+
+The number of rows done is committed to ``etl_checkpoints`` in the same
+transaction as the data. An interrupted load therefore resumes after the
+last committed chunk. A changed file or selection starts over.
+"""
+from collections import deque
+import csv
+from datetime import datetime
+import hashlib
+from itertools import islice
+import json
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.engine import Connection
+from sqlmodel import Session
+
+from ..changes import record
+from ..models import EtlCheckpoint, Ingredient, Nutrient
+from ..nutrients import CHUNK, nutrient_ids, write_nutrients
+from .bulk import read_chunks
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data" / "fdc"
+# FDC nutrient number -> stored nutrient name
+NUMBERS = {
+    "203": "protein",
+    "204": "fat",
+    "205": "carbohydrate",
+    "208": "energy",
+    "291": "fiber",
+    "301": "calcium",
+    "303": "iron",
+    "309": "zinc",
+    "401": "vitamin_c",
+    "418": "vitamin_b12",
+}
+DATA_TYPES = ("foundation_food", "sr_legacy_food")
+# FDC unit -> (stored unit, factor from per 100 g)
+UNITS = {
+    "G": ("kg/kg", 1e-2),
+    "MG": ("kg/kg", 1e-5),
+    "UG": ("kg/kg", 1e-8),
+    "KCAL": ("kcal/kg", 10.0),
+    "KJ": ("kJ/kg", 10.0),
+}
+ROWS_PER_COMMIT = 100000
+
+Progress = Callable[[Dict[str, int]], None]
+
+
+def _number(value: str) -> str:
+    # Some releases write nutrient numbers as "203.0".
+    return value[:-2] if value.endswith(".0") else value
+
+
+def tracked_nutrients(
+    path: Path, numbers: Dict[str, str] = NUMBERS
+) -> Dict[str, Tuple[str, str, float]]:
+    """FDC nutrient id -> (stored name, stored unit, factor) for ``numbers``."""
+    tracked = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            name = numbers.get(_number(row.get("nutrient_nbr") or ""))
+            unit = UNITS.get((row.get("unit_name") or "").upper())
+            if name is not None and unit is not None:
+                tracked[row["id"]] = (name, *unit)
+    return tracked
+
+
+def upsert_foods(
+    conn: Connection, path: Path, data_types: Optional[Iterable[str]] = DATA_TYPES
+) -> Dict[str, int]:
+    """Insert or rename the selected foods; returns fdc_id -> ingredient_id.
+
+    A description already used by another ingredient (a farm ingredient or
+    another FDC food) gets `` (fdc <fdc_id>)`` appended, so names stay
+    unique across the menu.
+    """
+    types = set(data_types) if data_types is not None else None
+    table = Ingredient.__table__
+    existing: Dict[str, Tuple[int, str]] = {}
+    # name -> owner, the FDC source or the ingredient_id of other rows
+    taken: Dict[str, object] = {}
+    query = select(table.c.ingredient_id, table.c.name, table.c.source)
+    for ingredient_id, name, source in conn.execute(query):
+        fdc = source is not None and source.startswith("fdc:")
+        if fdc:
+            existing[source[4:]] = (ingredient_id, name)
+        taken.setdefault(name, source if fdc else ingredient_id)
+
+    def claim(name: str, source: str) -> str:
+        if taken.get(name, source) != source:
+            name = f"{name} (fdc {source[4:]})"
+        taken[name] = source
+        return name
+
+    ids: Dict[str, int] = {}
+    rename = (
+        update(table)
+        .where(table.c.ingredient_id == bindparam("key"))
+        .values(name=bindparam("new_name"))
+    )
+    for chunk in read_chunks(path):
+        new, renamed = {}, []
+        for row in chunk:
+            if types is not None and row.get("data_type") not in types:
+                continue
+            fdc_id, source = row["fdc_id"], f"fdc:{row['fdc_id']}"
+            if fdc_id in existing:
+                ingredient_id, old = existing[fdc_id]
+                ids[fdc_id] = ingredient_id
+                if old in (row["description"], f"{row['description']} (fdc {fdc_id})"):
+                    continue
+                if taken.get(old) == source:
+                    del taken[old]
+                name = claim(row["description"], source)
+                existing[fdc_id] = (ingredient_id, name)
+                renamed.append({"key": ingredient_id, "new_name": name})
+            elif source not in new:
+                new[source] = claim(row["description"], source)
+        if renamed:
+            conn.execute(rename, renamed)
+        if new:
+            conn.execute(
+                insert(table),
+                [
+                    {"name": name, "source": source, "nutrients": {}, "preferences": {}}
+                    for source, name in new.items()
+                ],
+            )
+            query = select(table.c.source, table.c.ingredient_id).where(
+                table.c.source.in_(list(new))
+            )
+            for source, key in conn.execute(query):
+                ids[source[4:]] = key
+                existing[source[4:]] = (key, new[source])
+    return ids
+
+
+def _merge(conn: Connection, pending: Dict[int, Dict[str, float]]) -> None:
+    table = Ingredient.__table__
+    keys = list(pending)
+    profiles: Dict[int, Dict[str, float]] = {}
+    for start in range(0, len(keys), CHUNK):
+        query = select(table.c.ingredient_id, table.c.nutrients).where(
+            table.c.ingredient_id.in_(keys[start : start + CHUNK])
+        )
+        for ingredient_id, current in conn.execute(query):
+            profiles[ingredient_id] = {**(current or {}), **pending[ingredient_id]}
+    conn.execute(
+        update(table)
+        .where(table.c.ingredient_id == bindparam("key"))
+        .values(nutrients=bindparam("profile")),
+        [{"key": key, "profile": profile} for key, profile in profiles.items()],
+    )
+    write_nutrients(conn, "menu", profiles)
+
+
+def _signature(path: Path, data_types, numbers: Dict[str, str]) -> str:
+    stat = path.stat()
+    key = [
+        stat.st_size,
+        stat.st_mtime_ns,
+        sorted(data_types) if data_types is not None else None,
+        sorted(numbers.items()),
+    ]
+    return hashlib.sha1(json.dumps(key).encode()).hexdigest()
+
+
+def load(
+    session: Session,
+    directory: Path = DATA_DIR,
+    data_types: Optional[Iterable[str]] = DATA_TYPES,
+    numbers: Dict[str, str] = NUMBERS,
+    progress: Optional[Progress] = None,
+    restart: bool = False,
+    rows_per_commit: int = ROWS_PER_COMMIT,
+) -> Dict[str, int]:
+    """Load FDC nutrient profiles into the menu ingredients.
+
+    Args:
+        session: database session; committed after every chunk.
+        directory: folder with ``food.csv``, ``nutrient.csv`` and
+            ``food_nutrient.csv``; skipped if any is missing.
+        data_types: FDC ``data_type`` values to import, ``None`` for all.
+        numbers: FDC nutrient number -> stored nutrient name.
+        progress: called after each commit with the counters below plus
+            ``bytes`` and ``total_bytes`` of ``food_nutrient.csv``.
+        restart: ignore a previous checkpoint.
+        rows_per_commit: ``food_nutrient.csv`` rows per transaction.
+    Returns:
+        ``rows`` of ``food_nutrient.csv`` done, ``resumed_from`` (rows
+        skipped thanks to the checkpoint), ``foods`` selected and
+        ``amounts`` stored by this call.
+    """
+    directory = Path(directory)
+    paths = {name: directory / f"{name}.csv" for name in ("food", "nutrient")}
+    source = directory / "food_nutrient.csv"
+    stats = {"rows": 0, "resumed_from": 0, "foods": 0, "amounts": 0}
+    if not source.exists() or not all(p.exists() for p in paths.values()):
+        return stats
+
+    name = f"fdc_nutrients:{source.resolve()}"
+    signature = _signature(source, data_types, numbers)
+    checkpoint = session.get(EtlCheckpoint, name)
+    if checkpoint is None:
+        checkpoint = EtlCheckpoint(name=name, signature=signature)
+    elif restart or checkpoint.signature != signature:
+        checkpoint.signature = signature
+        checkpoint.rows, checkpoint.completed = 0, False
+    stats["rows"] = stats["resumed_from"] = checkpoint.rows
+    if checkpoint.completed:
+        return stats
+
+    conn = session.connection()
+    tracked = tracked_nutrients(paths["nutrient"], numbers)
+    units = {stored: unit for stored, unit, _ in tracked.values()}
+    nutrient_ids(conn, units)
+    nutrients = Nutrient.__table__
+    for stored, unit in units.items():
+        conn.execute(
+            update(nutrients)
+            .where(nutrients.c.name == stored, nutrients.c.unit == "")
+            .values(unit=unit)
+        )
+    foods = upsert_foods(conn, paths["food"], data_types)
+    stats["foods"] = len(foods)
+
+    total = source.stat().st_size
+    with open(source, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        fdc_col, nutrient_col, amount_col = (
+            header.index(column) for column in ("fdc_id", "nutrient_id", "amount")
+        )
+        deque(islice(reader, checkpoint.rows), maxlen=0)
+        pending: Dict[int, Dict[str, float]] = {}
+        done = False
+        while not done:
+            count = 0
+            for row in islice(reader, rows_per_commit):
+                count += 1
+                nutrient = tracked.get(row[nutrient_col])
+                ingredient_id = foods.get(row[fdc_col])
+                if nutrient is None or ingredient_id is None or not row[amount_col]:
+                    continue
+                profile = pending.get(ingredient_id)
+                if profile is None:
+                    profile = pending[ingredient_id] = {}
+                profile[nutrient[0]] = float(row[amount_col]) * nutrient[2]
+            done = count < rows_per_commit
+            if pending:
+                _merge(session.connection(), pending)
+                record(session, [("menu", None, "rebuild", None)])
+                stats["amounts"] += sum(len(p) for p in pending.values())
+                pending = {}
+            stats["rows"] += count
+            checkpoint.rows = stats["rows"]
+            checkpoint.completed = done
+            checkpoint.updated_at = datetime.utcnow()
+            session.add(checkpoint)
+            session.commit()
+            if progress is not None:
+                progress({**stats, "bytes": f.buffer.tell(), "total_bytes": total})
+    return stats
+
+
+def _cli() -> None:
+    """Load an FDC release folder into the configured database."""
+    import sys
+
+    from ..database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    directory = Path(sys.argv[1]) if len(sys.argv) > 1 else DATA_DIR
+
+    def report(stats: Dict[str, int]) -> None:
+        share = 100 * stats["bytes"] / max(stats["total_bytes"], 1)
+        print(f"{share:5.1f}%  {stats['rows']} rows  {stats['amounts']} amounts")
+
+    with Session(engine) as session:
+        stats = load(session, directory, progress=report)
+    print(f"Loaded {stats['foods']} foods from {directory}")
+
+
+if __name__ == "__main__":  # pragma: no cover - manual utility
+    _cli()
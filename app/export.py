@@ -0,0 +1,255 @@
+"""Streaming export of readings, feed logs, growth records and events.
+
+Rows are pulled through a server-side cursor in fixed-size chunks and each
+chunk is encoded and handed on before the next is fetched, so memory use does
+not depend on how many rows are exported. Archived water readings are
+included ahead of the live table.
+"""
+import csv
+from datetime import date, datetime
+import io
+import json
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from .archive import ReadingArchive
+from .models import EventLog, FeedLog, GrowthRecord, WaterReading
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:  # pragma: no cover - fallback when pyarrow missing
+    pa = None
+
+DATASETS: Dict[str, type] = {
+    "readings": WaterReading,
+    "feed_logs": FeedLog,
+    "growth_records": GrowthRecord,
+    "events": EventLog,
+}
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+CHUNK_SIZE = 10_000
+
+
+def available_formats() -> List[str]:
+    return [f for f in MEDIA_TYPES if f != "parquet" or pa is not None]
+
+
+def columns(dataset: str) -> List[str]:
+    return [c.name for c in DATASETS[dataset].__table__.columns]
+
+
+def iter_chunks(
+    engine: Engine,
+    dataset: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    chunk_size: int = CHUNK_SIZE,
+    archive: Optional[ReadingArchive] = None,
+) -> Iterator[List[Tuple]]:
+    """Yield lists of row tuples in timestamp order, ``chunk_size`` at a time."""
+    model = DATASETS[dataset]
+    names = columns(dataset)
+
+    if dataset == "readings" and archive is not None:
+        chunk: List[Tuple] = []
+        for row in archive.scan(start=start, end=end):
+            chunk.append(tuple(row[name] for name in names))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    table = model.__table__
+    stmt = select(*table.columns)
+    if start:
+        stmt = stmt.where(table.c.timestamp >= start)
+    if end:
+        stmt = stmt.where(table.c.timestamp <= end)
+    stmt = stmt.order_by(table.c.timestamp, table.c[names[0]])
+    with Session(engine) as session:
+        result = session.connection().execution_options(
+            stream_results=True, yield_per=chunk_size
+        ).execute(stmt)
+        for partition in result.partitions(chunk_size):
+            yield [tuple(row) for row in partition]
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _encode_csv(names: Sequence[str], chunks: Iterable[List[Tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for chunk in chunks:
+        writer.writerows(
+            [v.isoformat() if isinstance(v, datetime) else v for v in row]
+            for row in chunk
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _encode_ndjson(names: Sequence[str], chunks: Iterable[List[Tuple]]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield "".join(
+            json.dumps(dict(zip(names, row)), default=_json_default) + "\n"
+            for row in chunk
+        ).encode()
+
+
+class _Drain:
+    """Write-only file object whose contents are collected between chunks."""
+
+    def __init__(self) -> None:
+        self.parts: List[bytes] = []
+        self.closed = False
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _arrow_schema(dataset: str):
+    types = {int: pa.int64(), float: pa.float64(), str: pa.string(), bool: pa.bool_()}
+    fields = []
+    for column in DATASETS[dataset].__table__.columns:
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:  # e.g. sqlmodel's AutoString
+            python_type = str
+        if python_type is datetime:
+            arrow_type = pa.timestamp("us")
+        else:
+            arrow_type = types.get(python_type, pa.string())
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+
+def _encode_parquet(dataset: str, chunks: Iterable[List[Tuple]]) -> Iterator[bytes]:
+    if pa is None:
+        raise RuntimeError("pyarrow is required for Parquet export")
+    schema = _arrow_schema(dataset)
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    for chunk in chunks:
+        arrays = [list(col) for col in zip(*chunk)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def stream_export(
+    engine: Engine,
+    dataset: str,
+    fmt: str = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    chunk_size: int = CHUNK_SIZE,
+    archive: Optional[ReadingArchive] = None,
+) -> Iterator[bytes]:
+    """Encode ``dataset`` as ``fmt`` and yield it piece by piece.
+
+    Args:
+        engine: database engine to read from.
+        dataset: one of ``readings``, ``feed_logs``, ``growth_records``, ``events``.
+        fmt: ``csv``, ``ndjson`` or ``parquet`` (requires pyarrow).
+        start: optional inclusive lower timestamp bound.
+        end: optional inclusive upper timestamp bound.
+        chunk_size: rows fetched and encoded per step.
+        archive: archived readings to include ahead of the live table.
+    Returns:
+        iterator of encoded byte chunks.
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset: {dataset}")
+    if fmt not in MEDIA_TYPES:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == "parquet" and pa is None:
+        raise ValueError("Parquet export requires pyarrow")
+    chunks = iter_chunks(engine, dataset, start, end, chunk_size, archive)
+    encoders: Dict[str, Callable[[], Iterator[bytes]]] = {
+        "csv": lambda: _encode_csv(columns(dataset), chunks),
+        "ndjson": lambda: _encode_ndjson(columns(dataset), chunks),
+        "parquet": lambda: _encode_parquet(dataset, chunks),
+    }
+    return encoders[fmt]()
+
+
+def _cli(
+    dataset: str,
+    fmt: str,
+    output: Optional[str],
+    start: Optional[datetime],
+    end: Optional[datetime],
+) -> None:
+    """Write an export to ``output`` (or stdout)."""
+    import sys
+
+    from .archive import archive
+    from .database import get_engine
+
+    stream = stream_export(get_engine(), dataset, fmt, start, end, archive=archive)
+    if output:
+        with open(output, "wb") as f:
+            for piece in stream:
+                f.write(piece)
+    else:
+        for piece in stream:
+            sys.stdout.buffer.write(piece)
+
+
+if __name__ == "__main__":  # pragma: no cover - manual utility
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export readings and logs")
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("--format", dest="fmt", choices=available_formats(), default="csv")
+    parser.add_argument("--output", "-o", help="File to write (default: stdout)")
+    parser.add_argument("--start", type=datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.fromisoformat)
+    args = parser.parse_args()
+    _cli(args.dataset, args.fmt, args.output, args.start, args.end)
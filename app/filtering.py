@@ -0,0 +1,180 @@
+"""Server-side time-windowed filtering of water readings with result caching."""
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+
+from sqlmodel import Session, select
+
+from aquaponics.filters import TimeWeightedEWMA, TimeWindowHampel
+
+from .models import WaterReading
+
+Filter = Union[TimeWindowHampel, TimeWeightedEWMA]
+CacheKey = Tuple[str, Optional[str], str, float, float]
+
+METHODS = ("hampel", "ewma")
+
+
+def _epoch_seconds(ts: datetime) -> float:
+    """Seconds since the epoch for the naive UTC timestamps stored in the DB."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+def _make_filter(method: str, window: float, n_sigmas: float) -> Filter:
+    if method == "hampel":
+        return TimeWindowHampel(window, n_sigmas)
+    if method == "ewma":
+        return TimeWeightedEWMA(window)
+    raise ValueError(f"Unknown filter method: {method}")
+
+
+@dataclass
+class _Entry:
+    """Filter state plus the outputs kept so far for one cache key."""
+
+    filter: Filter
+    last_reading_id: int = 0
+    last_timestamp: Optional[datetime] = None
+    seconds: List[float] = field(default_factory=list)
+    rows: List[Dict] = field(default_factory=list)
+    # Outputs before this epoch second have been dropped from ``rows``.
+    kept_from: float = float("-inf")
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def trim(self, history: float) -> None:
+        if not self.seconds:
+            return
+        cutoff = self.seconds[-1] - history
+        drop = bisect_left(self.seconds, cutoff)
+        if drop:
+            del self.seconds[:drop], self.rows[:drop]
+            self.kept_from = cutoff
+
+
+def _select(
+    rows: List[Dict],
+    seconds: List[float],
+    start: Optional[datetime],
+    end: Optional[datetime],
+) -> List[Dict]:
+    lo = 0 if start is None else bisect_left(seconds, _epoch_seconds(start))
+    hi = len(seconds) if end is None else bisect_right(seconds, _epoch_seconds(end))
+    return rows[lo:hi]
+
+
+class FilterCache:
+    """Cache filtered series per (stream, method, window, parameters).
+
+    On every request only readings newer than the last one seen are fetched
+    and pushed through the stored filter state, so repeated queries cost a
+    single indexed lookup plus the new samples. A late reading with an older
+    timestamp than the cached tail forces a rebuild of that entry.
+
+    Each entry keeps the last ``history`` seconds of output, which is what
+    a request without ``start`` returns. Requests with an earlier ``start``
+    replay the stream without touching the cache. The
+    cache lock only guards the entry table; the database is read under the
+    entry's own lock, so other streams are not held up by a slow query.
+    """
+
+    def __init__(self, max_entries: int = 64, history: float = 86400.0) -> None:
+        self.max_entries = max_entries
+        self.history = history
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def filtered(
+        self,
+        session: Session,
+        parameter: str,
+        location: Optional[str] = None,
+        method: str = "hampel",
+        window: float = 300.0,
+        n_sigmas: float = 3.0,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[Dict]:
+        """Return filtered readings for a stream, extending the cache first.
+
+        Args:
+            session: database session used to fetch new readings.
+            parameter: water parameter name.
+            location: optional location; ``None`` selects readings without one.
+            method: ``"hampel"`` (trailing time window) or ``"ewma"``.
+            window: window length (Hampel) or time constant (EWMA) in seconds.
+            n_sigmas: Hampel threshold; ignored for EWMA.
+            start: optional inclusive lower timestamp bound of the result;
+                without it the result covers the cached ``history``.
+            end: optional inclusive upper timestamp bound of the result.
+        Returns:
+            list of dicts with ``reading_id``, ``timestamp``, ``value`` and
+            ``filtered`` keys in chronological order.
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown filter method: {method}")
+        if method == "ewma":
+            n_sigmas = 0.0
+        key: CacheKey = (parameter, location, method, float(window), float(n_sigmas))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _Entry(_make_filter(method, window, n_sigmas))
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        with entry.lock:
+            self._extend(session, key, entry)
+            entry.trim(self.history)
+            if start is None or _epoch_seconds(start) >= entry.kept_from:
+                return _select(entry.rows, entry.seconds, start, end)
+        # Older than the cached history: filter the whole stream once.
+        replay = _Entry(_make_filter(method, window, n_sigmas))
+        self._extend(session, key, replay)
+        return _select(replay.rows, replay.seconds, start, end)
+
+    def _extend(self, session: Session, key: CacheKey, entry: _Entry) -> None:
+        parameter, location, method, window, n_sigmas = key
+        stmt = select(WaterReading).where(
+            WaterReading.parameter == parameter,
+            WaterReading.location == location
+            if location is not None
+            else WaterReading.location.is_(None),
+            WaterReading.reading_id > entry.last_reading_id,
+        ).order_by(WaterReading.timestamp, WaterReading.reading_id)
+        new = session.exec(stmt).all()
+        if not new:
+            return
+        if entry.last_timestamp is not None and new[0].timestamp < entry.last_timestamp:
+            # A reading arrived out of order; replay the whole stream.
+            entry.filter = _make_filter(method, window, n_sigmas)
+            entry.last_reading_id, entry.last_timestamp = 0, None
+            entry.seconds, entry.rows = [], []
+            entry.kept_from = float("-inf")
+            self._extend(session, key, entry)
+            return
+        for reading in new:
+            seconds = _epoch_seconds(reading.timestamp)
+            entry.seconds.append(seconds)
+            entry.rows.append(
+                {
+                    "reading_id": reading.reading_id,
+                    "timestamp": reading.timestamp,
+                    "value": reading.value,
+                    "filtered": entry.filter.update(seconds, reading.value),
+                }
+            )
+        entry.last_reading_id = max(entry.last_reading_id, max(r.reading_id for r in new))
+        entry.last_timestamp = new[-1].timestamp
+
+
+cache = FilterCache()
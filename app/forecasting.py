@@ -0,0 +1,169 @@
+"""In-memory Holt-Winters forecasts for every water quality stream."""
+import os
+import threading
+from itertools import groupby
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from aquaponics.alerts import Alert, check_threshold
+from aquaponics.forecasting import HoltWinters, fit_holt_winters
+
+from .models import WaterReading, WaterTarget
+
+StreamKey = Tuple[str, Optional[str]]
+
+
+class ForecastRegistry:
+    """Per-stream forecasting state kept in memory.
+
+    Streams are identified by ``(parameter, location)``. All streams are fitted
+    together from history at startup and then follow new readings with an
+    ``O(1)`` update, so forecasts are always served without touching the
+    database.
+    """
+
+    def __init__(
+        self,
+        season_length: int = 1,
+        alpha: float = 0.3,
+        beta: float = 0.05,
+        gamma: float = 0.1,
+        history_limit: int = 10_000,
+    ) -> None:
+        self.season_length = season_length
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.history_limit = history_limit
+        self._models: Dict[StreamKey, HoltWinters] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: StreamKey) -> bool:
+        return key in self._models
+
+    def streams(self) -> List[StreamKey]:
+        with self._lock:
+            return list(self._models)
+
+    def fit_from_history(self, session: Session) -> int:
+        """Batch-fit every stream from stored readings and return the count."""
+        stmt = select(
+            WaterReading.parameter, WaterReading.location, WaterReading.value
+        ).order_by(
+            WaterReading.parameter, WaterReading.location, WaterReading.timestamp
+        )
+        keys: List[StreamKey] = []
+        series: List[List[float]] = []
+        for key, rows in groupby(session.exec(stmt), key=lambda r: (r[0], r[1])):
+            keys.append(key)
+            series.append([row[2] for row in rows][-self.history_limit :])
+        models = fit_holt_winters(
+            series,
+            season_length=self.season_length,
+            alpha=self.alpha,
+            beta=self.beta,
+            gamma=self.gamma,
+        )
+        with self._lock:
+            self._models = dict(zip(keys, models))
+        return len(keys)
+
+    def update(
+        self, parameter: str, value: float, location: Optional[str] = None
+    ) -> HoltWinters:
+        """Absorb a new reading, creating the stream state on first sight."""
+        key = (parameter, location)
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = HoltWinters(
+                    level=value,
+                    season=[0.0] * self.season_length,
+                    alpha=self.alpha,
+                    beta=self.beta,
+                    gamma=self.gamma,
+                )
+                self._models[key] = model
+            model.update(value)
+            return model
+
+    def forecast(
+        self, parameter: str, location: Optional[str] = None, horizon: int = 1
+    ) -> Optional[Dict]:
+        """Return the next ``horizon`` predicted values for a stream, if known."""
+        with self._lock:
+            model = self._models.get((parameter, location))
+            if model is None:
+                return None
+            values = model.forecast(horizon)
+            sigma = model.sigma
+        return {
+            "parameter": parameter,
+            "location": location,
+            "horizon": horizon,
+            "forecast": values,
+            "sigma": sigma,
+        }
+
+    def predicted_alerts(self, session: Session, horizon: int = 10) -> List[Dict]:
+        """Alerts for streams forecast to leave their target range.
+
+        Each stream's forecast over ``horizon`` readings is checked against the
+        matching :class:`WaterTarget`; only warning or critical results are
+        returned, along with how many readings ahead the worst value occurs.
+        """
+        targets = session.exec(select(WaterTarget)).all()
+        alerts: List[Dict] = []
+        for parameter, location in self.streams():
+            target = _match_target(targets, parameter, location)
+            if target is None:
+                continue
+            result = self.forecast(parameter, location, horizon)
+            if result is None:
+                continue
+            worst = _worst_step(result["forecast"], target)
+            alert: Alert = check_threshold(
+                parameter,
+                result["forecast"][worst],
+                target.min_value,
+                target.max_value,
+            )
+            if alert.severity == "normal":
+                continue
+            alerts.append(
+                {
+                    "parameter": alert.parameter,
+                    "severity": alert.severity,
+                    "message": alert.message,
+                    "location": location,
+                    "steps_ahead": worst + 1,
+                }
+            )
+        return alerts
+
+
+def _match_target(
+    targets: List[WaterTarget], parameter: str, location: Optional[str]
+) -> Optional[WaterTarget]:
+    """Prefer a location specific target, falling back to a global one."""
+    fallback = None
+    for target in targets:
+        if target.parameter != parameter:
+            continue
+        if target.location == location and location is not None:
+            return target
+        if target.location is None:
+            fallback = fallback or target
+    return fallback
+
+
+def _worst_step(values: List[float], target: WaterTarget) -> int:
+    """Index of the forecast value furthest outside (or closest to) the range."""
+    middle = (target.min_value + target.max_value) / 2
+    return max(range(len(values)), key=lambda i: abs(values[i] - middle))
+
+
+registry = ForecastRegistry(
+    season_length=int(os.getenv("FORECAST_SEASON_LENGTH", "1")),
+)
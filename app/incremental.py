@@ -0,0 +1,287 @@
+"""Persistent optimizer sessions that re-solve incrementally.
+
+Each persona's menu and the fish feed keep an :class:`IncrementalSolver`
+alive between requests. When an ingredient's price, stock or cap changes,
+the solver patches the objective coefficient or variable bound in place
+instead of rebuilding the model from the database:
+
+* if the previous optimum provably stays optimal (the change only loosens
+  or tightens a bound the plan does not touch, or makes an unused
+  ingredient dearer) the cached plan is returned without solving at all;
+* otherwise the live GLOP model is re-solved from its previous basis
+  (presolve is disabled so GLOP can reuse it). Other backends re-solve the
+  already assembled sparse program.
+
+Changes are picked up from committed ORM sessions, so ``/inventory`` updates
+and any other code writing ``Ingredient`` or ``FeedIngredient`` rows keep
+the sessions current. Structural changes (new ingredients, nutrient
+profiles, requirements) drop the affected session so it is rebuilt on next
+use.
+"""
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlmodel import Session
+
+from .changes import Change, unwatch, watch  # noqa: F401 - re-exported
+from .catalog import catalogs
+from .lp import OPTIMAL, GlopBackend, LinearProgram, LPSolution, get_backend
+from .optimization import feed_program, menu_program
+
+TOLERANCE = 1e-9
+
+
+class IncrementalSolver:
+    """A solved :class:`LinearProgram` that accepts in-place updates.
+
+    Args:
+        lp: assembled program; its arrays are updated in place.
+        backend: solver backend name, see :func:`app.lp.get_backend`.
+        preferences: ingredient -> objective bonus subtracted from cost.
+        caps: ingredient -> maximum inclusion.
+        inventory: ingredient -> stock on hand.
+        default_upper: upper bound for ingredients without cap or stock.
+    """
+
+    def __init__(
+        self,
+        lp: LinearProgram,
+        backend: Optional[str] = None,
+        preferences: Optional[Dict[str, float]] = None,
+        caps: Optional[Dict[str, float]] = None,
+        inventory: Optional[Dict[str, float]] = None,
+        default_upper: float = np.inf,
+    ) -> None:
+        self.lp = lp
+        self.backend = get_backend(backend)
+        self.preferences = dict(preferences or {})
+        self.caps = dict(caps or {})
+        self.inventory = dict(inventory or {})
+        self.default_upper = default_upper
+        self.columns: Dict[str, List[int]] = {}
+        for j, name in enumerate(lp.names):
+            self.columns.setdefault(name, []).append(j)
+        self.solution: Optional[LPSolution] = None
+        self.stats = {"cold": 0, "warm": 0, "reused": 0}
+        self._stale = True
+        self._lock = threading.Lock()
+        self._model = None
+        if isinstance(self.backend, GlopBackend):
+            self._model = self.backend.load(lp)
+            self._model.SetSolverSpecificParametersAsString("use_preprocessing:false")
+            self._variables = self._model.variables()
+
+    def _optimal(self) -> bool:
+        return (
+            not self._stale
+            and self.solution is not None
+            and self.solution.status == OPTIMAL
+        )
+
+    def set_cost(self, name: str, cost: float) -> None:
+        """Change the price of ``name``; preferences are applied on top."""
+        with self._lock:
+            for j in self.columns.get(name, []):
+                new = cost - self.preferences.get(name, 0)
+                delta = new - self.lp.cost[j]
+                if not delta:
+                    continue
+                self.lp.cost[j] = new
+                if self._model is not None:
+                    self._model.Objective().SetCoefficient(self._variables[j], new)
+                if not self._optimal():
+                    self._stale = True
+                    continue
+                # Making a variable at its lower bound dearer (or one at its
+                # upper bound cheaper) cannot make any other plan better.
+                x = self.solution.x[j]
+                at_lower = x <= self.lp.lower[j] + TOLERANCE
+                at_upper = x >= self.lp.upper[j] - TOLERANCE
+                if (delta > 0 and at_lower) or (delta < 0 and at_upper):
+                    self.solution.objective += delta * x
+                    if self.solution.reduced_costs is not None:
+                        self.solution.reduced_costs[j] += delta
+                else:
+                    self._stale = True
+
+    def set_limits(self, name: str, **limits: Optional[float]) -> None:
+        """Update ``stock`` and/or ``cap`` for ``name`` (``None`` clears a limit)."""
+        with self._lock:
+            for field, value in limits.items():
+                target = self.inventory if field == "stock" else self.caps
+                if value is None:
+                    target.pop(name, None)
+                else:
+                    target[name] = value
+            upper = self.default_upper
+            if name in self.caps:
+                upper = min(upper, self.caps[name])
+            if name in self.inventory:
+                upper = min(upper, self.inventory[name])
+            for j in self.columns.get(name, []):
+                self._set_upper(j, upper)
+
+    def _set_upper(self, j: int, upper: float) -> None:
+        old = self.lp.upper[j]
+        if upper == old:
+            return
+        self.lp.upper[j] = upper
+        if self._model is not None:
+            bound = upper if np.isfinite(upper) else self._model.infinity()
+            self._variables[j].SetUb(bound)
+        if not self._optimal():
+            self._stale = True
+            return
+        x = self.solution.x[j]
+        if upper < old:
+            # The old plan is still feasible, and nothing new became feasible.
+            stable = x <= upper + TOLERANCE
+            if stable:
+                self.solution.x[j] = min(x, upper)
+        else:
+            # Loosening only matters if the bound's multiplier was non-zero.
+            rc = self.solution.reduced_costs
+            stable = rc is not None and rc[j] >= -TOLERANCE
+        if not stable:
+            self._stale = True
+
+    def solve(self) -> LPSolution:
+        """Return the current optimum, re-solving only when needed."""
+        with self._lock:
+            if not self._stale and self.solution is not None:
+                self.stats["reused"] += 1
+                return self.solution
+            self.stats["cold" if self.solution is None else "warm"] += 1
+            if self._model is not None:
+                self.solution = self.backend.run(self._model)
+            else:
+                self.solution = self.backend.solve(self.lp)
+            self._stale = False
+            return self.solution
+
+    def plan(self) -> Dict[str, float]:
+        return self.solve().plan(self.lp.names)
+
+
+class OptimizerSessions:
+    """Incremental menu solvers per persona plus one for the feed."""
+
+    def __init__(self, backend: Optional[str] = None) -> None:
+        self.backend = backend
+        self._menus: Dict[str, IncrementalSolver] = {}
+        self._feed: Optional[IncrementalSolver] = None
+        self._lock = threading.RLock()
+
+    def menu(self, session: Session, persona: str) -> IncrementalSolver:
+        with self._lock:
+            solver = self._menus.get(persona)
+            if solver is None:
+                catalog, requirements, preferences = catalogs.menu_inputs(
+                    session, persona
+                )[:3]
+                solver = IncrementalSolver(
+                    menu_program(catalog, requirements, preferences),
+                    self.backend,
+                    preferences=preferences,
+                    caps=catalog.as_dict("cap"),
+                    inventory=catalog.as_dict("inventory"),
+                )
+                self._menus[persona] = solver
+            return solver
+
+    def feed(self, session: Session) -> IncrementalSolver:
+        with self._lock:
+            if self._feed is None:
+                catalog, requirements = catalogs.feed_inputs(session)[:2]
+                self._feed = IncrementalSolver(
+                    feed_program(catalog, requirements),
+                    self.backend,
+                    caps=catalog.as_dict("cap"),
+                    inventory=catalog.as_dict("inventory"),
+                    default_upper=1.0,
+                )
+            return self._feed
+
+    def solve(self, session: Session, persona: str) -> Dict[str, Dict[str, float]]:
+        """Menu and feed plans, shaped like :func:`app.utils.run_optimizations`."""
+        menu = self.menu(session, persona).solve()
+        if not menu.ok:
+            raise ValueError("No optimal menu found")
+        feed_solver = self.feed(session)
+        feed = feed_solver.solve()
+        if not feed.ok:
+            raise ValueError("No optimal feed found")
+        return {
+            "menu": menu.plan(self._menus[persona].lp.names),
+            "feed": feed.plan(feed_solver.lp.names),
+        }
+
+    def apply(self, changes: List[Change]) -> None:
+        """Patch live sessions with committed changes."""
+        with self._lock:
+            for kind, name, field, value in changes:
+                if field == "rebuild":
+                    self.invalidate(kind, name)
+                    continue
+                if kind == "menu":
+                    solvers = list(self._menus.items())
+                else:
+                    solvers = [("feed", self._feed)]
+                for key, solver in solvers:
+                    if solver is None:
+                        continue
+                    if name not in solver.columns and self._may_enter(
+                        solver, name, field, value
+                    ):
+                        # Pruned from the catalog; the change may make it a
+                        # candidate, so rebuild rather than patch.
+                        self.invalidate(kind, None if kind == "feed" else key)
+                    elif field == "cost":
+                        solver.set_cost(name, value)
+                    else:
+                        solver.set_limits(name, **{field: value})
+
+    @staticmethod
+    def _may_enter(
+        solver: IncrementalSolver, name: str, field: str, value: Optional[float]
+    ) -> bool:
+        if field == "stock":
+            return value is None or value > 0
+        if field == "cost":
+            return solver.preferences.get(name, -np.inf) > (value or 0)
+        return False
+
+    def invalidate(
+        self, kind: Optional[str] = None, persona: Optional[str] = None
+    ) -> None:
+        """Drop sessions so they are rebuilt from the database on next use."""
+        with self._lock:
+            if kind in (None, "menu"):
+                if persona is None:
+                    self._menus.clear()
+                else:
+                    self._menus.pop(persona, None)
+            if kind in (None, "feed"):
+                self._feed = None
+
+    def clear(self) -> None:
+        self.invalidate()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            sessions = {f"menu:{p}": s for p, s in self._menus.items()}
+            if self._feed is not None:
+                sessions["feed"] = self._feed
+            return {key: dict(s.stats) for key, s in sessions.items()}
+
+    def watch(self) -> None:
+        """Follow committed ORM changes to ingredients and requirements."""
+        watch(self)
+
+    def unwatch(self) -> None:
+        unwatch(self)
+
+
+optimizers = OptimizerSessions()
+optimizers.watch()
@@ -1,89 +1,301 @@
-from typing import List
+"""Pull stock levels and yield forecasts from remote services.
+
+Supplier stock feeds can list tens of thousands of SKUs. The ingest
+functions stream the response and decode the JSON array one element at a
+time (:func:`iter_json_array`). They handle the items in chunks. Each chunk
+costs one ``IN`` query for the current values and one ``executemany`` per
+written table, and items that change nothing are skipped. The
+``*_items`` variants take an async iterator of items, for callers such as
+:mod:`app.sync` that make the request themselves.
+"""
+from datetime import date, datetime
+import json
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
 import httpx
-from sqlmodel import Session
+from sqlalchemy import bindparam, insert, update
+from sqlmodel import Session, select
 
+from .changes import record
 from .models import Ingredient, StockBatch, YieldForecast, AdjustmentLog, InventorySnapshot
 
+CHUNK = 5000
+_WHITESPACE = " \t\n\r"
+
+
+async def _pull(api_url: str, client: Optional[httpx.AsyncClient]) -> List[dict]:
+    if client is None:
+        async with httpx.AsyncClient() as owned:
+            return await _pull(api_url, owned)
+    resp = await client.get(api_url)
+    resp.raise_for_status()
+    return resp.json()
+
 
-async def pull_current_stocks(api_url: str) -> List[dict]:
+async def pull_current_stocks(
+    api_url: str, client: Optional[httpx.AsyncClient] = None
+) -> List[dict]:
     """Fetch current stock levels from an external service."""
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(api_url)
-        resp.raise_for_status()
-        return resp.json()
+    return await _pull(api_url, client)
 
 
-async def pull_les_yield_forecasts(api_url: str) -> List[dict]:
+async def pull_les_yield_forecasts(
+    api_url: str, client: Optional[httpx.AsyncClient] = None
+) -> List[dict]:
     """Fetch LES yield forecasts from an external service."""
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(api_url)
-        resp.raise_for_status()
-        return resp.json()
-
-
-async def ingest_inventory(stock_url: str, session: Session) -> None:
-    """Update ingredient stock levels from a remote source."""
-    stocks = await pull_current_stocks(stock_url)
-    for item in stocks:
-        ingredient = session.get(Ingredient, item["ingredient_id"])
-        if ingredient:
-            ingredient.stock_on_hand = item["stock_on_hand"]
-            session.add(
-                InventorySnapshot(
-                    ingredient_id=ingredient.ingredient_id,
-                    stock_on_hand=ingredient.stock_on_hand,
-                )
-            )
-    session.commit()
-
-
-async def ingest_forecasts(forecast_url: str, session: Session) -> None:
-    """Store yield forecasts and update batch metadata."""
-    forecasts = await pull_les_yield_forecasts(forecast_url)
-    for item in forecasts:
-        forecast = YieldForecast(
-            batch_id=item["batch_id"],
-            expected_harvest_date=item.get("expected_harvest_date"),
-            expected_yield_kg=item.get("expected_yield_kg"),
-            yield_std_kg=item.get("yield_std_kg"),
+    return await _pull(api_url, client)
+
+
+async def iter_json_array(chunks: AsyncIterator[str]) -> AsyncIterator[object]:
+    """Yield the elements of a top-level JSON array as its text arrives.
+
+    Only the element being decoded is buffered, not the whole document.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, started = "", 0, False
+    async for chunk in chunks:
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started, pos = True, pos + 1
+                continue
+            if buffer[pos] == "]":
+                return
+            if buffer[pos] == ",":
+                pos += 1
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # incomplete element; wait for more text
+            if end == len(buffer):
+                break  # a number may continue in the next chunk
+            yield item
+            pos = end
+    raise ValueError("Truncated JSON array")
+
+
+async def stream_json_array(
+    api_url: str, client: Optional[httpx.AsyncClient] = None
+) -> AsyncIterator[object]:
+    """Stream the elements of a remote JSON array without loading the body."""
+    owned = client is None
+    client = client or httpx.AsyncClient()
+    try:
+        async with client.stream("GET", api_url) as resp:
+            resp.raise_for_status()
+            async for item in iter_json_array(resp.aiter_text()):
+                yield item
+    finally:
+        if owned:
+            await client.aclose()
+
+
+async def _chunked(items: AsyncIterator, size: int) -> AsyncIterator[List]:
+    chunk: List = []
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _apply_stock(
+    session: Session, stocks: Dict[int, float], now: datetime
+) -> Tuple[int, int]:
+    """Write the changed stock levels of one chunk.
+
+    Returns:
+        the number of known ingredients and the number that changed.
+    """
+    rows = session.exec(
+        select(Ingredient.ingredient_id, Ingredient.name, Ingredient.stock_on_hand)
+        .where(Ingredient.ingredient_id.in_(list(stocks)))
+    ).all()
+    changed = [
+        (ingredient_id, name, stocks[ingredient_id])
+        for ingredient_id, name, current in rows
+        if current != stocks[ingredient_id]
+    ]
+    if not changed:
+        return len(rows), 0
+    conn = session.connection()
+    table = Ingredient.__table__
+    conn.execute(
+        update(table)
+        .where(table.c.ingredient_id == bindparam("id"))
+        .values(stock_on_hand=bindparam("stock")),
+        [{"id": i, "stock": stock} for i, _, stock in changed],
+    )
+    conn.execute(
+        insert(InventorySnapshot.__table__),
+        [
+            {"ingredient_id": i, "stock_on_hand": stock, "timestamp": now}
+            for i, _, stock in changed
+        ],
+    )
+    record(session, [("menu", name, "stock", stock) for _, name, stock in changed])
+    return len(rows), len(changed)
+
+
+async def ingest_stock_items(
+    session: Session, items: AsyncIterator[dict], chunk_size: int = CHUNK
+) -> Dict[str, int]:
+    """Apply ``{"ingredient_id", "stock_on_hand"}`` items as they arrive.
+
+    Only ingredients whose stock changed are updated and get an
+    ``InventorySnapshot``. Unknown ingredient ids are ignored. Each chunk
+    is committed when it is written, so no transaction stays open while
+    the next chunk downloads.
+
+    Returns:
+        counts of ``received`` items, ``updated`` and ``unchanged``
+        ingredients, and ``unknown`` ids.
+    """
+    now = datetime.utcnow()
+    counts = {"received": 0, "updated": 0, "unchanged": 0, "unknown": 0}
+    async for chunk in _chunked(items, chunk_size):
+        stocks = {item["ingredient_id"]: item["stock_on_hand"] for item in chunk}
+        known, updated = _apply_stock(session, stocks, now)
+        session.commit()
+        counts["received"] += len(chunk)
+        counts["updated"] += updated
+        counts["unchanged"] += known - updated
+        counts["unknown"] += len(stocks) - known
+    return counts
+
+
+async def ingest_inventory(
+    stock_url: str,
+    session: Session,
+    client: Optional[httpx.AsyncClient] = None,
+    chunk_size: int = CHUNK,
+) -> Dict[str, int]:
+    """Update ingredient stock levels from a remote source.
+
+    See :func:`ingest_stock_items` for what is written and returned.
+    """
+    items = stream_json_array(stock_url, client)
+    return await ingest_stock_items(session, items, chunk_size)
+
+
+FORECAST_FIELDS = ("expected_harvest_date", "expected_yield_kg", "yield_std_kg")
+
+
+def _forecast_values(item: dict) -> Dict[str, object]:
+    values = {field: item.get(field) for field in FORECAST_FIELDS}
+    if isinstance(values["expected_harvest_date"], str):
+        values["expected_harvest_date"] = date.fromisoformat(
+            values["expected_harvest_date"]
         )
-        session.add(forecast)
+    return values
 
-        batch = session.get(StockBatch, item["batch_id"])
-        if not batch:
-            continue
 
-        if forecast.expected_harvest_date and batch.expected_harvest_date != forecast.expected_harvest_date:
-            session.add(
-                AdjustmentLog(
-                    batch_id=batch.batch_id,
-                    field_name="expected_harvest_date",
-                    previous_value=str(batch.expected_harvest_date),
-                    new_value=str(forecast.expected_harvest_date),
-                )
-            )
-            batch.expected_harvest_date = forecast.expected_harvest_date
-
-        if forecast.expected_yield_kg is not None and batch.expected_yield_kg != forecast.expected_yield_kg:
-            session.add(
-                AdjustmentLog(
-                    batch_id=batch.batch_id,
-                    field_name="expected_yield_kg",
-                    previous_value=str(batch.expected_yield_kg),
-                    new_value=str(forecast.expected_yield_kg),
-                )
-            )
-            batch.expected_yield_kg = forecast.expected_yield_kg
-
-        if forecast.yield_std_kg is not None and batch.yield_std_kg != forecast.yield_std_kg:
-            session.add(
-                AdjustmentLog(
-                    batch_id=batch.batch_id,
-                    field_name="yield_std_kg",
-                    previous_value=str(batch.yield_std_kg),
-                    new_value=str(forecast.yield_std_kg),
-                )
+def _apply_forecasts(session: Session, items: List[dict], now: datetime) -> Dict:
+    """Write one chunk of forecasts; returns its counts."""
+    ids = {item["batch_id"] for item in items}
+    batches = {
+        row[0]: dict(zip(FORECAST_FIELDS, row[1:]))
+        for row in session.exec(
+            select(
+                StockBatch.batch_id,
+                StockBatch.expected_harvest_date,
+                StockBatch.expected_yield_kg,
+                StockBatch.yield_std_kg,
+            ).where(StockBatch.batch_id.in_(list(ids)))
+        )
+    }
+    counts = {"received": len(items), "updated": 0, "unchanged": 0, "unknown": 0}
+    forecasts, logs, changed = [], [], {}
+    for item in items:
+        batch_id = item["batch_id"]
+        values = _forecast_values(item)
+        batch = batches.get(batch_id)
+        diff = []
+        if batch is not None:
+            diff = [
+                (field, batch[field], value)
+                for field, value in values.items()
+                if value is not None and batch[field] != value
+            ]
+        if batch is not None and not diff:
+            counts["unchanged"] += 1
+            continue
+        forecasts.append({"batch_id": batch_id, "forecast_time": now, **values})
+        if batch is None:
+            counts["unknown"] += 1
+            continue
+        counts["updated"] += 1
+        for field, previous, value in diff:
+            logs.append(
+                {
+                    "batch_id": batch_id,
+                    "field_name": field,
+                    "previous_value": str(previous),
+                    "new_value": str(value),
+                    "timestamp": now,
+                }
             )
-            batch.yield_std_kg = forecast.yield_std_kg
+            batch[field] = value
+        changed[batch_id] = batch
+    conn = session.connection()
+    if forecasts:
+        conn.execute(insert(YieldForecast.__table__), forecasts)
+    if logs:
+        conn.execute(insert(AdjustmentLog.__table__), logs)
+    if changed:
+        table = StockBatch.__table__
+        conn.execute(
+            update(table)
+            .where(table.c.batch_id == bindparam("id"))
+            .values({field: bindparam(field) for field in FORECAST_FIELDS}),
+            [{"id": batch_id, **values} for batch_id, values in changed.items()],
+        )
+    return counts
+
+
+async def ingest_forecast_items(
+    session: Session, items: AsyncIterator[dict], chunk_size: int = CHUNK
+) -> Dict[str, int]:
+    """Store yield forecasts and update batch metadata as items arrive.
+
+    A forecast that matches its batch's current values is skipped. For the
+    rest, a ``YieldForecast`` row is stored, and each changed batch field
+    is written to ``AdjustmentLog`` and updated on the batch. Each chunk
+    costs one lookup query and one ``executemany`` per table, and is
+    committed when it is written.
+
+    Returns:
+        counts of ``received`` items, ``updated`` and ``unchanged`` batches,
+        and forecasts for ``unknown`` batches (stored without adjustments).
+    """
+    now = datetime.utcnow()
+    counts = {"received": 0, "updated": 0, "unchanged": 0, "unknown": 0}
+    async for chunk in _chunked(items, chunk_size):
+        for key, value in _apply_forecasts(session, chunk, now).items():
+            counts[key] += value
+        session.commit()
+    return counts
+
+
+async def ingest_forecasts(
+    forecast_url: str,
+    session: Session,
+    client: Optional[httpx.AsyncClient] = None,
+    chunk_size: int = CHUNK,
+) -> Dict[str, int]:
+    """Store yield forecasts and update batch metadata.
 
-    session.commit()
+    See :func:`ingest_forecast_items` for what is written and returned.
+    """
+    items = stream_json_array(forecast_url, client)
+    return await ingest_forecast_items(session, items, chunk_size)
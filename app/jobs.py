@@ -0,0 +1,387 @@
+"""Background optimization jobs run in a bounded process pool.
+
+The optimizer endpoints solve while the request waits, holding one of
+FastAPI's threadpool workers (and, for LES simulations, a network call) for
+the whole solve. ``POST /optimize/jobs`` instead loads any database inputs,
+hands the solve to a :class:`JobQueue` and returns a job id at once; clients
+poll ``GET /optimize/jobs/{id}`` or follow ``/optimize/jobs/{id}/events``.
+
+Jobs are keyed by their canonical inputs: submitting a problem that is
+already queued or running returns the existing job instead of solving it
+twice. Each job records when it was submitted, started and finished, so
+queue wait and solve time are reported separately.
+"""
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import partial
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlmodel import Session
+
+from .catalog import catalogs
+from .database import engine
+from .les_cache import les_cache
+from .les_client import get_client
+from .optimization import optimize_feed, optimize_household, optimize_menu
+from .planning import plan_periods
+from .reports import save_report
+from .solution_cache import canonical_key
+from .utils import plan_inputs
+
+KINDS = ("menu", "feed", "les", "aggregate", "household", "plan")
+PLAN_OPTIONS = {
+    "periods",
+    "granularity",
+    "feed_kg",
+    "start_week",
+    "hemisphere",
+    "holding_cost",
+}
+POLL_INTERVAL = 0.25
+
+
+def _timed(runner: Callable, args: tuple):
+    """Run ``runner(*args)`` in a worker; return start, end, result and error."""
+    started = time.time()
+    try:
+        result, error = runner(*args), None
+    except Exception as exc:  # reported on the job rather than raised
+        result, error = None, str(exc) or type(exc).__name__
+    return started, time.time(), result, error
+
+
+def _simulate_les(ingredients: List[Dict], requirements: Dict, base_url: str):
+    client = get_client(base_url)
+    simulator = les_cache.bind(client)
+    result = optimize_feed(ingredients, requirements, les_client=simulator)
+    result["cached"] = simulator.cached
+    with Session(engine) as session:
+        result["report_id"] = save_report(
+            session, result["plan"], result.get("kpis", {}), source="les"
+        )
+    return result
+
+
+def _aggregate(menu_inputs: tuple, feed_inputs: tuple):
+    return {"menu": optimize_menu(*menu_inputs), "feed": optimize_feed(*feed_inputs)}
+
+
+def _household(household_inputs: tuple, feed_inputs: tuple, shared: bool):
+    return {
+        "menus": optimize_household(*household_inputs, shared_inventory=shared),
+        "feed": optimize_feed(*feed_inputs),
+    }
+
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).isoformat()
+
+
+@dataclass(eq=False)
+class Job:
+    """One submitted solve and its timings (wall-clock seconds)."""
+
+    job_id: str
+    kind: str
+    key: str
+    submitted: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    result: object = None
+    error: Optional[str] = None
+    coalesced: int = 0
+    future: Optional[Future] = field(default=None, repr=False)
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def status(self) -> str:
+        if self.done.is_set():
+            return "failed" if self.error is not None else "done"
+        if self.future is not None and self.future.running():
+            return "running"
+        return "queued"
+
+    def report(self, result: bool = True) -> Dict:
+        """Status and timings; the result or error once finished."""
+        queue_wait = run_time = None
+        if self.started is not None:
+            queue_wait = self.started - self.submitted
+        if self.finished is not None and self.started is not None:
+            run_time = self.finished - self.started
+        report = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "submitted_at": _timestamp(self.submitted),
+            "started_at": _timestamp(self.started),
+            "finished_at": _timestamp(self.finished),
+            "queue_wait": queue_wait,
+            "run_time": run_time,
+            "coalesced": self.coalesced,
+        }
+        if result and self.done.is_set():
+            report["result"] = self.result
+            report["error"] = self.error
+        return report
+
+
+class JobQueue:
+    """Runs solves in a process pool, one job per distinct in-flight problem.
+
+    Args:
+        max_workers: pool size; defaults to ``OPTIMIZER_WORKERS`` or up to
+            four CPUs.
+        max_finished: finished jobs kept for polling before the oldest are
+            forgotten.
+        executor_factory: builds the executor from ``max_workers`` (tests use
+            a thread pool).
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_finished: int = 1000,
+        executor_factory: Optional[Callable[[int], Executor]] = None,
+    ) -> None:
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_finished = max_finished
+        self._factory = executor_factory or self._process_pool
+        self._executor: Optional[Executor] = None
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._inflight: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._counts = {"submitted": 0, "coalesced": 0, "done": 0, "failed": 0}
+        self._totals = {"queue_wait": 0.0, "run_time": 0.0}
+
+    @staticmethod
+    def _process_pool(max_workers: int) -> Executor:
+        # Forking a threaded server is unsafe; workers start from a clean
+        # server process instead.
+        context = multiprocessing.get_context("forkserver")
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+    def _pool(self) -> Executor:
+        if self._executor is None:
+            self._executor = self._factory(self.max_workers)
+        return self._executor
+
+    def submit(self, kind: str, key: str, runner: Callable, *args) -> Tuple[Job, bool]:
+        """Queue ``runner(*args)`` unless ``key`` is already in flight.
+
+        Returns:
+            the job and whether it was newly created.
+        """
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None:
+                job.coalesced += 1
+                self._counts["coalesced"] += 1
+                return job, False
+            job = Job(uuid.uuid4().hex, kind, key, time.time())
+            try:
+                job.future = self._pool().submit(_timed, runner, args)
+            except BrokenProcessPool:
+                # A worker died and took the pool with it; start a new one.
+                self._executor = None
+                job.future = self._pool().submit(_timed, runner, args)
+            self._jobs[job.job_id] = job
+            self._inflight[key] = job
+            self._counts["submitted"] += 1
+        job.future.add_done_callback(partial(self._finish, job))
+        self._prune()
+        return job, True
+
+    def map(self, fn: Callable, tasks: Iterable) -> List:
+        """``[fn(task) for task in tasks]``, run on the shared worker pool.
+
+        For request handlers that split one problem into independent parts;
+        ``fn`` and the tasks must pickle.
+        """
+        tasks = list(tasks)
+        with self._lock:
+            try:
+                futures = [self._pool().submit(fn, task) for task in tasks]
+            except BrokenProcessPool:
+                self._executor = None
+                futures = [self._pool().submit(fn, task) for task in tasks]
+        return [future.result() for future in futures]
+
+    def _finish(self, job: Job, future: Future) -> None:
+        try:
+            started, finished, result, error = future.result()
+        except Exception as exc:  # worker crashed or the result would not pickle
+            started = finished = time.time()
+            result, error = None, f"{type(exc).__name__}: {exc}"
+        with self._lock:
+            job.started, job.finished = started, finished
+            job.result, job.error = result, error
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            self._counts["failed" if error is not None else "done"] += 1
+            self._totals["queue_wait"] += started - job.submitted
+            self._totals["run_time"] += finished - started
+        job.done.set()
+
+    def _prune(self) -> None:
+        with self._lock:
+            finished = [j for j in self._jobs.values() if j.done.is_set()]
+            for job in finished[: max(0, len(finished) - self.max_finished)]:
+                del self._jobs[job.job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Job]:
+        """The job, after waiting up to ``timeout`` seconds for it to finish."""
+        job = self.get(job_id)
+        if job is not None:
+            job.done.wait(timeout)
+        return job
+
+    def events(self, job: Job, heartbeat: float = 15.0) -> Iterator[Dict]:
+        """Reports on every status change (and every ``heartbeat`` seconds)."""
+        last, sent = None, 0.0
+        while True:
+            status = job.status
+            now = time.monotonic()
+            if status != last or now - sent >= heartbeat:
+                yield job.report()
+                last, sent = status, now
+            if job.done.is_set():
+                return
+            job.done.wait(POLL_INTERVAL)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+            finished = self._counts["done"] + self._counts["failed"]
+            means = {
+                f"mean_{name}": total / finished if finished else 0.0
+                for name, total in self._totals.items()
+            }
+            return {
+                **self._counts,
+                **means,
+                "workers": self.max_workers,
+                "queued": sum(j.status == "queued" for j in jobs),
+                "running": sum(j.status == "running" for j in jobs),
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _digest(*parts) -> str:
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def job_spec(
+    session: Session,
+    kind: str,
+    ingredients: Optional[List[Dict]] = None,
+    requirements: Optional[Dict[str, float]] = None,
+    preferences: Optional[Dict[str, float]] = None,
+    caps: Optional[Dict[str, float]] = None,
+    inventory: Optional[Dict[str, float]] = None,
+    persona: Optional[str] = None,
+    personas: Optional[List[str]] = None,
+    options: Optional[Dict] = None,
+) -> Tuple[str, Callable, tuple]:
+    """Key, runner and arguments for a job of ``kind``.
+
+    ``menu``, ``feed`` and ``les`` solve the posted problem; ``aggregate``,
+    ``household`` and ``plan`` read their inputs from the database here, so
+    workers never open a session. Database-backed keys include the catalog
+    generations, so a job submitted after an ingredient change is not
+    coalesced with one that started before it.
+
+    Raises:
+        ValueError: unknown kind, missing persona or unknown plan option.
+    """
+    ingredients = ingredients or []
+    requirements = requirements or {}
+    options = options or {}
+    if kind == "menu":
+        key = canonical_key(
+            "menu", ingredients, requirements, preferences, caps, inventory
+        )
+        return key, optimize_menu, (
+            ingredients,
+            requirements,
+            preferences,
+            caps,
+            inventory,
+        )
+    if kind == "feed":
+        key = canonical_key("feed", ingredients, requirements, None, caps, inventory)
+        return key, optimize_feed, (ingredients, requirements, caps, inventory)
+    if kind == "les":
+        base_url = os.getenv("LES_URL", "http://localhost:8001")
+        key = _digest(canonical_key("les", ingredients, requirements), base_url)
+        return key, _simulate_les, (ingredients, requirements, base_url)
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {KINDS}")
+
+    feed_inputs = catalogs.feed_inputs(session)
+    if kind == "household":
+        if not personas:
+            raise ValueError("household jobs need personas")
+        shared = bool(options.get("shared_inventory", True))
+        household_inputs = catalogs.household_inputs(session, personas)
+        key = _digest(
+            kind,
+            household_inputs[0].generation,
+            feed_inputs[0].generation,
+            household_inputs[1:3],
+            feed_inputs[1],
+            shared,
+        )
+        return key, _household, (household_inputs, feed_inputs, shared)
+    if not persona:
+        raise ValueError(f"{kind} jobs need a persona")
+    if kind == "aggregate":
+        menu_inputs = catalogs.menu_inputs(session, persona)
+        key = _digest(
+            kind,
+            menu_inputs[0].generation,
+            feed_inputs[0].generation,
+            menu_inputs[1:3],
+            feed_inputs[1],
+        )
+        return key, _aggregate, (menu_inputs, feed_inputs)
+    unknown = set(options) - PLAN_OPTIONS
+    if unknown:
+        raise ValueError(f"Unknown plan options: {sorted(unknown)}")
+    inputs = plan_inputs(session, persona, **options)
+    key = _digest(
+        kind,
+        inputs.menu_ingredients.generation,
+        inputs.feed_ingredients.generation,
+        inputs.menu_requirements,
+        inputs.feed_requirements,
+        inputs.seasons,
+        inputs.feed_demand,
+        inputs.yields,
+        inputs.holding_cost,
+    )
+    return key, plan_periods, (inputs,)
+
+
+jobs = JobQueue(max_workers=int(os.getenv("OPTIMIZER_WORKERS", "0")) or None)
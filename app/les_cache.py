@@ -0,0 +1,217 @@
+"""Persistent memo of LES simulation results.
+
+Scenario exploration sends the same or nearly the same feed plans to LES
+again and again. :class:`LESCache` stores KPIs in a SQLite file keyed by
+:func:`plan_fingerprint`. The fingerprint is built from the plan rounded to
+a few significant digits, with zero amounts dropped, plus the LES version,
+so a plan that differs only by float noise reuses an earlier simulation.
+
+Entries expire after ``ttl`` seconds. Once the file holds more than
+``max_entries`` rows, the least recently read entries are evicted.
+Concurrent misses for the same fingerprint in one process are coalesced:
+one thread simulates and the others wait for its result.
+"""
+from dataclasses import dataclass, field
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+PLAN_DIGITS = 6
+ZERO = 1e-9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS les_results (
+    key TEXT PRIMARY KEY,
+    kpis TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_les_results_accessed ON les_results (accessed);
+"""
+
+
+def plan_fingerprint(
+    plan: Dict[str, float], version: str = "", digits: int = PLAN_DIGITS
+) -> str:
+    """Stable hash of ``plan`` rounded to ``digits`` significant digits."""
+    canonical = sorted(
+        (name, float(f"{float(amount):.{digits}g}"))
+        for name, amount in plan.items()
+        if amount is not None and abs(amount) > ZERO
+    )
+    payload = json.dumps([version, canonical], separators=(",", ":"))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+@dataclass
+class _Flight:
+    done: threading.Event = field(default_factory=threading.Event)
+    kpis: Optional[Dict[str, Any]] = None
+    error: Optional[BaseException] = None
+
+
+class LESCache:
+    """SQLite-backed LRU + TTL cache of LES KPIs.
+
+    Args:
+        path: SQLite file, created on first use (``:memory:`` for tests).
+        max_entries: rows kept before the least recently read are evicted.
+        ttl: seconds an entry stays valid; ``0`` disables expiry.
+        clock: wall-clock time source; entries outlive the process.
+    """
+
+    def __init__(
+        self,
+        path: str = "data/les_cache.sqlite",
+        max_entries: int = 10000,
+        ttl: float = 86400.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _Flight] = {}
+        self._counts = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+        self._coalesced = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory and self.path != ":memory:":
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False, isolation_level=None
+            )
+            if self.path != ":memory:":
+                db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+            self._db = db
+        return self._db
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM les_results")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = self.clock()
+        with self._lock:
+            db = self._connect()
+            row = db.execute(
+                "SELECT kpis, created FROM les_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl and row[1] + self.ttl <= now:
+                db.execute("DELETE FROM les_results WHERE key = ?", (key,))
+                self._counts["expired"] += 1
+                row = None
+            if row is None:
+                self._counts["misses"] += 1
+                return None
+            db.execute("UPDATE les_results SET accessed = ? WHERE key = ?", (now, key))
+            self._counts["hits"] += 1
+            return json.loads(row[0])
+
+    def put(self, key: str, kpis: Dict[str, Any]) -> None:
+        now = self.clock()
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO les_results VALUES (?, ?, ?, ?)",
+                (key, json.dumps(kpis), now, now),
+            )
+            (count,) = db.execute("SELECT COUNT(*) FROM les_results").fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                db.execute(
+                    "DELETE FROM les_results WHERE key IN (SELECT key FROM "
+                    "les_results ORDER BY accessed LIMIT ?)",
+                    (excess,),
+                )
+                self._counts["evicted"] += excess
+
+    def simulate(self, client, plan: Dict[str, float]) -> Tuple[Dict[str, Any], bool]:
+        """KPIs for ``plan`` from the cache or from ``client``.
+
+        Returns:
+            the KPIs and whether they came from the cache (including waiting
+            on an identical simulation already in flight).
+        """
+        version = getattr(client, "version", None) or client.base_url
+        key = plan_fingerprint(plan, version)
+        kpis = self.get(key)
+        if kpis is not None:
+            return kpis, True
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self._coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return dict(flight.kpis), True
+        try:
+            flight.kpis = client.run_simulation(plan)
+            self.put(key, flight.kpis)
+            return flight.kpis, False
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def bind(self, client) -> "MemoizedLES":
+        return MemoizedLES(self, client)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            (entries,) = (
+                self._connect().execute("SELECT COUNT(*) FROM les_results").fetchone()
+            )
+            lookups = self._counts["hits"] + self._counts["misses"]
+            return {
+                **self._counts,
+                "coalesced": self._coalesced,
+                "entries": entries,
+                "hit_rate": self._counts["hits"] / lookups if lookups else 0.0,
+            }
+
+
+class MemoizedLES:
+    """Drop-in ``les_client`` for the optimizers that reads through a cache.
+
+    ``cached`` tells whether the last simulation came from the cache.
+    """
+
+    def __init__(self, cache: LESCache, client) -> None:
+        self.cache = cache
+        self.client = client
+        self.cached: Optional[bool] = None
+
+    def run_simulation(self, plan: Dict[str, float]) -> Dict[str, Any]:
+        kpis, self.cached = self.cache.simulate(self.client, plan)
+        return kpis
+
+
+les_cache = LESCache(
+    path=os.getenv("LES_CACHE_PATH", "data/les_cache.sqlite"),
+    max_entries=int(os.getenv("LES_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("LES_CACHE_TTL", "86400")),
+)
@@ -1,13 +1,27 @@
-"""Client for interfacing with the LES simulation service."""
+"""Client for interfacing with the LES simulation service.
+
+Each :class:`LESClient` keeps long-lived ``httpx`` connection pools, one
+sync and one async, so repeated simulations reuse keep-alive connections
+instead of opening a TCP connection per plan. ``max_connections`` bounds
+both the pool and the number of simulations in flight. Transport errors,
+timeouts and 429/5xx responses are retried with exponential backoff.
+
+:func:`get_client` returns a shared client per base URL, so request
+handlers and job workers reuse its pool.
+"""
 from __future__ import annotations
 
-from datetime import datetime
-import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import os
-from typing import Dict, Any
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
 
 import httpx
 
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
 
 class LESClient:
     """Simple HTTP client for the LES environmental simulator.
@@ -15,30 +29,187 @@ class LESClient:
     The client sends diet or feed plans to the LES service and
     returns key environmental KPIs such as oxygen demand and
     nutrient cycling efficiency.
+
+    Args:
+        base_url: LES service root.
+        max_connections: pool size and limit on concurrent simulations.
+        timeout: per-request timeout in seconds.
+        retries: extra attempts after a retryable failure.
+        backoff: first retry delay in seconds; doubled on each attempt.
+        version: LES model version, part of cached result keys.
+        transport, async_transport: optional ``httpx`` transports (tests).
     """
 
-    def __init__(self, base_url: str) -> None:
+    def __init__(
+        self,
+        base_url: str,
+        max_connections: int = 8,
+        timeout: float = 30.0,
+        retries: int = 3,
+        backoff: float = 0.2,
+        version: Optional[str] = None,
+        transport: Optional[httpx.BaseTransport] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
         self.base_url = base_url.rstrip("/")
+        self.max_connections = max(1, max_connections)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.version = version
+        self._transport = transport
+        self._async_transport = async_transport
+        self._limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+        )
+        self._lock = threading.Lock()
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
 
-    def run_simulation(self, plan: Dict[str, float]) -> Dict[str, Any]:
-        """Submit a plan to LES and return parsed KPIs."""
-        try:
-            resp = httpx.post(f"{self.base_url}/simulate", json={"plan": plan})
-            resp.raise_for_status()
-        except httpx.HTTPError as exc:  # pragma: no cover - network failure
-            raise RuntimeError(f"LES request failed: {exc}") from exc
-        data = resp.json()
+    # -- connection pools -------------------------------------------------
+    def _sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    base_url=self.base_url,
+                    limits=self._limits,
+                    timeout=self.timeout,
+                    transport=self._transport,
+                )
+            return self._client
+
+    def _async_pool(self) -> httpx.AsyncClient:
+        # An AsyncClient is bound to the loop it first ran on.
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=self._limits,
+                timeout=self.timeout,
+                transport=self._async_transport,
+            )
+            self._async_loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+        return self._async_client
+
+    def close(self) -> None:
+        """Close the sync pool (the async pool closes with :meth:`aclose`)."""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_loop = None
+
+    def __enter__(self) -> "LESClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "LESClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    # -- simulations ------------------------------------------------------
+    @staticmethod
+    def _kpis(data: Dict[str, Any]) -> Dict[str, Any]:
         return {
             "oxygen_demand": data.get("oxygen_demand"),
             "nutrient_cycling": data.get("nutrient_cycling"),
             **{k: v for k, v in data.items() if k not in {"oxygen_demand", "nutrient_cycling"}},
         }
 
-    def save_report(self, plan: Dict[str, float], kpis: Dict[str, Any], directory: str = "data/reports") -> str:
-        """Store a scenario report for later comparison."""
-        os.makedirs(directory, exist_ok=True)
-        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-        path = os.path.join(directory, f"scenario_{timestamp}.json")
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump({"plan": plan, "kpis": kpis, "timestamp": timestamp}, f, indent=2)
-        return path
+    def _retryable(self, attempt: int, exc: httpx.HTTPError) -> bool:
+        if attempt >= self.retries:
+            return False
+        if isinstance(exc, httpx.HTTPStatusError):
+            return exc.response.status_code in RETRY_STATUSES
+        return isinstance(exc, httpx.TransportError)
+
+    def run_simulation(self, plan: Dict[str, float]) -> Dict[str, Any]:
+        """Submit a plan to LES and return parsed KPIs."""
+        client = self._sync_client()
+        attempt = 0
+        while True:
+            try:
+                resp = client.post("/simulate", json={"plan": plan})
+                resp.raise_for_status()
+                return self._kpis(resp.json())
+            except httpx.HTTPError as exc:
+                if not self._retryable(attempt, exc):
+                    raise RuntimeError(f"LES request failed: {exc}") from exc
+            time.sleep(self.backoff * 2**attempt)
+            attempt += 1
+
+    async def arun_simulation(self, plan: Dict[str, float]) -> Dict[str, Any]:
+        """Async :meth:`run_simulation`, limited to ``max_connections`` at once."""
+        client = self._async_pool()
+        async with self._semaphore:
+            attempt = 0
+            while True:
+                try:
+                    resp = await client.post("/simulate", json={"plan": plan})
+                    resp.raise_for_status()
+                    return self._kpis(resp.json())
+                except httpx.HTTPError as exc:
+                    if not self._retryable(attempt, exc):
+                        raise RuntimeError(f"LES request failed: {exc}") from exc
+                await asyncio.sleep(self.backoff * 2**attempt)
+                attempt += 1
+
+    def run_many(self, plans: Sequence[Dict[str, float]]) -> List[Dict[str, Any]]:
+        """Simulate ``plans`` concurrently; KPIs are returned in input order."""
+        if len(plans) <= 1:
+            return [self.run_simulation(plan) for plan in plans]
+        workers = min(self.max_connections, len(plans))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(self.run_simulation, plans))
+
+    async def arun_many(
+        self, plans: Sequence[Dict[str, float]]
+    ) -> List[Dict[str, Any]]:
+        """Async :meth:`run_many`."""
+        return list(await asyncio.gather(*(self.arun_simulation(p) for p in plans)))
+
+
+_clients: Dict[str, LESClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url: Optional[str] = None) -> LESClient:
+    """Shared client for ``base_url`` (default: ``LES_URL``).
+
+    Pool size, timeout, retries and version come from
+    ``LES_MAX_CONNECTIONS``, ``LES_TIMEOUT``, ``LES_RETRIES`` and
+    ``LES_VERSION``.
+    """
+    url = (base_url or os.getenv("LES_URL", "http://localhost:8001")).rstrip("/")
+    with _clients_lock:
+        client = _clients.get(url)
+        if client is None:
+            client = _clients[url] = LESClient(
+                url,
+                max_connections=int(os.getenv("LES_MAX_CONNECTIONS", "8")),
+                timeout=float(os.getenv("LES_TIMEOUT", "30")),
+                retries=int(os.getenv("LES_RETRIES", "3")),
+                version=os.getenv("LES_VERSION") or None,
+            )
+        return client
+
+
+def close_clients() -> None:
+    """Close every shared client's sync pool."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -0,0 +1,308 @@
+"""Sparse linear programs and the pluggable backends that solve them.
+
+Problems are assembled once as a :class:`LinearProgram` whose constraint
+matrix is a SciPy CSR matrix and then handed to a backend:
+
+* ``glop`` – OR-Tools GLOP, loaded in bulk from an ``MPModelProto``;
+* ``highs`` – SciPy's HiGHS interface (:func:`scipy.optimize.linprog`);
+* ``greedy`` – a vectorised cost-per-nutrient heuristic used when no LP
+  solver is installed.
+
+``auto`` picks the first available backend in that order. The default can be
+overridden with the ``OPTIMIZER_BACKEND`` environment variable.
+"""
+from dataclasses import dataclass
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy import sparse
+
+try:
+    from ortools.linear_solver import linear_solver_pb2, pywraplp
+except Exception:  # pragma: no cover - fallback when ortools missing
+    pywraplp = None
+
+try:
+    from scipy.optimize import linprog
+except Exception:  # pragma: no cover - fallback when scipy.optimize missing
+    linprog = None
+
+OPTIMAL = "optimal"
+FEASIBLE = "feasible"
+INFEASIBLE = "infeasible"
+UNBOUNDED = "unbounded"
+ABNORMAL = "abnormal"
+TIME_LIMIT = "time_limit"
+
+TOLERANCE = 1e-7
+
+
+@dataclass
+class LinearProgram:
+    """``min cost @ x`` subject to row and variable bounds.
+
+    ``row_lower <= matrix @ x <= row_upper`` and ``lower <= x <= upper``;
+    infinite entries mark missing bounds.
+    """
+
+    cost: np.ndarray
+    matrix: sparse.csr_matrix
+    row_lower: np.ndarray
+    row_upper: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+    names: List[str]
+    row_names: List[str]
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def row_violations(self, x: np.ndarray) -> np.ndarray:
+        """Per row, how far ``matrix @ x`` lies outside its bounds."""
+        activity = self.matrix @ x
+        return np.maximum(
+            np.maximum(self.row_lower - activity, activity - self.row_upper), 0.0
+        )
+
+    def violation(self, x: np.ndarray) -> float:
+        """Largest constraint or bound violation of ``x``."""
+        return max(
+            float(np.max(self.row_violations(x), initial=0.0)),
+            float(np.max(self.lower - x, initial=0.0)),
+            float(np.max(x - self.upper, initial=0.0)),
+        )
+
+
+@dataclass
+class LPSolution:
+    """Result of solving a :class:`LinearProgram`."""
+
+    status: str
+    x: np.ndarray
+    objective: float
+    backend: str
+    row_duals: Optional[np.ndarray] = None
+    reduced_costs: Optional[np.ndarray] = None
+    gap: Optional[float] = None
+    elapsed: Optional[float] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status in (OPTIMAL, FEASIBLE)
+
+    def plan(self, names: List[str]) -> Dict[str, float]:
+        return dict(zip(names, self.x.tolist()))
+
+
+def nutrient_matrix(ingredients: List[Dict], nutrients: List[str]) -> sparse.csr_matrix:
+    """Build a ``nutrients x ingredients`` CSR matrix in one pass over the data."""
+    index = {name: i for i, name in enumerate(nutrients)}
+    rows: List[int] = []
+    cols: List[int] = []
+    vals: List[float] = []
+    for j, ing in enumerate(ingredients):
+        for nutrient, amount in ing["nutrients"].items():
+            i = index.get(nutrient)
+            if i is not None and amount:
+                rows.append(i)
+                cols.append(j)
+                vals.append(amount)
+    return sparse.csr_matrix(
+        (vals, (rows, cols)), shape=(len(nutrients), len(ingredients)), dtype=float
+    )
+
+
+class GlopBackend:
+    """OR-Tools GLOP loaded from a protobuf built row by row with bulk copies."""
+
+    name = "glop"
+
+    def load(self, lp: LinearProgram):
+        solver = pywraplp.Solver.CreateSolver("GLOP")
+        if solver is None:
+            raise RuntimeError("GLOP solver unavailable")
+        proto = linear_solver_pb2.MPModelProto()
+        for cost, lower, upper in zip(
+            lp.cost.tolist(), lp.lower.tolist(), lp.upper.tolist()
+        ):
+            var = proto.variable.add()
+            var.lower_bound = lower
+            var.upper_bound = upper
+            var.objective_coefficient = cost
+        matrix = lp.matrix
+        row_bounds = zip(lp.row_lower.tolist(), lp.row_upper.tolist())
+        for i, (lower, upper) in enumerate(row_bounds):
+            start, end = matrix.indptr[i], matrix.indptr[i + 1]
+            ct = proto.constraint.add()
+            ct.var_index.extend(matrix.indices[start:end].tolist())
+            ct.coefficient.extend(matrix.data[start:end].tolist())
+            ct.lower_bound = lower
+            ct.upper_bound = upper
+        error = solver.LoadModelFromProto(proto)
+        if error:
+            raise RuntimeError(f"GLOP rejected model: {error}")
+        return solver
+
+    def run(self, solver, time_limit: Optional[float] = None) -> LPSolution:
+        if time_limit is not None:
+            solver.SetTimeLimit(max(1, int(time_limit * 1000)))
+        status = solver.Solve()
+        response = linear_solver_pb2.MPSolutionResponse()
+        solver.FillSolutionResponseProto(response)
+        statuses = {
+            pywraplp.Solver.OPTIMAL: OPTIMAL,
+            pywraplp.Solver.FEASIBLE: FEASIBLE,
+            pywraplp.Solver.INFEASIBLE: INFEASIBLE,
+            pywraplp.Solver.UNBOUNDED: UNBOUNDED,
+            pywraplp.Solver.NOT_SOLVED: TIME_LIMIT,
+        }
+        x = np.array(response.variable_value)
+        if not len(x):
+            x = np.zeros(solver.NumVariables())
+        return LPSolution(
+            status=statuses.get(status, ABNORMAL),
+            x=x,
+            objective=response.objective_value,
+            backend=self.name,
+            row_duals=np.array(response.dual_value) if response.dual_value else None,
+            reduced_costs=(
+                np.array(response.reduced_cost) if response.reduced_cost else None
+            ),
+        )
+
+    def solve(
+        self, lp: LinearProgram, time_limit: Optional[float] = None
+    ) -> LPSolution:
+        return self.run(self.load(lp), time_limit)
+
+
+class HighsBackend:
+    """HiGHS through :func:`scipy.optimize.linprog` on the sparse matrix."""
+
+    name = "highs"
+
+    def solve(
+        self, lp: LinearProgram, time_limit: Optional[float] = None
+    ) -> LPSolution:
+        A = lp.matrix
+        equal = np.isfinite(lp.row_lower) & (lp.row_lower == lp.row_upper)
+        has_upper = np.isfinite(lp.row_upper) & ~equal
+        has_lower = np.isfinite(lp.row_lower) & ~equal
+        A_ub = sparse.vstack([A[has_upper], -A[has_lower]], format="csr")
+        b_ub = np.concatenate([lp.row_upper[has_upper], -lp.row_lower[has_lower]])
+        kwargs = {}
+        if A_ub.shape[0]:
+            kwargs.update(A_ub=A_ub, b_ub=b_ub)
+        if equal.any():
+            kwargs.update(A_eq=A[equal], b_eq=lp.row_lower[equal])
+        if time_limit is not None:
+            kwargs["options"] = {"time_limit": max(time_limit, 1e-3)}
+        res = linprog(
+            lp.cost,
+            bounds=np.column_stack([lp.lower, lp.upper]),
+            method="highs",
+            **kwargs,
+        )
+        statuses = {0: OPTIMAL, 1: TIME_LIMIT, 2: INFEASIBLE, 3: UNBOUNDED}
+        status = statuses.get(res.status, ABNORMAL)
+        x = res.x if res.x is not None else np.zeros(len(lp.cost))
+        row_duals = reduced = None
+        if status == OPTIMAL:
+            row_duals = np.zeros(A.shape[0])
+            if A_ub.shape[0]:
+                upper_count = int(has_upper.sum())
+                marginals = res.ineqlin.marginals
+                row_duals[has_upper] = marginals[:upper_count]
+                row_duals[has_lower] -= marginals[upper_count:]
+            if equal.any():
+                row_duals[equal] = res.eqlin.marginals
+            reduced = res.lower.marginals + res.upper.marginals
+        return LPSolution(
+            status=status,
+            x=np.asarray(x, dtype=float),
+            objective=float(res.fun) if res.fun is not None else float("nan"),
+            backend=self.name,
+            row_duals=row_duals,
+            reduced_costs=reduced,
+        )
+
+
+class GreedyBackend:
+    """Cheapest-cost-per-unit heuristic for covering constraints.
+
+    Each ``>=`` row is topped up in turn from the ingredients with the lowest
+    cost per unit of that row, counting what earlier rows already contributed
+    and respecting variable upper bounds. Equality rows are then met by
+    rescaling, which is how feed fractions are normalised to sum to one.
+    """
+
+    name = "greedy"
+
+    def solve(
+        self, lp: LinearProgram, time_limit: Optional[float] = None
+    ) -> LPSolution:
+        matrix = lp.matrix
+        x = np.maximum(lp.lower, 0.0).astype(float)
+        equal = lp.row_lower == lp.row_upper
+        for i in np.flatnonzero(np.isfinite(lp.row_lower) & ~equal):
+            start, end = matrix.indptr[i], matrix.indptr[i + 1]
+            cols = matrix.indices[start:end]
+            coefs = matrix.data[start:end]
+            positive = coefs > 0
+            cols, coefs = cols[positive], coefs[positive]
+            remaining = lp.row_lower[i] - float(coefs @ x[cols])
+            if remaining <= 0 or not len(cols):
+                continue
+            order = np.argsort(lp.cost[cols] / coefs, kind="stable")
+            cols, coefs = cols[order], coefs[order]
+            capacity = np.maximum(lp.upper[cols] - x[cols], 0.0) * coefs
+            before = np.concatenate(([0.0], np.cumsum(capacity)[:-1]))
+            supplied = np.clip(remaining - before, 0.0, capacity)
+            x[cols] += supplied / coefs
+        for i in np.flatnonzero(equal):
+            start, end = matrix.indptr[i], matrix.indptr[i + 1]
+            cols = matrix.indices[start:end]
+            activity = float(matrix.data[start:end] @ x[cols])
+            if activity > 0:
+                x[cols] *= lp.row_lower[i] / activity
+        status = FEASIBLE if lp.violation(x) <= 1e-6 else INFEASIBLE
+        return LPSolution(
+            status=status, x=x, objective=float(lp.cost @ x), backend=self.name
+        )
+
+
+BACKENDS = {
+    "glop": GlopBackend,
+    "highs": HighsBackend,
+    "greedy": GreedyBackend,
+}
+
+
+def available_backends() -> List[str]:
+    names = []
+    if pywraplp is not None:
+        names.append("glop")
+    if linprog is not None:
+        names.append("highs")
+    names.append("greedy")
+    return names
+
+
+def get_backend(name: Optional[str] = None):
+    """Instantiate a backend by name; ``None``/``"auto"`` picks the best available."""
+    name = name or os.getenv("OPTIMIZER_BACKEND", "auto")
+    if name == "auto":
+        name = available_backends()[0]
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown optimizer backend: {name}")
+    if name not in available_backends():
+        raise RuntimeError(f"Optimizer backend {name!r} is not installed")
+    return BACKENDS[name]()
+
+
+def solve(
+    lp: LinearProgram, backend: Optional[str] = None, time_limit: Optional[float] = None
+) -> LPSolution:
+    return get_backend(backend).solve(lp, time_limit)
@@ -1,15 +1,22 @@
 from datetime import datetime, date
-
-from datetime import datetime
-import os
+import json
 from typing import List, Optional
 
-from fastapi import FastAPI, Depends, Query, Request
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from sqlmodel import Session, select
 
-from .database import create_db_and_tables, get_session
+from .archive import aggregate_readings, archive, merge_latest
+from .database import create_db_and_tables, engine, get_session
+from .export import DATASETS as EXPORT_DATASETS, MEDIA_TYPES, available_formats, stream_export
+from .filtering import METHODS as FILTER_METHODS, cache as filter_cache
+from .forecasting import registry as forecasts
+from .incremental import optimizers
+from .jobs import job_spec, jobs
+from .les_cache import les_cache
+from .les_client import close_clients, get_client
 from .models import (
     AdjustmentLog,
     EventLog,
@@ -23,20 +30,37 @@ from .models import (
     WaterTarget,
     YieldForecast,
 )
-
-from .les_client import LESClient
-from .models import (EventLog, FeedLog, GrowthRecord, Species,
-                     StockBatch, WaterReading, WaterTarget)
-
-from .optimization import optimize_feed, optimize_menu
-from .utils import run_optimizations
+from .nutrients import find_ingredients, parse_bounds
+from .optimization import analyse, optimize_feed, optimize_menu, scenario_costs
+from .pareto import pareto_front
+from .reports import diff_reports, get_report, list_reports, save_report
+from .solution_cache import analyses, canonical_key, solutions
+from .sync import syncer
+from .tsstore import TimeSeriesStore
+from .utils import run_household, run_plan
 
 app = FastAPI()
 templates = Jinja2Templates(directory="app/templates")
+stream_store = TimeSeriesStore(engine)
 
 @app.on_event("startup")
 def on_startup():
     create_db_and_tables()
+    with Session(engine) as session:
+        forecasts.fit_from_history(session)
+
+@app.on_event("startup")
+async def start_sync():
+    syncer.start()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    jobs.shutdown()
+    close_clients()
+
+@app.on_event("shutdown")
+async def stop_sync():
+    await syncer.stop()
 
 @app.get("/")
 def dashboard(request: Request):
@@ -47,6 +71,7 @@ def create_reading(reading: WaterReading, session: Session = Depends(get_session
     session.add(reading)
     session.commit()
     session.refresh(reading)
+    forecasts.update(reading.parameter, reading.value, reading.location)
 
     target = session.exec(
         select(WaterTarget).where(
@@ -87,13 +112,122 @@ def list_readings(
         data = r.dict()
         data["breach"] = breach
         results.append(data)
+    newest_archived = archive.newest()
+    if newest_archived is not None and (
+        len(results) < limit or results[-1]["timestamp"] <= newest_archived
+    ):
+        archived = archive.latest(parameter, start, end, limit)
+        results = merge_latest(results, archived, limit)
     return results
 
+@app.get("/readings/aggregate")
+def aggregate(
+    parameter: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    session: Session = Depends(get_session),
+):
+    """Count, min, max and mean per parameter across live and archived readings."""
+    return aggregate_readings(session, archive, parameter, start, end)
+
+@app.get("/readings/filtered")
+def filtered_readings(
+    parameter: str,
+    location: Optional[str] = None,
+    method: str = "hampel",
+    window: float = Query(300.0, gt=0),
+    n_sigmas: float = Query(3.0, gt=0),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    session: Session = Depends(get_session),
+):
+    """Filter a stream server-side using a time-based window (in seconds).
+
+    Without ``start`` only the most recent day of readings is returned.
+    """
+    if method not in FILTER_METHODS:
+        raise HTTPException(status_code=422, detail=f"method must be one of {FILTER_METHODS}")
+    return filter_cache.filtered(
+        session, parameter, location, method, window, n_sigmas, start, end
+    )
+
+@app.get("/readings/forecast")
+def forecast_readings(
+    parameter: str,
+    location: Optional[str] = None,
+    horizon: int = Query(10, ge=1, le=1000),
+):
+    """Serve a short-horizon forecast for one stream from memory."""
+    result = forecasts.forecast(parameter, location, horizon)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Unknown stream")
+    return result
+
+class StreamSamples(BaseModel):
+    timestamps: List[datetime]
+    values: List[float]
+
+
+@app.post("/streams/{stream}")
+def append_stream(stream: str, samples: StreamSamples):
+    """Append a batch of samples to the compressed store for a high-rate sensor."""
+    try:
+        stream_store.append(stream, samples.timestamps, samples.values)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return {"stream": stream, "appended": len(samples.values)}
+
+
+@app.get("/streams/{stream}")
+def read_stream(
+    stream: str, start: Optional[datetime] = None, end: Optional[datetime] = None
+):
+    """Range scan over a compressed sensor stream."""
+    timestamps, values = stream_store.range(stream, start, end)
+    return {
+        "stream": stream,
+        "timestamps": timestamps.astype(datetime).tolist(),
+        "values": values.tolist(),
+    }
+
+@app.get("/export/{dataset}")
+def export_dataset(
+    dataset: str,
+    format: str = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    """Stream a full dataset as CSV, NDJSON or Parquet with constant memory."""
+    if dataset not in EXPORT_DATASETS:
+        raise HTTPException(status_code=404, detail="Unknown dataset")
+    if format not in available_formats():
+        raise HTTPException(
+            status_code=422, detail=f"format must be one of {available_formats()}"
+        )
+    body = stream_export(engine, dataset, format, start, end, archive=archive)
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{dataset}.{format}"'
+        },
+    )
+
 @app.get("/alerts", response_model=List[EventLog])
 def get_alerts(session: Session = Depends(get_session)):
     stmt = select(EventLog).order_by(EventLog.timestamp.desc())
     return session.exec(stmt).all()
 
+@app.get("/alerts/predicted")
+def get_predicted_alerts(
+    horizon: int = Query(10, ge=1, le=1000),
+    session: Session = Depends(get_session),
+):
+    """Alerts for streams whose forecast leaves the target range."""
+    return forecasts.predicted_alerts(session, horizon)
+
 @app.get("/fcr")
 def calculate_fcr(batch_id: int, session: Session = Depends(get_session)):
     total_feed = session.exec(
@@ -148,6 +282,29 @@ def update_inventory(update: InventoryUpdate, session: Session = Depends(get_ses
     return ingredient
 
 
+@app.get("/ingredients/search")
+def search_ingredients(
+    kind: str = "menu",
+    minimums: List[str] = Query([], alias="min", description="nutrient:amount"),
+    maximums: List[str] = Query([], alias="max", description="nutrient:amount"),
+    max_cost: Optional[float] = None,
+    in_stock: bool = False,
+    session: Session = Depends(get_session),
+):
+    """Ingredients by nutrient thresholds, e.g. ``?min=protein:0.3&max_cost=2``."""
+    try:
+        return find_ingredients(
+            session,
+            kind,
+            minimums=parse_bounds(minimums),
+            maximums=parse_bounds(maximums),
+            max_cost=max_cost,
+            in_stock=in_stock,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+
 @app.post("/forecasts", response_model=YieldForecast)
 def update_forecast(update: ForecastUpdate, session: Session = Depends(get_session)):
     forecast = YieldForecast(
@@ -203,34 +360,353 @@ class IngredientInput(BaseModel):
 class OptimizationRequest(BaseModel):
     ingredients: List[IngredientInput]
     requirements: dict
+    preferences: Optional[dict] = None
+    caps: Optional[dict] = None
+    inventory: Optional[dict] = None
+    time_limit: Optional[float] = Field(None, gt=0)
 
 
 @app.post("/optimize/human-menu")
 def human_menu(req: OptimizationRequest):
+    """Least-cost menu.
+
+    With ``time_limit`` (seconds) the response is a report with the plan,
+    ``status`` (optimal, feasible, relaxed or time_limit), ``gap``,
+    ``elapsed`` and ``violations``, and it is never cached.
+    """
     ingredients = [i.dict() for i in req.ingredients]
-    solution = optimize_menu(ingredients, req.requirements)
+    if req.time_limit is not None:
+        return optimize_menu(
+            ingredients,
+            req.requirements,
+            req.preferences,
+            req.caps,
+            req.inventory,
+            time_limit=req.time_limit,
+        )
+    solution = solutions.optimize_menu(
+        ingredients, req.requirements, req.preferences, req.caps, req.inventory
+    )
     return solution
 
 
 @app.post("/optimize/fish-feed")
 def fish_feed(req: OptimizationRequest):
+    """Least-cost feed; ``time_limit`` works as for the human menu."""
     ingredients = [i.dict() for i in req.ingredients]
-    solution = optimize_feed(ingredients, req.requirements)
+    if req.time_limit is not None:
+        return optimize_feed(
+            ingredients,
+            req.requirements,
+            req.caps,
+            req.inventory,
+            time_limit=req.time_limit,
+        )
+    solution = solutions.optimize_feed(
+        ingredients, req.requirements, req.caps, req.inventory
+    )
     return solution
 
 
+class WhatIfScenario(BaseModel):
+    prices: dict = {}
+    price_changes: dict = {}
+    requirements: dict = {}
+
+
+class WhatIfRequest(OptimizationRequest):
+    kind: str = "feed"
+    scenarios: List[WhatIfScenario] = []
+
+
+@app.post("/optimize/what-if")
+def what_if(req: WhatIfRequest):
+    """Answer price and requirement perturbations of a menu or feed.
+
+    Scenarios within the baseline's ranging intervals are answered from its
+    duals and basis without solving; the rest are re-solved. The baseline
+    analysis is cached, so repeated questions about the same problem only
+    pay for the scenarios themselves.
+    """
+    if req.kind not in ("menu", "feed"):
+        raise HTTPException(status_code=422, detail="kind must be 'menu' or 'feed'")
+    ingredients = [i.dict() for i in req.ingredients]
+    preferences = req.preferences if req.kind == "menu" else None
+    key = canonical_key(
+        f"{req.kind}:analysis",
+        ingredients,
+        req.requirements,
+        preferences,
+        req.caps,
+        req.inventory,
+    )
+    try:
+        analysis = analyses.cached(
+            req.kind,
+            key,
+            [i["name"] for i in ingredients],
+            lambda: analyse(
+                req.kind,
+                ingredients,
+                req.requirements,
+                preferences,
+                req.caps,
+                req.inventory,
+            ),
+        )
+        scenarios = [
+            scenario_costs(ingredients, s.dict(), preferences) for s in req.scenarios
+        ]
+        results = analysis.what_if(scenarios)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    baseline = {"plan": analysis.solution.plan(analysis.lp.names), **analysis.report()}
+    return {"baseline": baseline, "scenarios": results}
+
+
+class JobRequest(BaseModel):
+    kind: str
+    ingredients: List[IngredientInput] = []
+    requirements: dict = {}
+    preferences: Optional[dict] = None
+    caps: Optional[dict] = None
+    inventory: Optional[dict] = None
+    persona: Optional[str] = None
+    personas: List[str] = []
+    options: dict = {}
+
+
+@app.post("/optimize/jobs", status_code=202)
+def submit_job(req: JobRequest, session: Session = Depends(get_session)):
+    """Queue a solve and return its job id without waiting for it.
+
+    ``menu``, ``feed`` and ``les`` jobs solve the posted problem;
+    ``aggregate``, ``household`` and ``plan`` jobs use database inputs for
+    ``persona``/``personas`` (``options`` holds the plan or household
+    parameters). Submitting a problem that is already in flight returns the
+    existing job.
+    """
+    try:
+        key, runner, args = job_spec(
+            session,
+            req.kind,
+            [i.dict() for i in req.ingredients],
+            req.requirements,
+            req.preferences,
+            req.caps,
+            req.inventory,
+            req.persona,
+            req.personas,
+            req.options,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    job, created = jobs.submit(req.kind, key, runner, *args)
+    return {**job.report(result=False), "created": created}
+
+
+@app.get("/optimize/jobs")
+def job_stats():
+    """Queue depth, outcomes and mean queue wait and solve time."""
+    return jobs.stats()
+
+
+@app.get("/optimize/jobs/{job_id}")
+def get_job(job_id: str, wait: float = Query(0.0, ge=0, le=60)):
+    """Status and timings of a job; the result once it has finished.
+
+    ``wait`` long-polls for up to that many seconds.
+    """
+    job = jobs.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.report()
+
+
+@app.get("/optimize/jobs/{job_id}/events")
+def job_events(job_id: str):
+    """Server-sent events with the job report on every status change."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    body = (f"data: {json.dumps(report)}\n\n" for report in jobs.events(job))
+    return StreamingResponse(body, media_type="text/event-stream")
+
+
+class ParetoRequest(OptimizationRequest):
+    kind: str = "menu"
+    objective: str = "purchased"
+    on_farm: List[str] = []
+    points: int = Field(11, ge=2, le=101)
+    method: str = "epsilon"
+    workers: int = Field(1, ge=1)
+
+
+@app.post("/optimize/pareto")
+def pareto(req: ParetoRequest):
+    """Cost against purchased quantity or nutrient surplus.
+
+    Returns the non-dominated ``[cost, objective]`` pairs as ``front`` and
+    the matching ``plans`` over the ingredients in ``names``. With
+    ``workers`` > 1 the points are split into that many chunks and solved in
+    parallel on the job worker pool.
+    """
+    try:
+        return pareto_front(
+            req.kind,
+            [i.dict() for i in req.ingredients],
+            req.requirements,
+            req.objective,
+            req.on_farm,
+            req.preferences,
+            req.caps,
+            req.inventory,
+            points=req.points,
+            method=req.method,
+            workers=req.workers,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+
+@app.get("/optimize/cache")
+def optimization_cache_stats():
+    """Hit rate and size of the optimization result cache."""
+    return solutions.stats()
+
+
 @app.post("/simulate/les")
-def simulate_les(req: OptimizationRequest):
+def simulate_les(req: OptimizationRequest, session: Session = Depends(get_session)):
     """Optimize the feed plan and run an LES simulation.
 
-    Stores a scenario report containing the plan and resulting KPIs.
+    Stores a scenario report containing the plan and resulting KPIs; its id
+    is returned as ``report_id``. ``cached`` tells whether the KPIs came
+    from the LES result cache.
     """
     ingredients = [i.dict() for i in req.ingredients]
-    client = LESClient(base_url=os.getenv("LES_URL", "http://localhost:8001"))
-    result = optimize_feed(ingredients, req.requirements, les_client=client)
-    client.save_report(result["plan"], result.get("kpis", {}))
+    simulator = les_cache.bind(get_client())
+    result = optimize_feed(ingredients, req.requirements, les_client=simulator)
+    result["cached"] = simulator.cached
+    result["report_id"] = save_report(
+        session, result["plan"], result.get("kpis", {}), source="les"
+    )
     return result
+
+
+@app.get("/simulate/les/cache")
+def les_cache_stats():
+    """Hit rate and size of the LES result cache."""
+    return les_cache.stats()
+
+
+@app.get("/sync")
+def sync_stats():
+    """Per-source latency, item counts and errors of the stock/forecast sync."""
+    return syncer.stats()
+
+
+@app.post("/sync")
+async def sync_now():
+    """Pull every configured source now instead of waiting for the schedule.
+
+    Sources the background loop is already pulling are skipped; their
+    current stats are returned.
+    """
+    return await syncer.sync_once()
+
+
+@app.get("/reports")
+def scenario_reports(
+    minimums: List[str] = Query([], alias="min", description="kpi:value"),
+    maximums: List[str] = Query([], alias="max", description="kpi:value"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    session: Session = Depends(get_session),
+):
+    """Scenario reports, newest first, e.g. ``?max=oxygen_demand:400``."""
+    try:
+        return list_reports(
+            session,
+            minimums=parse_bounds(minimums),
+            maximums=parse_bounds(maximums),
+            since=since,
+            until=until,
+            limit=limit,
+            offset=offset,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+
+@app.get("/reports/diff")
+def scenario_report_diff(a: int, b: int, session: Session = Depends(get_session)):
+    """Two reports' plans and KPIs side by side with ``b - a`` deltas."""
+    try:
+        return diff_reports(session, a, b)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail=f"Report {exc.args[0]} not found")
+
+
+@app.get("/reports/{report_id}")
+def scenario_report(report_id: int, session: Session = Depends(get_session)):
+    report = get_report(session, report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report
+
+
 @app.get("/optimize/aggregate")
 def optimize_aggregate(persona: str, session: Session = Depends(get_session)):
-    """Run both optimizers using database data and aggregate results."""
-    return run_optimizations(session, persona)
+    """Run both optimizers using database data and aggregate results.
+
+    Solvers are kept between calls and patched as ingredient prices and
+    stock change, so repeated calls only re-solve what moved.
+    """
+    return optimizers.solve(session, persona)
+
+
+@app.get("/optimize/household")
+def optimize_household_menus(
+    personas: List[str] = Query(...),
+    shared_inventory: bool = True,
+    workers: int = Query(1, ge=1),
+    session: Session = Depends(get_session),
+):
+    """Plan menus for several personas drawing on the same inventory.
+
+    With ``shared_inventory=false`` and ``workers`` > 1 the personas are
+    solved in parallel on the job worker pool.
+    """
+    return run_household(session, personas, shared_inventory, workers)
+
+
+@app.get("/optimize/plan")
+def optimize_plan(
+    persona: str,
+    periods: int = Query(52, ge=1, le=520),
+    granularity: str = "week",
+    feed_kg: float = Query(0.0, ge=0),
+    start_week: int = Query(1, ge=1, le=53),
+    hemisphere: str = "north",
+    holding_cost: float = Query(0.0, ge=0),
+    session: Session = Depends(get_session),
+):
+    """Multi-period purchase, menu and feed plan with seasonal harvests.
+
+    ``feed_kg`` is the daily feed demand; persona requirements are daily.
+    """
+    try:
+        return run_plan(
+            session,
+            persona,
+            periods=periods,
+            granularity=granularity,
+            feed_kg=feed_kg,
+            start_week=start_week,
+            hemisphere=hemisphere,
+            holding_cost=holding_cost,
+        )
+    except (ValueError, RuntimeError) as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
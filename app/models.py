@@ -1,7 +1,7 @@
 from datetime import datetime, date
 from typing import Dict, Optional
 from sqlmodel import SQLModel, Field
-from sqlalchemy import Column, JSON
+from sqlalchemy import Column, Index, JSON, LargeBinary
 
 class Species(SQLModel, table=True):
     __tablename__ = "species"
@@ -34,6 +34,20 @@ class WaterReading(SQLModel, table=True):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     location: Optional[str] = None
 
+class TimeSeriesChunk(SQLModel, table=True):
+    """Compressed block of samples for one high-rate sensor stream."""
+
+    __tablename__ = "ts_chunks"
+    __table_args__ = (Index("ix_ts_chunks_stream_start", "stream", "start_us"),)
+    chunk_id: Optional[int] = Field(default=None, primary_key=True)
+    stream: str
+    start_us: int
+    end_us: int
+    count: int
+    encoding: str
+    timestamps: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    values: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+
 class FeedLog(SQLModel, table=True):
     __tablename__ = "feed_logs"
     feed_log_id: Optional[int] = Field(default=None, primary_key=True)
@@ -65,11 +79,19 @@ class SourceTag(SQLModel, table=True):
 
 class HumanFood(SQLModel, table=True):
     __tablename__ = "human_foods"
+    __table_args__ = (
+        Index("ux_human_foods_source_name", "source_tag_id", "name", unique=True),
+    )
     food_id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     source_tag_id: Optional[int] = Field(default=None, foreign_key="source_tags.tag_id")
     available_on_farm: bool = False
-=======
+
+
+class Ingredient(SQLModel, table=True):
+    __tablename__ = "ingredients"
+    ingredient_id: Optional[int] = Field(default=None, primary_key=True)
+    name: str
     unit: str = "kg"
     cost_per_kg: float = 0
     stock_on_hand: float = 0
@@ -89,6 +111,9 @@ class InventorySnapshot(SQLModel, table=True):
 
 class FeedIngredient(SQLModel, table=True):
     __tablename__ = "feed_ingredients"
+    __table_args__ = (
+        Index("ux_feed_ingredients_source_name", "source_tag_id", "name", unique=True),
+    )
     ingredient_id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     unit: str = "kg"
@@ -96,6 +121,9 @@ class FeedIngredient(SQLModel, table=True):
     stock_on_hand: float = 0
     source_tag_id: Optional[int] = Field(default=None, foreign_key="source_tags.tag_id")
     available_on_farm: bool = False
+    source: Optional[str] = None
+    nutrients: Dict[str, float] = Field(default_factory=dict, sa_column=Column(JSON))
+    cap: Optional[float] = None
 
 
 class SeasonalYield(SQLModel, table=True):
@@ -114,19 +142,59 @@ class ProcessingLossFactor(SQLModel, table=True):
     ingredient_id: Optional[int] = Field(default=None, foreign_key="feed_ingredients.ingredient_id")
     process: str
     loss_factor: float
-=======
-    source: Optional[str] = None
-    nutrients: Dict[str, float] = Field(default_factory=dict, sa_column=Column(JSON))
-    cap: Optional[float] = None
 
 
 class Nutrient(SQLModel, table=True):
     __tablename__ = "nutrients"
+    __table_args__ = (Index("ix_nutrients_name", "name"),)
     nutrient_id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     unit: str
 
 
+class IngredientNutrient(SQLModel, table=True):
+    """Amount of one nutrient per kg of a menu ingredient.
+
+    Mirrors ``Ingredient.nutrients`` (kept in sync by :mod:`app.nutrients`) so
+    nutrient thresholds can be answered from the index instead of parsing
+    JSON.
+    """
+
+    __tablename__ = "ingredient_nutrients"
+    __table_args__ = (
+        Index(
+            "ix_ingredient_nutrients_nutrient_amount",
+            "nutrient_id",
+            "amount",
+            "ingredient_id",
+        ),
+    )
+    ingredient_id: int = Field(
+        foreign_key="ingredients.ingredient_id", primary_key=True
+    )
+    nutrient_id: int = Field(foreign_key="nutrients.nutrient_id", primary_key=True)
+    amount: float
+
+
+class FeedIngredientNutrient(SQLModel, table=True):
+    """Amount of one nutrient per kg of a feed ingredient."""
+
+    __tablename__ = "feed_ingredient_nutrients"
+    __table_args__ = (
+        Index(
+            "ix_feed_ingredient_nutrients_nutrient_amount",
+            "nutrient_id",
+            "amount",
+            "ingredient_id",
+        ),
+    )
+    ingredient_id: int = Field(
+        foreign_key="feed_ingredients.ingredient_id", primary_key=True
+    )
+    nutrient_id: int = Field(foreign_key="nutrients.nutrient_id", primary_key=True)
+    amount: float
+
+
 class YieldForecast(SQLModel, table=True):
     __tablename__ = "yield_forecasts"
     forecast_id: Optional[int] = Field(default=None, primary_key=True)
@@ -145,7 +213,8 @@ class AdjustmentLog(SQLModel, table=True):
     previous_value: Optional[str] = None
     new_value: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
-=======
+
+
 class PersonaRequirement(SQLModel, table=True):
     """Nutrient requirements for a given persona."""
 
@@ -163,3 +232,40 @@ class FeedRequirement(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     nutrient: str
     amount: float
+
+
+class ScenarioReport(SQLModel, table=True):
+    """Plan and simulated KPIs of one scenario run (see :mod:`app.reports`)."""
+
+    __tablename__ = "scenario_reports"
+    __table_args__ = (Index("ix_scenario_reports_created_at", "created_at"),)
+    report_id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    source: Optional[str] = None
+    plan: Dict[str, float] = Field(default_factory=dict, sa_column=Column(JSON))
+    kpis: Dict[str, object] = Field(default_factory=dict, sa_column=Column(JSON))
+
+
+class ScenarioKPI(SQLModel, table=True):
+    """Numeric KPI of a scenario report, indexed for range filters."""
+
+    __tablename__ = "scenario_kpis"
+    __table_args__ = (
+        Index("ix_scenario_kpis_name_value", "name", "value", "report_id"),
+    )
+    report_id: int = Field(
+        foreign_key="scenario_reports.report_id", primary_key=True
+    )
+    name: str = Field(primary_key=True)
+    value: float
+
+
+class EtlCheckpoint(SQLModel, table=True):
+    """How far a resumable loader got through its input file."""
+
+    __tablename__ = "etl_checkpoints"
+    name: str = Field(primary_key=True)
+    signature: str
+    rows: int = 0
+    completed: bool = False
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,291 @@
+"""Normalized ingredient nutrient storage.
+
+``Ingredient.nutrients`` and ``FeedIngredient.nutrients`` are JSON blobs,
+which makes questions like "menu ingredients with at least 0.3 protein under
+2 per kg" a full scan with JSON parsing in Python. The same data is mirrored
+into ``ingredient_nutrients`` / ``feed_ingredient_nutrients`` (one row per
+ingredient and non-zero nutrient, linked to ``nutrients``), indexed on
+``(nutrient_id, amount, ingredient_id)`` so thresholds are index range scans.
+
+The mirror is maintained on every ORM flush that adds, deletes or re-profiles
+an ingredient. :func:`migrate_nutrients` backfills rows for ingredients
+written before the tables existed (or by bulk SQL); it is idempotent and runs
+from :func:`app.database.create_db_and_tables`.
+"""
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, delete, event, exists, func, insert, inspect
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+
+from .models import (
+    FeedIngredient,
+    FeedIngredientNutrient,
+    Ingredient,
+    IngredientNutrient,
+    Nutrient,
+)
+
+# kind -> (ingredient model, link model)
+TABLES = {
+    "menu": (Ingredient, IngredientNutrient),
+    "feed": (FeedIngredient, FeedIngredientNutrient),
+}
+_KINDS = {Ingredient: "menu", FeedIngredient: "feed"}
+CHUNK = 5000
+
+
+def _connection(bind) -> Connection:
+    if isinstance(bind, OrmSession):
+        return bind.connection()
+    return bind
+
+
+def nutrient_ids(bind, names: Iterable[str], create: bool = True) -> Dict[str, int]:
+    """Map nutrient names to ``nutrients.nutrient_id``, inserting missing ones."""
+    conn = _connection(bind)
+    names = set(names)
+    table = Nutrient.__table__
+    ids: Dict[str, int] = {}
+    for name, nutrient_id in conn.execute(
+        select(table.c.name, func.min(table.c.nutrient_id))
+        .where(table.c.name.in_(names))
+        .group_by(table.c.name)
+    ):
+        ids[name] = nutrient_id
+    missing = sorted(names - set(ids))
+    if missing and create:
+        conn.execute(insert(table), [{"name": n, "unit": ""} for n in missing])
+        ids.update(nutrient_ids(conn, missing, create=False))
+    return ids
+
+
+def write_nutrients(
+    bind, kind: str, profiles: Dict[int, Dict[str, float]], replace: bool = True
+) -> int:
+    """Store ``ingredient_id -> {nutrient: amount}`` profiles; return rows written.
+
+    With ``replace`` existing rows of those ingredients are deleted first.
+    Zero and missing amounts are not stored.
+    """
+    conn = _connection(bind)
+    link = TABLES[kind][1].__table__
+    ids = nutrient_ids(
+        conn, {n for profile in profiles.values() for n, v in profile.items() if v}
+    )
+    keys = list(profiles)
+    if replace:
+        for start in range(0, len(keys), CHUNK):
+            chunk = keys[start : start + CHUNK]
+            conn.execute(delete(link).where(link.c.ingredient_id.in_(chunk)))
+    rows = [
+        {"ingredient_id": ingredient_id, "nutrient_id": ids[name], "amount": amount}
+        for ingredient_id, profile in profiles.items()
+        for name, amount in profile.items()
+        if amount
+    ]
+    for start in range(0, len(rows), CHUNK):
+        conn.execute(insert(link), rows[start : start + CHUNK])
+    return len(rows)
+
+
+def migrate_nutrients(bind) -> int:
+    """Backfill normalized rows for ingredients that have none yet.
+
+    Returns the number of rows inserted; running it again inserts nothing.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            return migrate_nutrients(conn)
+    conn = _connection(bind)
+    written = 0
+    for kind, (model, link) in TABLES.items():
+        table = model.__table__
+        has_rows = exists().where(
+            link.__table__.c.ingredient_id == table.c.ingredient_id
+        )
+        pending = conn.execute(
+            select(table.c.ingredient_id).where(~has_rows)
+        ).scalars().all()
+        for start in range(0, len(pending), CHUNK):
+            query = select(table.c.ingredient_id, table.c.nutrients).where(
+                table.c.ingredient_id.in_(pending[start : start + CHUNK])
+            )
+            profiles = {i: profile for i, profile in conn.execute(query) if profile}
+            written += write_nutrients(conn, kind, profiles, replace=False)
+    return written
+
+
+def _before_flush(session: OrmSession, flush_context, instances) -> None:
+    # Children go before their parents so foreign keys hold on every backend.
+    removed: Dict[str, List[int]] = {"menu": [], "feed": []}
+    for obj in session.deleted:
+        kind = _KINDS.get(type(obj))
+        if kind is not None and obj.ingredient_id is not None:
+            removed[kind].append(obj.ingredient_id)
+    for kind, ids in removed.items():
+        if ids:
+            write_nutrients(session, kind, {i: {} for i in ids})
+
+
+def _after_flush(session: OrmSession, flush_context) -> None:
+    profiles: Dict[str, Dict[int, Dict[str, float]]] = {"menu": {}, "feed": {}}
+    for obj in list(session.new) + list(session.dirty):
+        kind = _KINDS.get(type(obj))
+        if kind is None:
+            continue
+        history = inspect(obj).attrs.nutrients.history
+        if obj in session.dirty and not history.has_changes():
+            continue
+        profiles[kind][obj.ingredient_id] = obj.nutrients or {}
+    for kind, changed in profiles.items():
+        if changed:
+            write_nutrients(session, kind, changed)
+
+
+event.listen(OrmSession, "before_flush", _before_flush)
+event.listen(OrmSession, "after_flush", _after_flush)
+
+
+def nutrient_filter(
+    kind: str,
+    minimums: Optional[Dict[str, float]] = None,
+    maximums: Optional[Dict[str, float]] = None,
+) -> list:
+    """WHERE clauses on the ingredient table for nutrient thresholds.
+
+    Minimums need a stored amount ``>=`` the bound; maximums exclude
+    ingredients whose stored amount exceeds it (a missing row counts as 0).
+    """
+    model, link = TABLES[kind]
+
+    def stored(nutrient: str, amount) -> object:
+        return exists().where(
+            and_(
+                link.ingredient_id == model.ingredient_id,
+                link.nutrient_id == Nutrient.nutrient_id,
+                Nutrient.name == nutrient,
+                amount,
+            )
+        )
+
+    clauses = [
+        stored(nutrient, link.amount >= bound)
+        for nutrient, bound in (minimums or {}).items()
+        if bound > 0
+    ]
+    clauses += [
+        ~stored(nutrient, link.amount > bound)
+        for nutrient, bound in (maximums or {}).items()
+    ]
+    return clauses
+
+
+def find_ingredients(
+    session: Session,
+    kind: str = "menu",
+    minimums: Optional[Dict[str, float]] = None,
+    maximums: Optional[Dict[str, float]] = None,
+    max_cost: Optional[float] = None,
+    in_stock: bool = False,
+) -> List[Dict]:
+    """Ingredients meeting nutrient thresholds, price and stock limits.
+
+    The filtering runs in SQL; only matching rows and their stored nutrient
+    amounts are loaded.
+
+    Returns:
+        list of dicts with name, cost, stock and nutrients, ordered by cost.
+    """
+    if kind not in TABLES:
+        raise ValueError(f"Unknown ingredient kind: {kind}")
+    model = TABLES[kind][0]
+    clauses = nutrient_filter(kind, minimums, maximums)
+    if max_cost is not None:
+        clauses.append(model.cost_per_kg <= max_cost)
+    if in_stock:
+        clauses.append(model.stock_on_hand > 0)
+    query = (
+        select(model.ingredient_id, model.name, model.cost_per_kg, model.stock_on_hand)
+        .where(*clauses)
+        .order_by(model.cost_per_kg, model.ingredient_id)
+    )
+    rows = session.exec(query).all()
+    profiles = load_profiles(session, kind, [row[0] for row in rows])
+    return [
+        {
+            "name": name,
+            "cost": cost,
+            "stock": stock,
+            "nutrients": profiles.get(ingredient_id, {}),
+        }
+        for ingredient_id, name, cost, stock in rows
+    ]
+
+
+def load_profiles(
+    session: Session,
+    kind: str,
+    ingredient_ids: Optional[List[int]] = None,
+    nutrients: Optional[Iterable[str]] = None,
+) -> Dict[int, Dict[str, float]]:
+    """Read ``ingredient_id -> {nutrient: amount}`` from the normalized table.
+
+    Restrict to ``ingredient_ids`` and/or ``nutrients`` when given.
+    """
+    conn = session.connection()
+    link = TABLES[kind][1].__table__
+    names = {
+        nutrient_id: name
+        for name, nutrient_id in nutrient_ids(
+            conn, nutrients if nutrients is not None else _all_nutrients(conn), False
+        ).items()
+    }
+    query = select(link.c.ingredient_id, link.c.nutrient_id, link.c.amount)
+    if nutrients is not None:
+        query = query.where(link.c.nutrient_id.in_(list(names)))
+    chunks: List[Optional[List[int]]] = [None]
+    if ingredient_ids is not None:
+        chunks = [
+            ingredient_ids[i : i + CHUNK] for i in range(0, len(ingredient_ids), CHUNK)
+        ]
+    profiles: Dict[int, Dict[str, float]] = {}
+    for chunk in chunks:
+        if chunk is not None:
+            chunked = query.where(link.c.ingredient_id.in_(chunk))
+        else:
+            chunked = query
+        for ingredient_id, nutrient_id, amount in conn.execute(chunked):
+            profile = profiles.get(ingredient_id)
+            if profile is None:
+                profile = profiles[ingredient_id] = {}
+            profile[names[nutrient_id]] = amount
+    return profiles
+
+
+def _all_nutrients(conn: Connection) -> List[str]:
+    return list(conn.execute(select(Nutrient.__table__.c.name)).scalars())
+
+
+def parse_bounds(values: Optional[List[str]]) -> Dict[str, float]:
+    """Parse ``["protein:0.3", ...]`` query parameters."""
+    bounds: Dict[str, float] = {}
+    for value in values or []:
+        name, sep, amount = value.rpartition(":")
+        if not sep or not name:
+            raise ValueError(f"Expected nutrient:amount, got {value!r}")
+        bounds[name] = float(amount)
+    return bounds
+
+
+def _cli() -> None:
+    """Backfill the normalized tables of the configured database."""
+    from .database import engine
+
+    written = migrate_nutrients(engine)
+    print(f"Inserted {written} ingredient nutrient rows")
+
+
+if __name__ == "__main__":  # pragma: no cover - manual utility
+    _cli()
@@ -1,225 +1,349 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
-try:
-    from ortools.linear_solver import pywraplp
-except Exception:  # pragma: no cover - fallback when ortools missing
-    pywraplp = None
+import numpy as np
+from scipy import sparse
+
+from .anytime import FEASIBILITY_TOLERANCE, solve_within
+from .catalog import Catalog, ingredient_columns
+from .lp import OPTIMAL, LinearProgram, get_backend
+from .sensitivity import Sensitivity
+
+# Builders take ``ingredients`` as a list of {"name", "cost", "nutrients"}
+# dicts or as a :class:`app.catalog.Catalog`, whose own caps and stock then
+# apply unless overridden by ``caps``/``inventory``.
+Ingredients = Union[List[Dict], Catalog]
+
+
+def _upper_bounds(
+    ingredients: Ingredients,
+    names: List[str],
+    caps: Dict[str, float],
+    inventory: Dict[str, float],
+    default: float,
+) -> np.ndarray:
+    if isinstance(ingredients, Catalog):
+        return ingredients.upper(default, caps, inventory)
+    upper = np.full(len(names), default)
+    for j, name in enumerate(names):
+        if name in caps:
+            upper[j] = min(upper[j], caps[name])
+        if name in inventory:
+            upper[j] = min(upper[j], inventory[name])
+    return upper
+
+
+def menu_program(
+    ingredients: Ingredients,
+    requirements: Dict[str, float],
+    preferences: Optional[Dict[str, float]] = None,
+    caps: Optional[Dict[str, float]] = None,
+    inventory: Optional[Dict[str, float]] = None,
+) -> LinearProgram:
+    """Assemble the menu LP: minimise preference-adjusted cost subject to
+    nutrient minimums, with caps and inventory as variable upper bounds."""
+    nutrients = list(requirements)
+    names, cost, matrix = ingredient_columns(ingredients, nutrients)
+    if preferences:
+        cost = cost - np.array([preferences.get(name, 0) for name in names])
+    return LinearProgram(
+        cost=np.array(cost, dtype=float),
+        matrix=matrix,
+        row_lower=np.array([requirements[n] for n in nutrients], dtype=float),
+        row_upper=np.full(len(nutrients), np.inf),
+        lower=np.zeros(len(names)),
+        upper=_upper_bounds(ingredients, names, caps or {}, inventory or {}, np.inf),
+        names=names,
+        row_names=nutrients,
+    )
+
+
+def feed_program(
+    ingredients: Ingredients,
+    requirements: Dict[str, float],
+    caps: Optional[Dict[str, float]] = None,
+    inventory: Optional[Dict[str, float]] = None,
+) -> LinearProgram:
+    """Assemble the feed LP: inclusion fractions summing to one at least cost."""
+    nutrients = list(requirements)
+    names, cost, rows = ingredient_columns(ingredients, nutrients)
+    matrix = sparse.vstack([rows, np.ones((1, len(names)))], format="csr")
+    return LinearProgram(
+        cost=np.array(cost, dtype=float),
+        matrix=matrix,
+        row_lower=np.array([requirements[n] for n in nutrients] + [1.0], dtype=float),
+        row_upper=np.array([np.inf] * len(nutrients) + [1.0]),
+        lower=np.zeros(len(names)),
+        upper=_upper_bounds(ingredients, names, caps or {}, inventory or {}, 1.0),
+        names=names,
+        row_names=nutrients + ["total"],
+    )
+
+
+def _package(lp, result, les_client, sensitivity, backend, report=False):
+    solution = result.plan(lp.names)
+    if not (les_client or sensitivity or report):
+        return solution
+    packaged = {"plan": solution}
+    if report:
+        violations = lp.row_violations(result.x)
+        packaged.update(
+            status=result.status,
+            objective=result.objective,
+            gap=result.gap,
+            elapsed=result.elapsed,
+            violations={
+                lp.row_names[i]: float(violations[i])
+                for i in np.flatnonzero(violations > FEASIBILITY_TOLERANCE)
+            },
+        )
+    if les_client:
+        packaged["kpis"] = les_client.run_simulation(solution)
+    if sensitivity and result.status == OPTIMAL:
+        packaged["sensitivity"] = Sensitivity(lp, result, backend).report()
+    return packaged
+
+
+def _solve(lp, kind, backend, time_limit):
+    if time_limit is not None:
+        return solve_within(lp, backend, time_limit)
+    result = get_backend(backend).solve(lp)
+    if not result.ok:
+        raise ValueError(f"No optimal {kind} found")
+    return result
 
 
-def optimize_menu(ingredients: List[Dict], requirements: Dict[str, float], les_client: Optional[object] = None):
-    """Simple linear program for a human menu.
-=======
 def optimize_menu(
-    ingredients: List[Dict],
+    ingredients: Ingredients,
     requirements: Dict[str, float],
     preferences: Optional[Dict[str, float]] = None,
     caps: Optional[Dict[str, float]] = None,
     inventory: Optional[Dict[str, float]] = None,
-) -> Dict[str, float]:
+    les_client: Optional[object] = None,
+    backend: Optional[str] = None,
+    sensitivity: bool = False,
+    time_limit: Optional[float] = None,
+):
     """Simple linear program for a human menu with optional constraints.
 
-
     Args:
-        ingredients: list of dicts with keys name, cost, nutrients (dict).
+        ingredients: list of dicts with keys name, cost, nutrients (dict), or
+            a :class:`app.catalog.Catalog`.
         requirements: nutrient -> minimum requirement.
         preferences: ingredient -> bonus/penalty applied to objective (positive favors).
         caps: ingredient -> maximum inclusion amount.
         inventory: ingredient -> available inventory shared across personas.
+        les_client: optional LES client used to simulate the resulting plan.
+        backend: solver backend name (``glop``, ``highs``, ``greedy``); the best
+            available one is used by default.
+        sensitivity: also return duals, reduced costs and ranging intervals.
+        time_limit: seconds allowed for the solve. Instead of raising, the
+            best feasible menu found by then (or, if infeasible, the
+            minimum-violation relaxation) is returned with its ``status``,
+            ``gap``, ``elapsed`` time and row ``violations``; see
+            :mod:`app.anytime`.
     Returns:
-        dict mapping ingredient names to grams per day.
+        dict mapping ingredient names to grams per day, or a dict with
+        ``plan`` plus ``kpis``, ``sensitivity`` and/or the solve report when
+        requested.
+    """
+    lp = menu_program(ingredients, requirements, preferences, caps, inventory)
+    result = _solve(lp, "menu", backend, time_limit)
+    return _package(
+        lp, result, les_client, sensitivity, backend, time_limit is not None
+    )
+
+
+def optimize_feed(
+    ingredients: Ingredients,
+    requirements: Dict[str, float],
+    caps: Optional[Dict[str, float]] = None,
+    inventory: Optional[Dict[str, float]] = None,
+    les_client: Optional[object] = None,
+    backend: Optional[str] = None,
+    sensitivity: bool = False,
+    time_limit: Optional[float] = None,
+):
+    """Least cost fish feed formulation with optional caps and inventory limits.
+
+    ``time_limit`` works as in :func:`optimize_menu`.
+    """
+    lp = feed_program(ingredients, requirements, caps, inventory)
+    result = _solve(lp, "feed", backend, time_limit)
+    return _package(
+        lp, result, les_client, sensitivity, backend, time_limit is not None
+    )
+
+
+def household_program(
+    ingredients: Ingredients,
+    requirements: Dict[str, Dict[str, float]],
+    preferences: Optional[Dict[str, Dict[str, float]]] = None,
+    caps: Optional[Dict[str, float]] = None,
+    inventory: Optional[Dict[str, float]] = None,
+) -> LinearProgram:
+    """Assemble one menu LP for several personas sharing the inventory.
+
+    Variables are laid out persona-major (``x[p * n + i]``). Each persona
+    has its own nutrient rows; every ingredient with stock gets one row
+    limiting the total drawn by all personas. Caps apply per persona.
     """
     preferences = preferences or {}
     caps = caps or {}
     inventory = inventory or {}
+    personas = list(requirements)
+    nutrients = sorted({nut for req in requirements.values() for nut in req})
+    index = {nut: k for k, nut in enumerate(nutrients)}
+    names, base_cost, matrix = ingredient_columns(ingredients, nutrients)
+    n = len(names)
 
-    if pywraplp:
-        solver = pywraplp.Solver.CreateSolver("GLOP")
-        if solver is None:
-            raise RuntimeError("GLOP solver unavailable")
-
-        variables = {}
-        for ing in ingredients:
-            name = ing["name"]
-            upper = solver.infinity()
-            if name in caps:
-                upper = min(upper, caps[name])
-            if name in inventory:
-                upper = min(upper, inventory[name])
-            variables[name] = solver.NumVar(0, upper, name)
-
-        solver.Minimize(
-            solver.Sum(
-                variables[ing["name"]]
-                * (ing.get("cost", 0) - preferences.get(ing["name"], 0))
-                for ing in ingredients
-            )
-        )
-
-        for nutrient, minimum in requirements.items():
-            solver.Add(
-                solver.Sum(
-                    variables[ing["name"]] * ing["nutrients"].get(nutrient, 0)
-                    for ing in ingredients
-                )
-                >= minimum
-            )
-
-        status = solver.Solve()
-        if status != pywraplp.Solver.OPTIMAL:
-            raise ValueError("No optimal menu found")
+    blocks = []
+    row_lower: List[float] = []
+    row_names: List[str] = []
+    cost = []
+    for persona in personas:
+        req = requirements[persona]
+        blocks.append(matrix[[index[nut] for nut in req]])
+        row_lower.extend(req.values())
+        row_names.extend(f"{persona}:{nut}" for nut in req)
+        bonus = preferences.get(persona, {})
+        cost.append(base_cost - np.array([bonus.get(name, 0) for name in names]))
 
-        solution = {name: var.solution_value() for name, var in variables.items()}
+    if isinstance(ingredients, Catalog):
+        available = ingredients.stock(inventory)
+        stocked = np.flatnonzero(np.isfinite(available))
+        stock = available[stocked].tolist()
     else:
-        # Fallback: pick cheapest ingredient satisfying each nutrient independently
-        solution: Dict[str, float] = {ing["name"]: 0 for ing in ingredients}
-        for nutrient, minimum in requirements.items():
-            best = min(
-                ingredients,
-                key=lambda ing: (
-                    float("inf")
-                    if ing["nutrients"].get(nutrient, 0) == 0
-                    else ing.get("cost", 0) / ing["nutrients"].get(nutrient, 0)
-                ),
-            )
-            needed = minimum / best["nutrients"].get(nutrient, 1)
-            solution[best["name"]] = max(solution[best["name"]], needed)
-    if les_client:
-        kpis = les_client.run_simulation(solution)
-        return {"plan": solution, "kpis": kpis}
-    return solution
-
-
-def optimize_feed(ingredients: List[Dict], requirements: Dict[str, float], les_client: Optional[object] = None):
-    """Least cost fish feed formulation."""
-
-        return {name: var.solution_value() for name, var in variables.items()}
-    # Fallback: pick cheapest ingredient satisfying each nutrient independently
-    solution: Dict[str, float] = {ing["name"]: 0 for ing in ingredients}
-    for nutrient, minimum in requirements.items():
-        remaining = minimum
-        # sort ingredients by adjusted cost per unit nutrient
-        sorted_ings = sorted(
-            ingredients,
-            key=lambda ing: (
-                float("inf")
-                if ing["nutrients"].get(nutrient, 0) == 0
-                else (ing.get("cost", 0) - preferences.get(ing["name"], 0))
-                / ing["nutrients"].get(nutrient, 0)
-            ),
-        )
-        for ing in sorted_ings:
-            contrib = ing["nutrients"].get(nutrient, 0)
-            if contrib <= 0:
-                continue
-            name = ing["name"]
-            allowed = min(
-                caps.get(name, float("inf")),
-                inventory.get(name, float("inf")),
-            )
-            available = max(0, allowed - solution[name])
-            if available <= 0:
-                continue
-            take = min(remaining / contrib, available)
-            solution[name] += take
-            remaining -= take * contrib
-            if remaining <= 0:
-                break
-    return solution
+        stocked = [i for i, name in enumerate(names) if name in inventory]
+        stock = [inventory[names[i]] for i in stocked]
+    selector = sparse.identity(n, format="csr")[stocked]
+    coupled = sparse.vstack(
+        [
+            sparse.block_diag(blocks, format="csr"),
+            sparse.hstack([selector] * len(personas)),
+        ],
+        format="csr",
+    )
+    upper = _upper_bounds(ingredients, names, caps, inventory, np.inf)
+    return LinearProgram(
+        cost=np.concatenate(cost) if cost else np.zeros(0),
+        matrix=coupled,
+        row_lower=np.array(row_lower + [-np.inf] * len(stocked), dtype=float),
+        row_upper=np.array([np.inf] * len(row_lower) + stock, dtype=float),
+        lower=np.zeros(n * len(personas)),
+        upper=np.tile(upper, len(personas)),
+        names=[f"{persona}:{name}" for persona in personas for name in names],
+        row_names=row_names + [f"stock:{names[i]}" for i in stocked],
+    )
 
 
-def optimize_feed(
-    ingredients: List[Dict],
-    requirements: Dict[str, float],
+def _solve_menu(kwargs: Dict) -> Dict[str, float]:
+    return optimize_menu(**kwargs)
+
+
+def optimize_household(
+    ingredients: Ingredients,
+    requirements: Dict[str, Dict[str, float]],
+    preferences: Optional[Dict[str, Dict[str, float]]] = None,
     caps: Optional[Dict[str, float]] = None,
     inventory: Optional[Dict[str, float]] = None,
-) -> Dict[str, float]:
-    """Least cost fish feed formulation with optional caps and inventory limits."""
-    caps = caps or {}
-    inventory = inventory or {}
+    shared_inventory: bool = True,
+    backend: Optional[str] = None,
+    workers: int = 1,
+) -> Dict[str, Dict[str, float]]:
+    """Menus for several personas at once.
+
+    Args:
+        ingredients: list of dicts with keys name, cost, nutrients (dict), or
+            a :class:`app.catalog.Catalog`.
+        requirements: persona -> nutrient -> minimum requirement.
+        preferences: persona -> ingredient -> objective bonus.
+        caps: ingredient -> maximum inclusion amount per persona.
+        inventory: ingredient -> available inventory.
+        shared_inventory: when true all personas draw on one inventory and are
+            solved jointly; otherwise each persona may use the full inventory
+            and is solved on its own.
+        backend: solver backend name, see :func:`app.lp.get_backend`.
+        workers: above 1, the independent problems are solved on the shared
+            job worker pool (:data:`app.jobs.jobs`) instead of in this thread.
+    Returns:
+        dict mapping persona to its menu plan.
+    """
+    preferences = preferences or {}
+    personas = list(requirements)
+    if not personas:
+        return {}
+    if shared_inventory:
+        lp = household_program(ingredients, requirements, preferences, caps, inventory)
+        result = get_backend(backend).solve(lp)
+        if not result.ok:
+            raise ValueError("No optimal menu found")
+        names = ingredient_columns(ingredients, [])[0]
+        x = result.x.reshape(len(personas), len(names))
+        return {p: dict(zip(names, x[k].tolist())) for k, p in enumerate(personas)}
 
-    if pywraplp:
-        solver = pywraplp.Solver.CreateSolver("GLOP")
-        if solver is None:
-            raise RuntimeError("GLOP solver unavailable")
-
-        variables = {}
-        for ing in ingredients:
-            name = ing["name"]
-            upper = 1.0
-            if name in caps:
-                upper = min(upper, caps[name])
-            if name in inventory:
-                upper = min(upper, inventory[name])
-            variables[name] = solver.NumVar(0, upper, name)
-        solver.Add(solver.Sum(variables.values()) == 1)
-        solver.Minimize(
-            solver.Sum(variables[ing["name"]] * ing.get("cost", 0) for ing in ingredients)
+    tasks = [
+        dict(
+            ingredients=ingredients,
+            requirements=requirements[p],
+            preferences=preferences.get(p),
+            caps=caps,
+            inventory=inventory,
+            backend=backend,
         )
+        for p in personas
+    ]
+    if workers <= 1 or len(tasks) <= 1:
+        plans = [_solve_menu(task) for task in tasks]
+    else:
+        from .jobs import jobs  # jobs imports this module
 
-        for nutrient, minimum in requirements.items():
-            solver.Add(
-                solver.Sum(
-                    variables[ing["name"]] * ing["nutrients"].get(nutrient, 0)
-                    for ing in ingredients
-                )
-                >= minimum
-            )
+        plans = jobs.map(_solve_menu, tasks)
+    return dict(zip(personas, plans))
 
-        status = solver.Solve()
-        if status != pywraplp.Solver.OPTIMAL:
-            raise ValueError("No optimal feed found")
 
-        solution = {name: var.solution_value() for name, var in variables.items()}
+def analyse(
+    kind: str,
+    ingredients: Ingredients,
+    requirements: Dict[str, float],
+    preferences: Optional[Dict[str, float]] = None,
+    caps: Optional[Dict[str, float]] = None,
+    inventory: Optional[Dict[str, float]] = None,
+    backend: Optional[str] = None,
+) -> Sensitivity:
+    """Solve a ``menu`` or ``feed`` problem and return its sensitivity analysis."""
+    if kind == "menu":
+        lp = menu_program(ingredients, requirements, preferences, caps, inventory)
+    elif kind == "feed":
+        lp = feed_program(ingredients, requirements, caps, inventory)
     else:
-        # Fallback heuristic: allocate nutrient using cheapest ingredient
-        solution: Dict[str, float] = {ing["name"]: 0 for ing in ingredients}
-        for nutrient, minimum in requirements.items():
-            best = min(
-                ingredients,
-                key=lambda ing: (
-                    float("inf")
-                    if ing["nutrients"].get(nutrient, 0) == 0
-                    else ing.get("cost", 0) / ing["nutrients"].get(nutrient, 0)
-                ),
-            )
-            needed = minimum / best["nutrients"].get(nutrient, 1)
-            solution[best["name"]] = max(solution[best["name"]], needed)
-        total = sum(solution.values()) or 1.0
-        solution = {name: value / total for name, value in solution.items()}
-    if les_client:
-        kpis = les_client.run_simulation(solution)
-        return {"plan": solution, "kpis": kpis}
-    return solution
-
-        return {name: var.solution_value() for name, var in variables.items()}
-    # Fallback heuristic: allocate nutrient using cheapest ingredient
-    solution: Dict[str, float] = {ing["name"]: 0 for ing in ingredients}
-    for nutrient, minimum in requirements.items():
-        remaining = minimum
-        sorted_ings = sorted(
-            ingredients,
-            key=lambda ing: (
-                float("inf")
-                if ing["nutrients"].get(nutrient, 0) == 0
-                else ing.get("cost", 0) / ing["nutrients"].get(nutrient, 0)
-            ),
-        )
-        for ing in sorted_ings:
-            contrib = ing["nutrients"].get(nutrient, 0)
-            if contrib <= 0:
-                continue
-            name = ing["name"]
-            allowed = min(
-                caps.get(name, float("inf")),
-                inventory.get(name, float("inf")),
-            )
-            available = max(0, allowed - solution[name])
-            if available <= 0:
-                continue
-            take = min(remaining / contrib, available)
-            solution[name] += take
-            remaining -= take * contrib
-            if remaining <= 0:
-                break
-    total = sum(solution.values()) or 1.0
-    return {name: value / total for name, value in solution.items()}
+        raise ValueError(f"Unknown optimization kind: {kind}")
+    result = get_backend(backend).solve(lp)
+    if not result.ok:
+        raise ValueError(f"No optimal {kind} found")
+    return Sensitivity(lp, result, backend)
+
+
+def scenario_costs(
+    ingredients: List[Dict],
+    scenario: Dict[str, Dict[str, float]],
+    preferences: Optional[Dict[str, float]] = None,
+) -> Dict[str, Dict[str, float]]:
+    """Translate a what-if scenario into objective coefficients.
+
+    ``prices`` are new absolute prices and ``price_changes`` relative ones
+    (``0.15`` for +15%); preferences are subtracted as in :func:`menu_program`.
+    """
+    preferences = preferences or {}
+    base = {ing["name"]: ing.get("cost", 0) for ing in ingredients}
+    prices = {
+        name: base[name] * (1 + change)
+        for name, change in (scenario.get("price_changes") or {}).items()
+        if name in base
+    }
+    prices.update(scenario.get("prices") or {})
+    return {
+        "prices": {
+            name: price - preferences.get(name, 0) for name, price in prices.items()
+        },
+        "requirements": dict(scenario.get("requirements") or {}),
+    }
@@ -0,0 +1,214 @@
+"""Cost versus a second objective: Pareto fronts for menus and feeds.
+
+Operators trade cost against buying less from outside the farm, or against
+overshooting nutrient requirements. :func:`pareto_front` traces that
+trade-off for a menu or feed problem. Two methods are available:
+
+* ``epsilon`` – minimise cost subject to ``objective <= eps``, for ``eps``
+  evenly spaced between the objective at the cheapest plan and its best
+  value. This finds every kink of the front.
+* ``weighted`` – minimise a normalised weighted sum for evenly spaced
+  weights. This finds only the vertices where the weight changes the
+  optimum.
+
+The points are split into contiguous chunks, one per worker. A single
+chunk (the default) is solved in the calling thread; several are solved in
+parallel on the shared job pool. Each chunk loads its LP once and walks its
+points in order. With GLOP, each
+re-solve starts from the previous point's basis, because only one row bound
+or the objective changes between neighbours.
+
+Secondary objectives (both minimised):
+
+* ``purchased`` – kg (menu) or inclusion fraction (feed) of ingredients not
+  grown on the farm (``on_farm``).
+* ``surplus`` – total relative nutrient surplus, ``sum((A x - req) / req)``.
+"""
+from dataclasses import replace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .lp import OPTIMAL, GlopBackend, LinearProgram, LPSolution, get_backend
+from .optimization import Ingredients, feed_program, menu_program
+
+OBJECTIVES = ("purchased", "surplus")
+METHODS = ("epsilon", "weighted")
+TOLERANCE = 1e-9
+
+
+def secondary_objective(
+    lp: LinearProgram,
+    objective: str,
+    requirements: Dict[str, float],
+    on_farm: Optional[Sequence[str]] = None,
+) -> Tuple[np.ndarray, float]:
+    """Coefficients ``v`` and offset ``c`` of the objective ``v @ x + c``."""
+    if objective == "purchased":
+        farm = set(on_farm or ())
+        return np.array([0.0 if n in farm else 1.0 for n in lp.names]), 0.0
+    if objective == "surplus":
+        rows = [
+            i
+            for i, name in enumerate(lp.row_names)
+            if requirements.get(name, 0) > 0
+        ]
+        scale = np.array([1.0 / requirements[lp.row_names[i]] for i in rows])
+        vector = np.asarray(lp.matrix[rows].T @ scale).ravel()
+        return vector, -float(len(rows))
+    raise ValueError(f"objective must be one of {OBJECTIVES}")
+
+
+def _with_row(lp: LinearProgram, vector: np.ndarray, bound: float) -> LinearProgram:
+    return replace(
+        lp,
+        matrix=sparse.vstack([lp.matrix, vector[None, :]], format="csr"),
+        row_lower=np.append(lp.row_lower, -np.inf),
+        row_upper=np.append(lp.row_upper, bound),
+        row_names=lp.row_names + ["objective"],
+    )
+
+
+def _sweep(
+    lp: LinearProgram,
+    vector: np.ndarray,
+    method: str,
+    values: np.ndarray,
+    scales: Tuple[float, float],
+    backend: Optional[str],
+) -> List[Tuple[str, np.ndarray]]:
+    """Solve consecutive points of the front, reusing one loaded model."""
+    if method == "epsilon":
+        program = _with_row(lp, vector, values[0])
+    else:
+        program = replace(lp, cost=lp.cost.copy())
+    solver = get_backend(backend)
+    model = None
+    if isinstance(solver, GlopBackend):
+        model = solver.load(program)
+        # Presolve would rebuild the problem and discard the previous basis.
+        model.SetSolverSpecificParametersAsString("use_preprocessing:false")
+        row = model.constraints()[-1]
+        variables = model.variables()
+    results = []
+    for value in values:
+        if method == "epsilon":
+            bound = value + TOLERANCE * max(1.0, abs(value))
+            program.row_upper[-1] = bound
+            if model is not None:
+                row.SetUb(bound)
+        else:
+            program.cost[:] = (1 - value) * lp.cost / scales[0]
+            program.cost += value * vector / scales[1]
+            if model is not None:
+                objective = model.Objective()
+                for variable, coefficient in zip(variables, program.cost.tolist()):
+                    objective.SetCoefficient(variable, coefficient)
+        solution: LPSolution = (
+            solver.run(model) if model is not None else solver.solve(program)
+        )
+        results.append((solution.status, solution.x))
+    return results
+
+
+def _run(task: Tuple) -> List[Tuple[str, np.ndarray]]:
+    return _sweep(*task)
+
+
+def _anchor(lp: LinearProgram, cost: np.ndarray, backend: Optional[str]):
+    solution = get_backend(backend).solve(replace(lp, cost=cost))
+    if not solution.ok:
+        raise ValueError("No feasible plan found")
+    return solution.x
+
+
+def pareto_front(
+    kind: str,
+    ingredients: Ingredients,
+    requirements: Dict[str, float],
+    objective: str = "purchased",
+    on_farm: Optional[Sequence[str]] = None,
+    preferences: Optional[Dict[str, float]] = None,
+    caps: Optional[Dict[str, float]] = None,
+    inventory: Optional[Dict[str, float]] = None,
+    points: int = 11,
+    method: str = "epsilon",
+    backend: Optional[str] = None,
+    workers: int = 1,
+) -> Dict:
+    """Trace cost against ``objective`` for a ``menu`` or ``feed`` problem.
+
+    Args:
+        kind: ``menu`` or ``feed``.
+        ingredients, requirements, preferences, caps, inventory: as for
+            :func:`app.optimization.optimize_menu` (``preferences`` applies
+            to menus only).
+        objective: secondary objective, one of :data:`OBJECTIVES`.
+        on_farm: ingredient names grown on the farm (for ``purchased``).
+        points: number of sweep points, including both extremes.
+        method: ``epsilon`` or ``weighted``.
+        backend: solver backend name, see :func:`app.lp.get_backend`.
+        workers: chunks to spread the points over; above 1 they are solved on
+            the shared job worker pool (:data:`app.jobs.jobs`).
+    Returns:
+        dict with ``objectives`` (the two names), ``front`` (non-dominated
+        ``[cost, objective]`` pairs by increasing cost), ``names`` (the
+        ingredients used by any plan) and ``plans`` (one row of amounts per
+        front point, in ``names`` order).
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+    if kind == "menu":
+        lp = menu_program(ingredients, requirements, preferences, caps, inventory)
+    elif kind == "feed":
+        lp = feed_program(ingredients, requirements, caps, inventory)
+    else:
+        raise ValueError(f"Unknown optimization kind: {kind}")
+    vector, offset = secondary_objective(lp, objective, requirements, on_farm)
+
+    # The extremes of the sweep: the cheapest plan and the best objective.
+    cheapest = _anchor(lp, lp.cost, backend)
+    best = _anchor(lp, vector, backend)
+    high, low = float(vector @ cheapest), float(vector @ best)
+    scales = (
+        max(float(lp.cost @ best - lp.cost @ cheapest), TOLERANCE),
+        max(high - low, TOLERANCE),
+    )
+    if method == "epsilon":
+        values = np.linspace(high, low, max(points, 2))
+    else:
+        values = np.linspace(0.0, 1.0, max(points, 2))
+
+    workers = max(1, min(workers, len(values)))
+    tasks = [
+        (lp, vector, method, chunk, scales, backend)
+        for chunk in np.array_split(values, workers)
+    ]
+    if workers == 1:
+        chunks = [_run(task) for task in tasks]
+    else:
+        from .jobs import jobs  # kept out of the worker processes' imports
+
+        chunks = jobs.map(_run, tasks)
+
+    plans = [x for chunk in chunks for status, x in chunk if status == OPTIMAL]
+    if not plans:
+        raise ValueError("No feasible plan found")
+    matrix = np.array(plans)
+    values = np.column_stack([matrix @ lp.cost, matrix @ vector + offset])
+    order = np.lexsort((values[:, 1], values[:, 0]))
+    keep: List[int] = []
+    for i in order:
+        # Sorted by cost, a point is dominated unless it improves the objective.
+        if not keep or values[i, 1] < values[keep[-1], 1] - TOLERANCE * max(
+            1.0, abs(values[keep[-1], 1])
+        ):
+            keep.append(int(i))
+    used = np.flatnonzero(np.abs(matrix[keep]).max(axis=0) > TOLERANCE)
+    return {
+        "objectives": ["cost", objective],
+        "front": values[keep].tolist(),
+        "names": [lp.names[j] for j in used],
+        "plans": matrix[np.ix_(keep, used)].tolist(),
+    }
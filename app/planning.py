@@ -0,0 +1,271 @@
+"""Multi-period production, purchasing and feed planning.
+
+One LP covers every period of the horizon (weeks or seasons). For each
+menu and feed item and each period it has three variables – kilograms
+bought, kilograms used and kilograms carried into the next period – tied
+together by a stock balance::
+
+    carry[t] = carry[t-1] + buy[t] + picked[t] - use[t]
+
+where ``picked`` is bounded by the on-farm seasonal yield net of processing
+losses (surplus harvest may be left unpicked) and ``carry[-1]`` is the
+opening stock. Harvest columns exist only for periods and items that
+actually yield something. Menu use must meet the per-period
+nutrient requirements; feed use must total the period's feed demand and meet
+the per-kilogram feed requirements. The objective is purchase cost plus an
+optional holding cost on carried stock.
+
+The constraint matrix is assembled from Kronecker blocks, so its size is
+linear in ``periods x items`` and a 52-week, 1000-item horizon builds in a
+fraction of a second.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from scipy import sparse
+
+from .catalog import Catalog, ingredient_columns
+from .lp import LinearProgram, get_backend
+
+SEASONS = ("Winter", "Spring", "Summer", "Autumn")
+# granularity -> (days per period, periods per season)
+GRANULARITIES = {"week": (7, 13), "season": (91, 1)}
+
+
+def period_seasons(
+    periods: int = 52,
+    granularity: str = "week",
+    start_week: int = 1,
+    hemisphere: str = "north",
+) -> List[str]:
+    """Meteorological season of each period, starting at ISO ``start_week``."""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    step = GRANULARITIES[granularity][0] // 7
+    labels = []
+    for offset in range(periods):
+        week = (start_week - 1 + offset * step) % 52
+        month = week * 12 // 52  # 0 = January
+        index = ((month + 1) % 12) // 3  # Dec-Feb -> 0 (Winter)
+        if hemisphere == "south":
+            index = (index + 2) % 4
+        labels.append(SEASONS[index])
+    return labels
+
+
+@dataclass
+class PlanningInputs:
+    """Everything the multi-period planner needs.
+
+    Attributes:
+        menu_ingredients: dicts with name, cost and nutrients per kg, or a
+            :class:`app.catalog.Catalog`.
+        menu_requirements: nutrient -> minimum per period.
+        feed_ingredients: dicts with name, cost and nutrients per kg of feed,
+            or a :class:`app.catalog.Catalog`.
+        feed_requirements: nutrient -> minimum per kg of feed.
+        seasons: season label of each period; its length sets the horizon.
+        feed_demand: kilograms of feed needed in each period.
+        yields: ``"menu"``/``"feed"`` -> item -> season -> kg harvested per
+            period, already net of processing losses.
+        stock: ``"menu"``/``"feed"`` -> item -> opening stock in kg.
+        caps: ``"menu"``/``"feed"`` -> item -> per-period use limit (kg for
+            menu items, inclusion fraction for feed).
+        purchasable: ``"menu"``/``"feed"`` -> item -> whether it can be bought.
+        holding_cost: cost per kg carried from one period to the next.
+    """
+
+    menu_ingredients: Union[List[Dict], Catalog]
+    menu_requirements: Dict[str, float]
+    feed_ingredients: Union[List[Dict], Catalog]
+    feed_requirements: Dict[str, float]
+    seasons: List[str]
+    feed_demand: Sequence[float]
+    yields: Dict[str, Dict[str, Dict[str, float]]] = field(default_factory=dict)
+    stock: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    caps: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    purchasable: Dict[str, Dict[str, bool]] = field(default_factory=dict)
+    holding_cost: float = 0.0
+
+
+def _per_item(
+    names: List[str], values: Dict[str, float], default: float
+) -> np.ndarray:
+    return np.array([values.get(name, default) for name in names], dtype=float)
+
+
+def planning_program(inputs: PlanningInputs) -> Tuple[LinearProgram, Dict]:
+    """Assemble the horizon LP; also return the variable layout."""
+    menu_nutrients = list(inputs.menu_requirements)
+    feed_nutrients = list(inputs.feed_requirements)
+    menu_names, menu_price, menu_matrix = ingredient_columns(
+        inputs.menu_ingredients, menu_nutrients
+    )
+    feed_names, feed_price, feed_matrix = ingredient_columns(
+        inputs.feed_ingredients, feed_nutrients
+    )
+    names = list(menu_names) + list(feed_names)
+    kinds = ["menu"] * len(menu_names) + ["feed"] * len(feed_names)
+    n_menu, n = len(menu_names), len(names)
+    periods = len(inputs.seasons)
+    demand = np.broadcast_to(np.asarray(inputs.feed_demand, dtype=float), periods)
+
+    def lookup(table: Dict, default: float) -> np.ndarray:
+        return np.concatenate(
+            [
+                _per_item(names[:n_menu], table.get("menu", {}), default),
+                _per_item(names[n_menu:], table.get("feed", {}), default),
+            ]
+        )
+
+    price = np.concatenate([menu_price, feed_price])
+    stock = lookup(inputs.stock, 0.0)
+    caps = lookup(inputs.caps, np.inf)
+    can_buy = lookup(
+        {k: {n: float(v) for n, v in d.items()} for k, d in inputs.purchasable.items()},
+        1.0,
+    )
+    harvest = np.zeros((periods, n))
+    for j, (kind, name) in enumerate(zip(kinds, names)):
+        by_season = inputs.yields.get(kind, {}).get(name)
+        if by_season:
+            harvest[:, j] = [by_season.get(season, 0.0) for season in inputs.seasons]
+
+    eye_t = sparse.identity(periods, format="csr")
+    eye_n = sparse.identity(n, format="csr")
+    tn = periods * n
+    # Stock balance: carry[t] - carry[t-1] - buy[t] - picked[t] + use[t] = 0.
+    lag = sparse.eye(periods, k=-1, format="csr")
+    picked = np.flatnonzero(harvest.ravel() > 0)
+    balance = sparse.hstack(
+        [
+            -sparse.kron(eye_t, eye_n),
+            sparse.kron(eye_t, eye_n),
+            sparse.kron(eye_t - lag, eye_n),
+            -sparse.identity(tn, format="csr")[:, picked],
+        ]
+    )
+    balance_rhs = np.zeros(tn)
+    balance_rhs[:n] = stock
+
+    zeros_m = sparse.csr_matrix((len(menu_nutrients), n - n_menu))
+    zeros_f = sparse.csr_matrix((len(feed_nutrients), n_menu))
+    menu_block = sparse.hstack([menu_matrix, zeros_m])
+    feed_block = sparse.hstack([zeros_f, feed_matrix])
+    feed_total = sparse.hstack(
+        [sparse.csr_matrix((1, n_menu)), np.ones((1, n - n_menu))]
+    )
+    empty = sparse.csr_matrix((0, 3 * tn + len(picked)))
+
+    def on_use(block) -> sparse.csr_matrix:
+        rows = sparse.kron(eye_t, block)
+        pad = sparse.csr_matrix((rows.shape[0], tn))
+        tail = sparse.csr_matrix((rows.shape[0], tn + len(picked)))
+        return sparse.hstack([pad, rows, tail])
+
+    menu_rows = on_use(menu_block) if menu_nutrients else empty
+    feed_rows = on_use(feed_block) if feed_nutrients else empty
+    total_rows = on_use(feed_total) if n > n_menu else empty
+    matrix = sparse.vstack([balance, menu_rows, feed_rows, total_rows], format="csr")
+    matrix.eliminate_zeros()  # kron keeps the padding as explicit zeros
+
+    menu_req = np.array(list(inputs.menu_requirements.values()), dtype=float)
+    feed_req = np.array(list(inputs.feed_requirements.values()), dtype=float)
+    feed_rhs = np.outer(demand, feed_req).ravel()
+    total_rhs = demand if n > n_menu else np.zeros(0)
+    row_lower = np.concatenate(
+        [balance_rhs, np.tile(menu_req, periods), feed_rhs, total_rhs]
+    )
+    row_upper = np.concatenate(
+        [
+            balance_rhs,
+            np.full(menu_rows.shape[0] + feed_rows.shape[0], np.inf),
+            total_rhs,
+        ]
+    )
+
+    use_upper = np.tile(caps, (periods, 1))
+    # Feed caps are shares of demand; uncapped (inf) columns stay inf at zero
+    # demand rather than becoming inf * 0 = NaN.
+    feed_caps = use_upper[:, n_menu:]
+    np.multiply(feed_caps, demand[:, None], out=feed_caps, where=np.isfinite(feed_caps))
+    upper = np.concatenate(
+        [
+            np.where(np.tile(can_buy, periods) > 0, np.inf, 0.0),
+            use_upper.ravel(),
+            np.full(tn, np.inf),
+            harvest.ravel()[picked],
+        ]
+    )
+    cost = np.concatenate(
+        [
+            np.tile(price, periods),
+            np.zeros(tn),
+            np.full(tn, inputs.holding_cost),
+            np.zeros(len(picked)),
+        ]
+    )
+    labels = [f"{t}:{name}" for t in range(periods) for name in names]
+    program = LinearProgram(
+        cost=cost,
+        matrix=matrix,
+        row_lower=row_lower,
+        row_upper=row_upper,
+        lower=np.zeros(len(cost)),
+        upper=upper,
+        names=[f"buy:{x}" for x in labels]
+        + [f"use:{x}" for x in labels]
+        + [f"carry:{x}" for x in labels]
+        + [f"picked:{labels[k]}" for k in picked],
+        row_names=[f"balance:{x}" for x in labels]
+        + [f"{t}:{nut}" for t in range(periods) for nut in menu_nutrients]
+        + [f"{t}:feed:{nut}" for t in range(periods) for nut in feed_nutrients]
+        + [f"{t}:feed:total" for t in range(len(total_rhs))],
+    )
+    layout = {"names": names, "kinds": kinds, "periods": periods, "picked": picked}
+    return program, layout
+
+
+def plan_periods(
+    inputs: PlanningInputs, backend: Optional[str] = None, tolerance: float = 1e-9
+) -> Dict:
+    """Solve the horizon and return per-period purchases, use and stock.
+
+    Returns:
+        dict with ``cost`` and, per period, the season plus non-zero
+        ``buy``, ``menu``, ``feed``, ``harvest`` (picked) and ``carry``
+        amounts keyed by item name.
+    """
+    program, layout = planning_program(inputs)
+    result = get_backend(backend).solve(program)
+    if not result.ok:
+        raise ValueError("No feasible plan found")
+    periods, names, kinds = layout["periods"], layout["names"], layout["kinds"]
+    n = len(names)
+    tn = periods * n
+    buy, use, carry = result.x[: 3 * tn].reshape(3, periods, n)
+    harvest = np.zeros(tn)
+    harvest[layout["picked"]] = result.x[3 * tn :]
+    harvest = harvest.reshape(periods, n)
+    is_menu = np.array([kind == "menu" for kind in kinds], dtype=bool)
+
+    def nonzero(row: np.ndarray, mask: Optional[np.ndarray] = None) -> Dict:
+        keep = row > tolerance
+        if mask is not None:
+            keep &= mask
+        return {names[j]: float(row[j]) for j in np.flatnonzero(keep)}
+
+    schedule = []
+    for t in range(periods):
+        schedule.append(
+            {
+                "season": inputs.seasons[t],
+                "buy": nonzero(buy[t]),
+                "menu": nonzero(use[t], is_menu),
+                "feed": nonzero(use[t], ~is_menu),
+                "harvest": nonzero(harvest[t]),
+                "carry": nonzero(carry[t]),
+            }
+        )
+    return {"cost": float(result.objective), "periods": schedule}
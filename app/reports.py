@@ -0,0 +1,204 @@
+"""Append-only store of scenario reports.
+
+Scenario runs used to be written as ``data/reports/scenario_<timestamp>.json``.
+Two runs in the same second overwrote each other, and every comparison had
+to open and parse the whole directory. Reports are now rows of
+``scenario_reports``. Each numeric KPI is also mirrored into
+``scenario_kpis``, which is indexed on ``(name, value, report_id)``, so
+filters such as "oxygen demand below 400" are index range scans and do not
+parse JSON.
+
+:func:`migrate_files` imports the old JSON files. It is idempotent: each
+file is recorded as the report's ``source`` and skipped on later runs.
+"""
+from datetime import datetime
+import json
+import math
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional
+
+from sqlalchemy import and_, exists, insert
+from sqlmodel import Session, select
+
+from .models import ScenarioKPI, ScenarioReport
+
+
+def _numeric(kpis: Mapping[str, object]) -> Dict[str, float]:
+    values = {}
+    for name, value in kpis.items():
+        if isinstance(value, (bool, int, float)) and math.isfinite(value):
+            values[name] = float(value)
+    return values
+
+
+def save_report(
+    session: Session,
+    plan: Mapping[str, float],
+    kpis: Mapping[str, object],
+    source: Optional[str] = None,
+    created_at: Optional[datetime] = None,
+    commit: bool = True,
+) -> int:
+    """Append a report; returns its ``report_id``."""
+    report = ScenarioReport(
+        plan=dict(plan),
+        kpis=dict(kpis),
+        source=source,
+        created_at=created_at or datetime.utcnow(),
+    )
+    session.add(report)
+    session.flush()
+    rows = [
+        {"report_id": report.report_id, "name": name, "value": value}
+        for name, value in _numeric(kpis).items()
+    ]
+    if rows:
+        session.connection().execute(insert(ScenarioKPI.__table__), rows)
+    if commit:
+        session.commit()
+    return report.report_id
+
+
+def _summary(report: ScenarioReport) -> Dict:
+    return {
+        "report_id": report.report_id,
+        "created_at": report.created_at,
+        "source": report.source,
+        "kpis": report.kpis,
+    }
+
+
+def _has_kpi(name: str, condition) -> object:
+    return exists().where(
+        and_(
+            ScenarioKPI.report_id == ScenarioReport.report_id,
+            ScenarioKPI.name == name,
+            condition,
+        )
+    )
+
+
+def list_reports(
+    session: Session,
+    minimums: Optional[Dict[str, float]] = None,
+    maximums: Optional[Dict[str, float]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> List[Dict]:
+    """Newest reports first, filtered by KPI ranges and creation time.
+
+    A report matches a bound only if it recorded that KPI.
+
+    Returns:
+        list of dicts with ``report_id``, ``created_at``, ``source`` and
+        ``kpis`` (plans are left out; see :func:`get_report`).
+    """
+    clauses = [
+        _has_kpi(name, ScenarioKPI.value >= bound)
+        for name, bound in (minimums or {}).items()
+    ]
+    clauses += [
+        _has_kpi(name, ScenarioKPI.value <= bound)
+        for name, bound in (maximums or {}).items()
+    ]
+    if since is not None:
+        clauses.append(ScenarioReport.created_at >= since)
+    if until is not None:
+        clauses.append(ScenarioReport.created_at < until)
+    query = (
+        select(ScenarioReport)
+        .where(*clauses)
+        .order_by(ScenarioReport.created_at.desc(), ScenarioReport.report_id.desc())
+        .offset(offset)
+        .limit(limit)
+    )
+    return [_summary(report) for report in session.exec(query)]
+
+
+def get_report(session: Session, report_id: int) -> Optional[Dict]:
+    report = session.get(ScenarioReport, report_id)
+    if report is None:
+        return None
+    return {**_summary(report), "plan": report.plan}
+
+
+def _side_by_side(a: Mapping, b: Mapping) -> Dict[str, Dict]:
+    rows = {}
+    for name in sorted(set(a) | set(b)):
+        left, right = a.get(name), b.get(name)
+        numeric = all(
+            isinstance(v, (int, float)) and not isinstance(v, bool)
+            for v in (left, right)
+        )
+        rows[name] = {"a": left, "b": right, "delta": right - left if numeric else None}
+    return rows
+
+
+def diff_reports(session: Session, a: int, b: int) -> Dict:
+    """Plans and KPIs of two reports side by side, with ``b - a`` deltas.
+
+    Ingredients missing from one plan count as zero.
+
+    Raises:
+        KeyError: if either report does not exist.
+    """
+    left, right = session.get(ScenarioReport, a), session.get(ScenarioReport, b)
+    for report_id, report in ((a, left), (b, right)):
+        if report is None:
+            raise KeyError(report_id)
+    names = set(left.plan) | set(right.plan)
+    return {
+        "a": _summary(left),
+        "b": _summary(right),
+        "plan": _side_by_side(
+            {n: left.plan.get(n, 0.0) for n in names},
+            {n: right.plan.get(n, 0.0) for n in names},
+        ),
+        "kpis": _side_by_side(left.kpis, right.kpis),
+    }
+
+
+def migrate_files(session: Session, directory: str = "data/reports") -> int:
+    """Import ``scenario_*.json`` files not imported yet; returns the count."""
+    paths = sorted(Path(directory).glob("scenario_*.json"))
+    done = set(
+        session.exec(
+            select(ScenarioReport.source).where(
+                ScenarioReport.source.in_([f"file:{p.name}" for p in paths])
+            )
+        )
+    )
+    imported = 0
+    for path in paths:
+        source = f"file:{path.name}"
+        if source in done:
+            continue
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        created = None
+        if data.get("timestamp"):
+            created = datetime.strptime(data["timestamp"], "%Y%m%d%H%M%S")
+        plan, kpis = data.get("plan", {}), data.get("kpis", {})
+        save_report(session, plan, kpis, source, created, commit=False)
+        imported += 1
+    session.commit()
+    return imported
+
+
+def _cli() -> None:
+    """Import legacy JSON reports into the configured database."""
+    import sys
+
+    from .database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    directory = sys.argv[1] if len(sys.argv) > 1 else "data/reports"
+    with Session(engine) as session:
+        imported = migrate_files(session, directory)
+    print(f"Imported {imported} reports from {directory}")
+
+
+if __name__ == "__main__":  # pragma: no cover - manual utility
+    _cli()
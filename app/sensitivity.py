@@ -0,0 +1,414 @@
+"""Shadow prices, reduced costs and ranging for solved optimizer LPs.
+
+An optimal basis is recovered from the solution (variables strictly between
+their bounds are basic; degenerate vertices are completed with zero-cost
+columns), and the usual basis-based ranging is computed from it:
+
+* **cost ranging** – the interval each ingredient price can move in while
+  the plan stays optimal (the objective then changes by ``delta * x``);
+* **requirement ranging** – the interval each constraint bound can move in
+  while the shadow price stays valid (the objective changes by
+  ``dual * delta`` and the plan moves linearly along the basis).
+
+:meth:`Sensitivity.what_if` answers price and requirement perturbations from
+these without a solve when they satisfy the 100% rule, and re-solves
+otherwise. :meth:`Sensitivity.sweep` walks a parameter over many values,
+evaluating each basis' range in one vectorised step and re-solving only
+where the basis changes.
+
+Rows are written ``A x - s = 0`` with the row activity ``s`` bounded by the
+row bounds, so duals are ``d objective / d bound`` (positive for binding
+``>=`` requirements) exactly as reported by :mod:`app.lp`.
+"""
+from dataclasses import replace
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy import linalg, sparse
+
+from .lp import OPTIMAL, LinearProgram, LPSolution, get_backend
+
+PRIMAL_TOL = 1e-7
+DUAL_TOL = 1e-7
+PIVOT_TOL = 1e-9
+
+
+def _finite(value: float) -> Optional[float]:
+    return float(value) if np.isfinite(value) else None
+
+
+class Sensitivity:
+    """Basis-derived sensitivity analysis of an optimal :class:`LPSolution`.
+
+    Args:
+        lp: the program that was solved.
+        solution: its optimal solution (any backend).
+        backend: backend used when a what-if question needs a re-solve.
+    """
+
+    def __init__(
+        self, lp: LinearProgram, solution: LPSolution, backend: Optional[str] = None
+    ) -> None:
+        if solution.status != OPTIMAL:
+            raise ValueError("Sensitivity analysis needs an optimal solution")
+        self.lp = lp
+        self.solution = solution
+        self.backend = backend
+        self.index = {name: j for j, name in reversed(list(enumerate(lp.names)))}
+        self.row_index = {name: i for i, name in enumerate(lp.row_names)}
+        n, m = len(lp.cost), len(lp.row_lower)
+        self.n, self.m = n, m
+
+        self.columns = sparse.hstack(
+            [lp.matrix, -sparse.identity(m, format="csr")], format="csc"
+        )
+        self.lower = np.concatenate([lp.lower, lp.row_lower])
+        self.upper = np.concatenate([lp.upper, lp.row_upper])
+        self.cost = np.concatenate([lp.cost, np.zeros(m)])
+        self.z = np.concatenate([solution.x, lp.matrix @ solution.x])
+        # The bound each row is "about": its requirement, or the cap for <= rows.
+        self.bound = np.where(np.isfinite(lp.row_lower), lp.row_lower, lp.row_upper)
+
+        self.basic = self._find_basis()
+        self.available = self.basic is not None
+        if not self.available:
+            self.duals = solution.row_duals
+            self.reduced_costs = solution.reduced_costs
+            self.cost_lower = self.cost_upper = lp.cost.copy()
+            self.rhs_lower = self.rhs_upper = self.bound.copy()
+            return
+        self._analyse()
+
+    # -- basis -----------------------------------------------------------
+
+    def _find_basis(self) -> Optional[np.ndarray]:
+        z, lower, upper = self.z, self.lower, self.upper
+        scale = np.maximum(1.0, np.abs(z))
+        inside = (z > lower + PRIMAL_TOL * scale) & (z < upper - PRIMAL_TOL * scale)
+        basic = list(np.flatnonzero(inside))
+        if len(basic) > self.m:
+            return None  # not a vertex
+        dense = self.columns[:, basic].toarray()
+        q, r = np.linalg.qr(dense) if basic else (np.zeros((self.m, 0)), None)
+        if basic and np.min(np.abs(np.diag(r))) < PIVOT_TOL:
+            return None
+
+        if len(basic) < self.m:
+            # Complete a degenerate basis, preferring columns whose reduced
+            # cost (or row dual) is zero so the solver's duals are kept.
+            rc = self.solution.reduced_costs
+            duals = self.solution.row_duals
+            if rc is None or duals is None:
+                rc = np.zeros(self.n)
+                duals = np.zeros(self.m)
+            weight = np.abs(np.concatenate([rc, duals]))
+            weight[self.lower == self.upper] = np.inf
+            candidates = np.setdiff1d(np.arange(self.n + self.m), basic)
+            candidates = candidates[np.argsort(weight[candidates], kind="stable")]
+            for j in candidates:
+                v = self.columns[:, j].toarray().ravel()
+                residual = v - q @ (q.T @ v)
+                norm = np.linalg.norm(residual)
+                if norm > PIVOT_TOL * max(1.0, np.linalg.norm(v)):
+                    basic.append(j)
+                    q = np.column_stack([q, residual / norm])
+                    if len(basic) == self.m:
+                        break
+            if len(basic) < self.m:
+                return None
+        return np.array(basic)
+
+    def _analyse(self) -> None:
+        lp, n, m = self.lp, self.n, self.m
+        basic = self.basic
+        B = self.columns[:, basic].toarray()
+        self._lu = linalg.lu_factor(B)
+        self.B_inv = linalg.lu_solve(self._lu, np.eye(m))
+        y = linalg.lu_solve(self._lu, self.cost[basic], trans=1)
+        d = self.cost - self.columns.T @ y
+        d[basic] = 0.0
+
+        nonbasic = np.setdiff1d(np.arange(n + m), basic)
+        fixed = self.lower[nonbasic] == self.upper[nonbasic]
+        at_lower = ~fixed & (self.z[nonbasic] <= self.lower[nonbasic] + PRIMAL_TOL)
+        at_upper = ~fixed & ~at_lower
+        if np.any(d[nonbasic][at_lower] < -DUAL_TOL) or np.any(
+            d[nonbasic][at_upper] > DUAL_TOL
+        ):
+            # The completed degenerate basis is not dual feasible; report the
+            # solver's duals but treat every change as needing a re-solve.
+            self.available = False
+            self.duals = self.solution.row_duals
+            self.reduced_costs = self.solution.reduced_costs
+            self.cost_lower = self.cost_upper = lp.cost.copy()
+            self.rhs_lower = self.rhs_upper = self.bound.copy()
+            return
+        self.duals = y
+        self.reduced_costs = d[:n]
+
+        # Cost ranging: nonbasic variables move only their own reduced cost.
+        cost_lower = np.full(n, -np.inf)
+        cost_upper = np.full(n, np.inf)
+        structural = nonbasic < n
+        j = nonbasic[structural]
+        breakeven = lp.cost - d[:n]
+        lows, highs = j[at_lower[structural]], j[at_upper[structural]]
+        cost_lower[lows] = breakeven[lows]
+        cost_upper[highs] = breakeven[highs]
+        # Basic variables shift every nonbasic reduced cost by -delta * alpha.
+        positions = np.flatnonzero(basic < n)
+        if len(positions):
+            alpha = self.columns[:, nonbasic].T @ self.B_inv[positions].T
+            dn = d[nonbasic][:, None]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ratio = dn / alpha
+            live = np.abs(alpha) > PIVOT_TOL
+            lower_nb, upper_nb = at_lower[:, None], at_upper[:, None]
+            lo_side = live & ((lower_nb & (alpha < 0)) | (upper_nb & (alpha > 0)))
+            hi_side = live & ((lower_nb & (alpha > 0)) | (upper_nb & (alpha < 0)))
+            delta_lo = np.minimum(np.where(lo_side, ratio, -np.inf).max(axis=0), 0.0)
+            delta_hi = np.maximum(np.where(hi_side, ratio, np.inf).min(axis=0), 0.0)
+            cols = basic[positions]
+            cost_lower[cols] = lp.cost[cols] + delta_lo
+            cost_upper[cols] = lp.cost[cols] + delta_hi
+        self.cost_lower, self.cost_upper = cost_lower, cost_upper
+
+        # Requirement ranging: moving a nonbasic row bound moves z_B by B^-1 e_r.
+        delta_lo = np.full(m, -np.inf)
+        delta_hi = np.full(m, np.inf)
+        z_b = self.z[basic]
+        lo_b, hi_b = self.lower[basic], self.upper[basic]
+        pos = self.B_inv > PIVOT_TOL
+        neg = self.B_inv < -PIVOT_TOL
+        with np.errstate(divide="ignore", invalid="ignore"):
+            to_upper = (hi_b - z_b)[:, None] / self.B_inv
+            to_lower = (lo_b - z_b)[:, None] / self.B_inv
+        up = np.minimum(
+            np.where(pos, to_upper, np.inf), np.where(neg, to_lower, np.inf)
+        )
+        down = np.maximum(
+            np.where(pos, to_lower, -np.inf), np.where(neg, to_upper, -np.inf)
+        )
+        slack_basic = np.zeros(m, dtype=bool)
+        slack_basic[basic[basic >= n] - n] = True
+        tight = ~slack_basic
+        delta_lo[tight] = np.minimum(down.max(axis=0), 0.0)[tight]
+        delta_hi[tight] = np.maximum(up.min(axis=0), 0.0)[tight]
+        # A non-binding row can move until it meets the current activity.
+        activity = self.z[n:]
+        lower_rows = slack_basic & np.isfinite(lp.row_lower)
+        delta_hi[lower_rows] = (activity - self.bound)[lower_rows]
+        upper_rows = slack_basic & ~np.isfinite(lp.row_lower)
+        delta_lo[upper_rows] = (activity - self.bound)[upper_rows]
+        # A fixed (equality) row kept basic by a degenerate basis: no range.
+        fixed_rows = slack_basic & (lp.row_lower == lp.row_upper)
+        delta_lo[fixed_rows] = delta_hi[fixed_rows] = 0.0
+        self.rhs_lower = self.bound + delta_lo
+        self.rhs_upper = self.bound + delta_hi
+        self._slack_basic = slack_basic
+
+    # -- reporting -------------------------------------------------------
+
+    @property
+    def objective(self) -> float:
+        return float(self.lp.cost @ self.solution.x)
+
+    def report(self) -> Dict:
+        """JSON-friendly duals, reduced costs and ranging intervals."""
+        lp = self.lp
+
+        def by_name(names, values):
+            if values is None:
+                return {}
+            return dict(zip(names, np.asarray(values, dtype=float).tolist()))
+
+        return {
+            "objective": self.objective,
+            "exact": self.available,
+            "duals": by_name(lp.row_names, self.duals),
+            "reduced_costs": by_name(lp.names, self.reduced_costs),
+            "cost_ranges": {
+                name: [_finite(lo), _finite(hi)]
+                for name, lo, hi in zip(lp.names, self.cost_lower, self.cost_upper)
+            },
+            "requirement_ranges": {
+                name: [_finite(lo), _finite(hi)]
+                for name, lo, hi in zip(lp.row_names, self.rhs_lower, self.rhs_upper)
+            },
+        }
+
+    # -- what-if ---------------------------------------------------------
+
+    def _deltas(self, prices: Dict[str, float], requirements: Dict[str, float]):
+        dc = np.zeros(self.n)
+        db = np.zeros(self.m)
+        for name, value in (prices or {}).items():
+            if name not in self.index:
+                raise ValueError(f"Unknown ingredient: {name}")
+            j = self.index[name]
+            dc[j] = value - self.lp.cost[j]
+        for name, value in (requirements or {}).items():
+            if name not in self.row_index:
+                raise ValueError(f"Unknown requirement: {name}")
+            i = self.row_index[name]
+            db[i] = value - self.bound[i]
+        return dc, db
+
+    def _within(self, dc: np.ndarray, db: np.ndarray) -> np.ndarray:
+        """100% rule for batches of cost (``S x n``) and bound (``S x m``) deltas."""
+        if not self.available:
+            return ~(np.any(dc != 0, axis=1) | np.any(db != 0, axis=1))
+
+        def used(delta, centre, lo, hi):
+            room = np.where(delta > 0, hi - centre, centre - lo)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                share = np.where(delta != 0, np.abs(delta) / room, 0.0)
+            return np.nan_to_num(share, nan=np.inf).sum(axis=1)
+
+        costs = used(dc, self.lp.cost, self.cost_lower, self.cost_upper)
+        bounds = used(db, self.bound, self.rhs_lower, self.rhs_upper)
+        return (costs <= 1 + 1e-9) & (bounds <= 1 + 1e-9)
+
+    def _evaluate(self, dc: np.ndarray, db: np.ndarray):
+        """Plans and objectives for in-range batches, without solving."""
+        x = np.tile(self.solution.x, (len(dc), 1))
+        if self.available and np.any(db):
+            moving = np.where(self._slack_basic, 0.0, db)
+            shift = moving @ self.B_inv.T
+            structural = self.basic < self.n
+            x[:, self.basic[structural]] += shift[:, structural]
+        objective = np.einsum("sj,sj->s", self.lp.cost + dc, x)
+        return x, objective
+
+    def _resolve(self, dc: np.ndarray, db: np.ndarray) -> "Sensitivity":
+        lp = self.lp
+        row_lower = lp.row_lower.copy()
+        row_upper = lp.row_upper.copy()
+        has_lower = np.isfinite(lp.row_lower)
+        equal = lp.row_lower == lp.row_upper
+        row_lower[has_lower] += db[has_lower]
+        row_upper[~has_lower | equal] += db[~has_lower | equal]
+        program = replace(
+            lp, cost=lp.cost + dc, row_lower=row_lower, row_upper=row_upper
+        )
+        solution = get_backend(self.backend).solve(program)
+        if solution.status != OPTIMAL:
+            return _Infeasible(program, solution)
+        return Sensitivity(program, solution, self.backend)
+
+    def what_if(
+        self,
+        scenarios: Sequence[Dict[str, Dict[str, float]]],
+    ) -> List[Dict]:
+        """Answer a batch of ``{"prices": {...}, "requirements": {...}}`` scenarios.
+
+        Prices and requirements are new absolute values. Scenarios within the
+        ranging intervals (by the 100% rule) are evaluated together from the
+        basis; the rest are re-solved.
+
+        Returns:
+            one dict per scenario with ``objective``, ``plan``, ``resolved``
+            and ``status``.
+        """
+        if not scenarios:
+            return []
+        pairs = [
+            self._deltas(s.get("prices"), s.get("requirements")) for s in scenarios
+        ]
+        dc = np.array([p[0] for p in pairs])
+        db = np.array([p[1] for p in pairs])
+        inside = self._within(dc, db)
+        results: List[Optional[Dict]] = [None] * len(scenarios)
+        if inside.any():
+            x, objective = self._evaluate(dc[inside], db[inside])
+            for k, s in enumerate(np.flatnonzero(inside)):
+                results[s] = {
+                    "objective": float(objective[k]),
+                    "plan": dict(zip(self.lp.names, x[k].tolist())),
+                    "resolved": False,
+                    "status": OPTIMAL,
+                }
+        for s in np.flatnonzero(~inside):
+            other = self._resolve(dc[s], db[s])
+            results[s] = {
+                "objective": _finite(other.objective),
+                "plan": dict(zip(other.lp.names, other.solution.x.tolist())),
+                "resolved": True,
+                "status": other.solution.status,
+            }
+        return results
+
+    def sweep(
+        self,
+        values: Sequence[float],
+        price: Optional[str] = None,
+        requirement: Optional[str] = None,
+    ) -> List[Dict]:
+        """Objective over many values of one ingredient price or requirement.
+
+        Values inside the current basis' range are evaluated in one
+        vectorised step; the first value outside it is re-solved and its new
+        range covers the next stretch, so the number of solves equals the
+        number of basis changes crossed rather than the number of values.
+        """
+        if (price is None) == (requirement is None):
+            raise ValueError("Pass exactly one of price or requirement")
+        values = np.asarray(values, dtype=float)
+        objective = np.full(len(values), np.nan)
+        resolved = np.zeros(len(values), dtype=bool)
+        status = np.full(len(values), OPTIMAL, dtype=object)
+        pending = np.argsort(values, kind="stable")
+        analysis: "Sensitivity" = self
+        while len(pending):
+            dc = np.zeros((len(pending), analysis.n))
+            db = np.zeros((len(pending), analysis.m))
+            if price is not None:
+                j = analysis.index[price]
+                dc[:, j] = values[pending] - analysis.lp.cost[j]
+            else:
+                i = analysis.row_index[requirement]
+                db[:, i] = values[pending] - analysis.bound[i]
+            inside = analysis._within(dc, db)
+            if inside.any():
+                _, objective[pending[inside]] = analysis._evaluate(
+                    dc[inside], db[inside]
+                )
+                status[pending[inside]] = analysis.solution.status
+            pending = pending[~inside]
+            if not len(pending):
+                break
+            # Re-solve at the uncovered value closest to the current one.
+            gap = np.abs(dc[~inside].sum(axis=1) + db[~inside].sum(axis=1))
+            nearest = int(np.argmin(gap))
+            point = pending[nearest]
+            analysis = analysis._resolve(dc[~inside][nearest], db[~inside][nearest])
+            resolved[point] = True
+            if not isinstance(analysis, Sensitivity) or not analysis.available:
+                objective[point] = analysis.objective
+                status[point] = analysis.solution.status
+                pending = np.delete(pending, nearest)
+                if isinstance(analysis, _Infeasible):
+                    analysis = self
+        return [
+            {
+                "value": float(v),
+                "objective": _finite(o),
+                "resolved": bool(r),
+                "status": st,
+            }
+            for v, o, r, st in zip(values, objective, resolved, status)
+        ]
+
+
+class _Infeasible(Sensitivity):
+    """Placeholder for a perturbed problem that has no optimum."""
+
+    def __init__(self, lp: LinearProgram, solution: LPSolution) -> None:
+        self.lp = lp
+        self.solution = solution
+        self.available = False
+
+    @property
+    def objective(self) -> float:
+        return float("nan")
+
@@ -0,0 +1,224 @@
+"""LRU + TTL cache of optimizer results keyed by canonicalised inputs.
+
+Planners tend to post the same ingredient and requirement payloads again
+and again. Inputs are canonicalised before hashing (ingredients sorted by
+name, nutrient maps sorted, zero coefficients dropped and every number
+rounded to a fixed number of significant digits), so payloads that differ
+only in ordering or float noise share one entry.
+
+Entries remember which ingredient names they involve; committed changes to
+an ``Ingredient`` or ``FeedIngredient`` price, stock or cap evict the entries
+that mention it (see :func:`app.changes.watch`).
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, FrozenSet, List, Optional
+
+from .changes import Change, watch
+from .optimization import optimize_feed, optimize_menu
+
+SIGNIFICANT_DIGITS = 9
+
+
+def _round(value: float, digits: int) -> float:
+    return float(f"{float(value):.{digits}g}")
+
+
+def _canonical_map(values: Optional[Dict[str, float]], digits: int) -> List:
+    return sorted(
+        (name, _round(v, digits)) for name, v in (values or {}).items() if v is not None
+    )
+
+
+def _copy(value):
+    return dict(value) if isinstance(value, dict) else value
+
+
+def canonical_key(
+    kind: str,
+    ingredients: List[Dict],
+    requirements: Dict[str, float],
+    preferences: Optional[Dict[str, float]] = None,
+    caps: Optional[Dict[str, float]] = None,
+    inventory: Optional[Dict[str, float]] = None,
+    digits: int = SIGNIFICANT_DIGITS,
+) -> str:
+    """Stable hash of an optimization problem, independent of input order."""
+    canonical = {
+        "kind": kind,
+        "ingredients": sorted(
+            (
+                ing["name"],
+                _round(ing.get("cost", 0), digits),
+                [(n, v) for n, v in _canonical_map(ing["nutrients"], digits) if v],
+            )
+            for ing in ingredients
+        ),
+        "requirements": _canonical_map(requirements, digits),
+        "preferences": _canonical_map(preferences, digits),
+        "caps": _canonical_map(caps, digits),
+        "inventory": _canonical_map(inventory, digits),
+    }
+    payload = json.dumps(canonical, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+@dataclass
+class _Entry:
+    kind: str
+    names: FrozenSet[str]
+    expires: float
+    result: object
+
+
+class SolutionCache:
+    """Least-recently-used cache of optimizer plans with a time-to-live.
+
+    Plans are copied in and out; other values (such as sensitivity
+    analyses) are stored as they are and must not be mutated by callers.
+
+    Args:
+        max_entries: entries kept before the least recently used is evicted.
+        ttl: seconds an entry stays valid; ``0`` disables expiry.
+        clock: monotonic time source (overridable for tests).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+        self._invalidated = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, key: str) -> Optional[Dict[str, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and entry.expires <= self.clock():
+                del self._entries[key]
+                self._counts["expired"] += 1
+                entry = None
+            if entry is None:
+                self._counts["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counts["hits"] += 1
+            return _copy(entry.result)
+
+    def put(
+        self, key: str, kind: str, names: List[str], result: Dict[str, float]
+    ) -> None:
+        with self._lock:
+            self._entries[key] = _Entry(
+                kind, frozenset(names), self.clock() + self.ttl, _copy(result)
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counts["evicted"] += 1
+
+    def cached(
+        self, kind: str, key: str, names: List[str], compute: Callable[[], Dict]
+    ) -> Dict[str, float]:
+        """Return the cached plan for ``key`` or compute and store it."""
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, kind, names, result)
+        return result
+
+    def invalidate(
+        self, kind: Optional[str] = None, name: Optional[str] = None
+    ) -> int:
+        """Drop entries of ``kind`` (or all) that involve ``name`` (or any)."""
+        with self._lock:
+            stale = [
+                key
+                for key, entry in self._entries.items()
+                if (kind is None or entry.kind == kind)
+                and (name is None or name in entry.names)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self._invalidated += len(stale)
+            return len(stale)
+
+    def apply(self, changes: List[Change]) -> None:
+        """Evict entries affected by committed ingredient changes."""
+        for kind, name, field, _ in changes:
+            if field == "rebuild":
+                # Requirement rows do not feed payload-keyed entries.
+                if name is None:
+                    self.invalidate(kind)
+            else:
+                self.invalidate(kind, name)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self._counts["hits"] + self._counts["misses"]
+            return {
+                **self._counts,
+                "invalidated": self._invalidated,
+                "entries": len(self._entries),
+                "hit_rate": self._counts["hits"] / lookups if lookups else 0.0,
+            }
+
+    def optimize_menu(
+        self,
+        ingredients: List[Dict],
+        requirements: Dict[str, float],
+        preferences: Optional[Dict[str, float]] = None,
+        caps: Optional[Dict[str, float]] = None,
+        inventory: Optional[Dict[str, float]] = None,
+    ) -> Dict[str, float]:
+        """Cached :func:`app.optimization.optimize_menu`."""
+        key = canonical_key(
+            "menu", ingredients, requirements, preferences, caps, inventory
+        )
+        return self.cached(
+            "menu",
+            key,
+            [ing["name"] for ing in ingredients],
+            lambda: optimize_menu(
+                ingredients, requirements, preferences, caps, inventory
+            ),
+        )
+
+    def optimize_feed(
+        self,
+        ingredients: List[Dict],
+        requirements: Dict[str, float],
+        caps: Optional[Dict[str, float]] = None,
+        inventory: Optional[Dict[str, float]] = None,
+    ) -> Dict[str, float]:
+        """Cached :func:`app.optimization.optimize_feed`."""
+        key = canonical_key("feed", ingredients, requirements, None, caps, inventory)
+        return self.cached(
+            "feed",
+            key,
+            [ing["name"] for ing in ingredients],
+            lambda: optimize_feed(ingredients, requirements, caps, inventory),
+        )
+
+
+solutions = SolutionCache(ttl=float(os.getenv("SOLUTION_CACHE_TTL", "300")))
+analyses = SolutionCache(
+    max_entries=32, ttl=float(os.getenv("SOLUTION_CACHE_TTL", "300"))
+)
+watch(solutions)
+watch(analyses)
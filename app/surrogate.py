@@ -0,0 +1,176 @@
+"""In-process surrogate for the LES simulator.
+
+A remote LES run is too slow to score thousands of candidate feed plans.
+:class:`SurrogateLES` estimates the same headline KPIs from the plan's
+protein content. It reuses the repository's water models:
+
+* TAN load and biofilter utilisation from :func:`app.utils.tan_load_check`,
+  against a nitrification capacity from
+  :func:`aquaponics.water.tan_capacity_q10`;
+* ``nutrient_cycling``, the share of that TAN the biofilter nitrifies;
+* ``oxygen_demand`` (g/day): fish respiration per kg of feed plus 4.57 g O2
+  per g of TAN nitrified;
+* TAN left over after nitrification, accumulated over ``horizon_days`` with
+  :func:`aquaponics.dynamics.cstr_concentration`. The unionised share comes
+  from :func:`aquaponics.water.nh3_fraction`. The shortfall of water
+  exchange against the oxygen demand comes from
+  :func:`aquaponics.water.do_saturation`.
+
+These helpers are plain arithmetic, so they are applied to whole arrays and
+one call scores every plan. :func:`screen` ranks candidates with the
+surrogate and sends only the best ``k`` to the real LES. Because the
+surrogate has the same ``run_simulation`` interface, it can also replace
+``LESClient`` where no LES service is available, for example in tests.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from aquaponics.dynamics import cstr_concentration
+from aquaponics.water import do_saturation, nh3_fraction, tan_capacity_q10
+
+from .utils import tan_load_check
+
+O2_PER_FEED = 0.25  # g O2 respired per g feed
+O2_PER_TAN = 4.57  # g O2 per g TAN nitrified
+
+Plans = Union[Sequence[Mapping[str, float]], np.ndarray]
+
+
+@dataclass(frozen=True)
+class SystemParameters:
+    """Fixed properties of the simulated system."""
+
+    feed_kg_per_day: float = 1.0
+    temp_c: float = 25.0
+    ph: float = 7.0
+    volume_l: float = 10000.0
+    exchange_l_per_day: float = 1000.0
+    biofilter_area_m2: float = 100.0
+    nitrification_rate: float = 0.5  # g TAN/m^2/day at 20 C
+    horizon_days: float = 7.0
+
+
+class SurrogateLES:
+    """Vectorised KPI estimates for feed plans.
+
+    Args:
+        ingredients: ``{"name", "nutrients"}`` dicts as given to the
+            optimizers; ``nutrients["protein"]`` is the protein fraction.
+        params: system parameters; defaults to :class:`SystemParameters`.
+    """
+
+    base_url = "surrogate"
+    version = "surrogate-1"
+
+    def __init__(
+        self, ingredients: List[Dict], params: Optional[SystemParameters] = None
+    ) -> None:
+        self.params = params or SystemParameters()
+        self.names = [ing["name"] for ing in ingredients]
+        self._index = {name: j for j, name in enumerate(self.names)}
+        self.protein = np.array(
+            [ing["nutrients"].get("protein", 0.0) for ing in ingredients], dtype=float
+        )
+        p = self.params
+        self.capacity = tan_capacity_q10(
+            p.biofilter_area_m2, p.nitrification_rate, p.temp_c
+        )
+        self._nh3 = nh3_fraction(p.ph, p.temp_c)
+        self._o2_supply = do_saturation(p.temp_c) * p.exchange_l_per_day / 1000
+
+    def matrix(self, plans: Plans) -> np.ndarray:
+        """Plans as a ``(plans, ingredients)`` array of feed fractions."""
+        if isinstance(plans, np.ndarray):
+            return np.atleast_2d(plans).astype(float)
+        out = np.zeros((len(plans), len(self.names)))
+        for i, plan in enumerate(plans):
+            for name, amount in plan.items():
+                j = self._index.get(name)
+                if j is None:
+                    raise ValueError(f"Unknown ingredient in plan: {name}")
+                out[i, j] = amount
+        return out
+
+    def evaluate(self, plans: Plans) -> Dict[str, np.ndarray]:
+        """KPI arrays, one entry per plan."""
+        p = self.params
+        x = self.matrix(plans)
+        feed_g = p.feed_kg_per_day * 1000 * x.sum(axis=1)
+        protein_g = p.feed_kg_per_day * 1000 * (x @ self.protein)
+        utilization, within = tan_load_check(protein_g, self.capacity)
+        tan = utilization / 100 * self.capacity
+        nitrified = np.minimum(tan, self.capacity)
+        cycling = np.divide(
+            nitrified, tan, out=np.ones_like(tan), where=tan > 0
+        )
+        # Un-nitrified TAN accumulates until water exchange carries it away.
+        tan_mg_l = cstr_concentration(
+            0.0,
+            (tan - nitrified) * 1000 / p.exchange_l_per_day,
+            p.exchange_l_per_day,
+            p.volume_l,
+            p.horizon_days,
+        )
+        oxygen = feed_g * O2_PER_FEED + nitrified * O2_PER_TAN
+        return {
+            "oxygen_demand": oxygen,
+            "nutrient_cycling": cycling,
+            "tan_load": tan,
+            "biofilter_utilization": utilization,
+            "within_capacity": np.asarray(within),
+            "tan_mg_l": tan_mg_l,
+            "nh3_mg_l": tan_mg_l * self._nh3,
+            "aeration_demand": np.maximum(oxygen - self._o2_supply, 0.0),
+        }
+
+    def run_simulation(self, plan: Mapping[str, float]) -> Dict[str, object]:
+        """Same result shape as :meth:`app.les_client.LESClient.run_simulation`."""
+        return self.run_many([plan])[0]
+
+    def run_many(self, plans: Plans) -> List[Dict[str, object]]:
+        kpis = self.evaluate(plans)
+        return [
+            {name: values[i].item() for name, values in kpis.items()}
+            for i in range(len(kpis["oxygen_demand"]))
+        ]
+
+
+def screen(
+    plans: Sequence[Mapping[str, float]],
+    surrogate: SurrogateLES,
+    client=None,
+    k: int = 10,
+    kpi: str = "oxygen_demand",
+    maximize: bool = False,
+) -> List[Dict]:
+    """Rank ``plans`` with the surrogate and simulate the best ``k`` remotely.
+
+    Plans that overload the biofilter are ranked after all plans that do
+    not.
+
+    Returns:
+        up to ``k`` dicts, best first, with ``index`` into ``plans``,
+        ``plan``, the surrogate ``estimate`` and the LES ``kpis`` (``None``
+        without a ``client``).
+    """
+    estimates = surrogate.evaluate(plans)
+    score = estimates[kpi] * (-1 if maximize else 1)
+    order = np.lexsort((score, ~estimates["within_capacity"]))[:k]
+    chosen = [plans[i] for i in order]
+    if client is None:
+        kpis: List[Optional[Dict]] = [None] * len(chosen)
+    elif hasattr(client, "run_many"):
+        kpis = client.run_many(chosen)
+    else:
+        kpis = [client.run_simulation(plan) for plan in chosen]
+    return [
+        {
+            "index": int(i),
+            "plan": dict(plan),
+            "estimate": {name: values[i].item() for name, values in estimates.items()},
+            "kpis": result,
+        }
+        for i, plan, result in zip(order, chosen, kpis)
+    ]
@@ -21,25 +21,132 @@ def tan_load_check(protein_feed_g: float, biofilter_cap_g: float):
     return utilization_pct, utilization_pct <= 100
 
 
-from typing import Dict
+from typing import Dict, List, Optional
 from sqlmodel import Session
 
-from .database import get_feed_inputs, get_menu_inputs
-from .optimization import optimize_feed, optimize_menu
+from .catalog import catalogs
+from .database import get_seasonal_yields
+from .optimization import optimize_feed, optimize_household, optimize_menu
+from .planning import GRANULARITIES, PlanningInputs, period_seasons, plan_periods
 
 
 def run_optimizations(session: Session, persona: str) -> Dict[str, Dict[str, float]]:
     """Run both menu and feed optimizations and aggregate the results."""
 
-    menu_inputs = get_menu_inputs(session, persona)
+    menu_inputs = catalogs.menu_inputs(session, persona)
     menu_solution = optimize_menu(*menu_inputs)
 
-    feed_inputs = get_feed_inputs(session)
+    feed_inputs = catalogs.feed_inputs(session)
     feed_solution = optimize_feed(*feed_inputs)
 
     return {"menu": menu_solution, "feed": feed_solution}
 
 
+def run_household(
+    session: Session,
+    personas: List[str],
+    shared_inventory: bool = True,
+    workers: int = 1,
+) -> Dict[str, Dict]:
+    """Plan menus for several personas together with the feed.
+
+    With ``shared_inventory`` the personas draw on one stock and are solved
+    as a single LP; otherwise each is solved independently, one after the
+    other unless ``workers`` > 1 sends them to the shared job pool.
+    """
+
+    ingredients, requirements, preferences, caps, inventory = (
+        catalogs.household_inputs(session, personas)
+    )
+    menus = optimize_household(
+        ingredients,
+        requirements,
+        preferences,
+        caps,
+        inventory,
+        shared_inventory=shared_inventory,
+        workers=workers,
+    )
+
+    feed_inputs = catalogs.feed_inputs(session)
+    feed_solution = optimize_feed(*feed_inputs)
+
+    return {"menus": menus, "feed": feed_solution}
+
+
+def plan_inputs(
+    session: Session,
+    persona: str,
+    periods: int = 52,
+    granularity: str = "week",
+    feed_kg: float = 0.0,
+    start_week: int = 1,
+    hemisphere: str = "north",
+    holding_cost: float = 0.0,
+) -> PlanningInputs:
+    """Database inputs for :func:`run_plan`.
+
+    Persona requirements and ingredient caps are daily amounts and are scaled
+    to the period length; ``feed_kg`` is the feed needed per day. Opening
+    stock comes from ``stock_on_hand`` and on-farm harvests from
+    ``SeasonalYield`` net of ``ProcessingLossFactor`` losses. Ingredients
+    without a price can be used from stock or harvest but not bought.
+    """
+
+    seasons = period_seasons(periods, granularity, start_week, hemisphere)
+    days, periods_per_season = GRANULARITIES[granularity]
+    # Planning may buy ingredients that are out of stock today.
+    menu, requirements = catalogs.menu_inputs(session, persona, in_stock=False)[:2]
+    feed, feed_requirements = catalogs.feed_inputs(session, in_stock=False)[:2]
+    menu_caps = menu.as_dict("cap")
+    return PlanningInputs(
+        menu_ingredients=menu,
+        menu_requirements={n: v * days for n, v in requirements.items()},
+        feed_ingredients=feed,
+        feed_requirements=feed_requirements if feed_kg else {},
+        seasons=seasons,
+        feed_demand=[feed_kg * days] * periods,
+        yields=get_seasonal_yields(session, periods_per_season),
+        stock={"menu": menu.as_dict("inventory"), "feed": feed.as_dict("inventory")},
+        caps={
+            "menu": {n: v * days for n, v in menu_caps.items()},
+            "feed": feed.as_dict("cap"),
+        },
+        # Unpriced rows (e.g. FDC reference foods) are not for sale.
+        purchasable={
+            kind: {n: False for n, cost in catalog.as_dict("cost").items() if cost <= 0}
+            for kind, catalog in (("menu", menu), ("feed", feed))
+        },
+        holding_cost=holding_cost,
+    )
+
+
+def run_plan(
+    session: Session,
+    persona: str,
+    periods: int = 52,
+    granularity: str = "week",
+    feed_kg: float = 0.0,
+    start_week: int = 1,
+    hemisphere: str = "north",
+    holding_cost: float = 0.0,
+    backend: Optional[str] = None,
+) -> Dict:
+    """Plan purchases, menus and feed over several weeks or seasons."""
+
+    inputs = plan_inputs(
+        session,
+        persona,
+        periods,
+        granularity,
+        feed_kg,
+        start_week,
+        hemisphere,
+        holding_cost,
+    )
+    return plan_periods(inputs, backend)
+
+
 def _cli(persona: str) -> None:
     """Simple CLI for running both optimizers."""
     from .database import get_engine
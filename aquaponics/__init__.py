@@ -1,20 +1,18 @@
-"""Utility functions for aquaponics calculations."""
-
-from .kpis import condition_factor, survival_rate
-
-__all__ = ["survival_rate", "condition_factor"]
-
 """Core algorithms for aquaponics analytics."""
 
-from .filters import hampel_filter, ewma
+from .filters import ewma, ewma_time, hampel_filter, hampel_filter_time
 from .water import nh3_fraction, do_saturation, tan_capacity_q10
 from .dynamics import cstr_concentration
 from .growth import tgc_growth
 from .alerts import Alert, check_threshold
+from .kpis import condition_factor, feed_conversion_ratio, survival_rate
+from .forecasting import HoltWinters, fit_holt_winters
 
 __all__ = [
     "hampel_filter",
     "ewma",
+    "hampel_filter_time",
+    "ewma_time",
     "nh3_fraction",
     "do_saturation",
     "tan_capacity_q10",
@@ -22,12 +20,9 @@ __all__ = [
     "tgc_growth",
     "Alert",
     "check_threshold",
+    "survival_rate",
+    "condition_factor",
+    "feed_conversion_ratio",
+    "HoltWinters",
+    "fit_holt_winters",
 ]
-
-
-"""Utilities for aquaponics calculations."""
-
-from .kpis import feed_conversion_ratio
-
-__all__ = ["feed_conversion_ratio"]
-
@@ -1,7 +1,10 @@
 """Filtering utilities for sensor data."""
 from __future__ import annotations
 
-from typing import Iterable, List
+from bisect import bisect_left, insort
+from collections import deque
+import math
+from typing import Deque, Iterable, List, Optional, Tuple
 import statistics as stats
 
 
@@ -28,10 +31,6 @@ def hampel_filter(data: Iterable[float], window_size: int = 5, n_sigmas: float =
     ValueError
         If ``window_size`` or ``n_sigmas`` are not greater than ``0``.
     """
-    if window_size <= 0:
-        raise ValueError("window_size must be > 0")
-    if n_sigmas <= 0:
-        raise ValueError("n_sigmas must be > 0")
     x = list(map(float, data))
     if window_size <= 0:
         raise ValueError("window_size must be positive")
@@ -76,8 +75,6 @@ def ewma(data: Iterable[float], alpha: float) -> List[float]:
     ValueError
         If ``alpha`` is not within ``(0, 1]``.
     """
-    if not 0 < alpha <= 1:
-        raise ValueError("alpha must be in (0, 1]")
     x = list(map(float, data))
     if not (0 < alpha <= 1):
         raise ValueError("alpha must satisfy 0 < alpha <= 1")
@@ -87,3 +84,148 @@ def ewma(data: Iterable[float], alpha: float) -> List[float]:
     for value in x[1:]:
         ewma_vals.append(alpha * value + (1 - alpha) * ewma_vals[-1])
     return ewma_vals
+
+
+class TimeWindowHampel:
+    """Streaming Hampel filter over a trailing time window.
+
+    Unlike :func:`hampel_filter`, the window is defined in time units rather
+    than samples, so sensor dropouts do not stretch it. Each value is judged
+    against the readings whose timestamps fall within ``window`` of it
+    (inclusive of the value itself). Values are kept in a deque for expiry and
+    in a sorted list for the median, so each update costs ``O(log n)`` plus
+    the median absolute deviation over the window.
+
+    Parameters
+    ----------
+    window : float
+        Window length in the same unit as the timestamps. Must be positive.
+    n_sigmas : float, optional
+        Threshold in scaled median absolute deviations. Must be positive.
+    min_samples : int, optional
+        Windows holding fewer samples pass values through unchanged.
+    """
+
+    def __init__(self, window: float, n_sigmas: float = 3.0, min_samples: int = 3) -> None:
+        if window <= 0:
+            raise ValueError("window must be positive")
+        if n_sigmas <= 0:
+            raise ValueError("n_sigmas must be positive")
+        self.window = window
+        self.n_sigmas = n_sigmas
+        self.min_samples = min_samples
+        self._recent: Deque[Tuple[float, float]] = deque()
+        self._sorted: List[float] = []
+        self.last_time: Optional[float] = None
+
+    def update(self, timestamp: float, value: float) -> float:
+        """Add a reading and return its filtered value."""
+        if self.last_time is not None and timestamp < self.last_time:
+            raise ValueError("timestamps must be non-decreasing")
+        self.last_time = timestamp
+        value = float(value)
+        self._recent.append((timestamp, value))
+        insort(self._sorted, value)
+        while self._recent[0][0] < timestamp - self.window:
+            _, old = self._recent.popleft()
+            del self._sorted[bisect_left(self._sorted, old)]
+        if len(self._sorted) < self.min_samples:
+            return value
+        median = _sorted_median(self._sorted)
+        mad = stats.median([abs(v - median) for v in self._sorted])
+        if mad == 0:
+            return median if value != median else value
+        if abs(value - median) > self.n_sigmas * 1.4826 * mad:
+            return median
+        return value
+
+
+class TimeWeightedEWMA:
+    """Exponentially weighted moving average for irregular timestamps.
+
+    The smoothing weight of each new value is ``1 - exp(-dt / tau)`` where
+    ``dt`` is the time since the previous reading, so a long gap lets the
+    average catch up instead of being treated like a single sample step.
+
+    Parameters
+    ----------
+    tau : float
+        Time constant in the same unit as the timestamps. Must be positive.
+    """
+
+    def __init__(self, tau: float) -> None:
+        if tau <= 0:
+            raise ValueError("tau must be positive")
+        self.tau = tau
+        self.value: Optional[float] = None
+        self.last_time: Optional[float] = None
+
+    def update(self, timestamp: float, value: float) -> float:
+        """Add a reading and return the smoothed value."""
+        if self.last_time is not None and timestamp < self.last_time:
+            raise ValueError("timestamps must be non-decreasing")
+        value = float(value)
+        if self.value is None:
+            self.value = value
+        else:
+            alpha = 1 - math.exp(-(timestamp - self.last_time) / self.tau)
+            self.value = alpha * value + (1 - alpha) * self.value
+        self.last_time = timestamp
+        return self.value
+
+
+def _sorted_median(values: List[float]) -> float:
+    n = len(values)
+    mid = n // 2
+    if n % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2
+
+
+def hampel_filter_time(
+    timestamps: Iterable[float],
+    data: Iterable[float],
+    window: float,
+    n_sigmas: float = 3.0,
+) -> List[float]:
+    """Apply :class:`TimeWindowHampel` to a whole series.
+
+    Parameters
+    ----------
+    timestamps : Iterable[float]
+        Non-decreasing sample times, e.g. seconds since the epoch.
+    data : Iterable[float]
+        Values aligned with ``timestamps``.
+    window : float
+        Trailing window length in timestamp units.
+    n_sigmas : float, optional
+        Threshold in scaled median absolute deviations.
+
+    Returns
+    -------
+    List[float]
+        Filtered values with outliers replaced by the window median.
+    """
+    f = TimeWindowHampel(window, n_sigmas)
+    return [f.update(t, v) for t, v in zip(timestamps, data)]
+
+
+def ewma_time(timestamps: Iterable[float], data: Iterable[float], tau: float) -> List[float]:
+    """Apply :class:`TimeWeightedEWMA` to a whole series.
+
+    Parameters
+    ----------
+    timestamps : Iterable[float]
+        Non-decreasing sample times.
+    data : Iterable[float]
+        Values aligned with ``timestamps``.
+    tau : float
+        Time constant in timestamp units.
+
+    Returns
+    -------
+    List[float]
+        Smoothed values.
+    """
+    f = TimeWeightedEWMA(tau)
+    return [f.update(t, v) for t, v in zip(timestamps, data)]
@@ -0,0 +1,201 @@
+"""Incremental Holt-Winters forecasting for sensor streams."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Iterable, List, Sequence
+
+import numpy as np
+
+
+@dataclass
+class HoltWinters:
+    """Additive Holt-Winters state that is updated one observation at a time.
+
+    Each call to :meth:`update` costs ``O(1)`` regardless of how much history
+    has been seen, so the model can follow a live sensor stream without ever
+    being refitted.
+
+    Parameters
+    ----------
+    level: float
+        Current smoothed level.
+    trend: float
+        Current smoothed trend per step.
+    season: List[float]
+        Additive seasonal offsets, one per position in the cycle. A single
+        zero entry disables seasonality.
+    alpha, beta, gamma: float
+        Smoothing factors for level, trend and season. Must satisfy
+        ``0 < alpha <= 1`` and ``0 <= beta, gamma <= 1``.
+    n: int
+        Number of observations absorbed so far; selects the season slot.
+    variance: float
+        Exponentially weighted variance of the one-step-ahead errors.
+    """
+
+    level: float
+    trend: float = 0.0
+    season: List[float] = field(default_factory=lambda: [0.0])
+    alpha: float = 0.3
+    beta: float = 0.05
+    gamma: float = 0.1
+    n: int = 0
+    variance: float = 0.0
+
+    def __post_init__(self) -> None:
+        _check_factors(self.alpha, self.beta, self.gamma)
+        if not self.season:
+            raise ValueError("season must contain at least one value")
+        if len(self.season) == 1:
+            self.gamma = 0.0
+
+    @property
+    def season_length(self) -> int:
+        return len(self.season)
+
+    @property
+    def sigma(self) -> float:
+        """Standard deviation of the one-step-ahead forecast error."""
+        return float(self.variance**0.5)
+
+    def update(self, value: float) -> float:
+        """Absorb ``value`` and return the one-step-ahead forecast error."""
+        value = float(value)
+        slot = self.n % len(self.season)
+        seasonal = self.season[slot]
+        error = value - (self.level + self.trend + seasonal)
+        previous_level = self.level
+        self.level = self.alpha * (value - seasonal) + (1 - self.alpha) * (
+            self.level + self.trend
+        )
+        self.trend = self.beta * (self.level - previous_level) + (
+            1 - self.beta
+        ) * self.trend
+        self.season[slot] = self.gamma * (value - self.level) + (
+            1 - self.gamma
+        ) * seasonal
+        self.variance = self.alpha * error * error + (1 - self.alpha) * self.variance
+        self.n += 1
+        return error
+
+    def forecast(self, horizon: int = 1) -> List[float]:
+        """Forecast the next ``horizon`` observations."""
+        if horizon <= 0:
+            raise ValueError("horizon must be positive")
+        m = len(self.season)
+        return [
+            self.level + h * self.trend + self.season[(self.n + h - 1) % m]
+            for h in range(1, horizon + 1)
+        ]
+
+
+def _check_factors(alpha: float, beta: float, gamma: float) -> None:
+    if not (0 < alpha <= 1):
+        raise ValueError("alpha must satisfy 0 < alpha <= 1")
+    if not (0 <= beta <= 1):
+        raise ValueError("beta must satisfy 0 <= beta <= 1")
+    if not (0 <= gamma <= 1):
+        raise ValueError("gamma must satisfy 0 <= gamma <= 1")
+
+
+def _initial_components(values: np.ndarray, season_length: int):
+    """Classical decomposition of the first cycles into level, trend, season."""
+    m = season_length
+    first = values[:m]
+    level = float(first.mean())
+    trend = 0.0
+    if m > 1 and len(values) >= 2 * m:
+        trend = float((values[m : 2 * m].mean() - level) / m)
+    season = np.zeros(m)
+    if m > 1 and len(values) >= m:
+        season = first - (level + trend * (np.arange(m) - (m - 1) / 2))
+    # Step the level back to just before the first observation.
+    return level - trend * ((m - 1) / 2 + 1), trend, season
+
+
+def fit_holt_winters(
+    series: Sequence[Iterable[float]],
+    season_length: int = 1,
+    alpha: float = 0.3,
+    beta: float = 0.05,
+    gamma: float = 0.1,
+) -> List[HoltWinters]:
+    """Fit one :class:`HoltWinters` state per series in a single vectorised pass.
+
+    The recursion is evaluated for all streams at once, one time step per
+    iteration, so fitting hundreds of streams costs about as much as fitting
+    the longest one. Streams of different lengths are supported.
+
+    Parameters
+    ----------
+    series: Sequence[Iterable[float]]
+        Historical values for each stream in chronological order. Every
+        stream must contain at least one value.
+    season_length: int, optional
+        Number of observations per seasonal cycle. ``1`` disables seasonality.
+    alpha, beta, gamma: float, optional
+        Smoothing factors shared by all streams.
+
+    Returns
+    -------
+    List[HoltWinters]
+        Model states ready for incremental :meth:`HoltWinters.update` calls.
+
+    Raises
+    ------
+    ValueError
+        If a stream is empty or the parameters are invalid.
+    """
+    _check_factors(alpha, beta, gamma)
+    if season_length <= 0:
+        raise ValueError("season_length must be positive")
+    if season_length == 1:
+        gamma = 0.0
+    arrays = [np.asarray(list(s), dtype=float) for s in series]
+    if not arrays:
+        return []
+    if any(len(a) == 0 for a in arrays):
+        raise ValueError("every series must contain at least one value")
+
+    m = season_length
+    count = len(arrays)
+    lengths = np.array([len(a) for a in arrays])
+    values = np.full((count, int(lengths.max())), np.nan)
+    level = np.empty(count)
+    trend = np.empty(count)
+    season = np.empty((count, m))
+    for i, a in enumerate(arrays):
+        values[i, : len(a)] = a
+        level[i], trend[i], season[i] = _initial_components(a, m)
+    variance = np.zeros(count)
+    rows = np.arange(count)
+
+    for t in range(values.shape[1]):
+        y = values[:, t]
+        active = t < lengths
+        slot = t % m
+        seasonal = season[:, slot]
+        error = y - (level + trend + seasonal)
+        new_level = alpha * (y - seasonal) + (1 - alpha) * (level + trend)
+        new_trend = beta * (new_level - level) + (1 - beta) * trend
+        new_season = gamma * (y - new_level) + (1 - gamma) * seasonal
+        level = np.where(active, new_level, level)
+        trend = np.where(active, new_trend, trend)
+        season[rows, slot] = np.where(active, new_season, seasonal)
+        variance = np.where(
+            active, alpha * error * error + (1 - alpha) * variance, variance
+        )
+
+    return [
+        HoltWinters(
+            level=float(level[i]),
+            trend=float(trend[i]),
+            season=season[i].tolist(),
+            alpha=alpha,
+            beta=beta,
+            gamma=gamma,
+            n=int(lengths[i]),
+            variance=float(variance[i]),
+        )
+        for i in range(count)
+    ]
@@ -7,16 +7,12 @@ def tgc_growth(initial_weight_g: float, tgc: float, temp_sum: float) -> float:
     Parameters
     ----------
     initial_weight_g: float
-        Starting fish weight in grams. Must be non-negative.
+        Starting fish weight in grams. Must be positive.
     tgc: float
-        Thermal Growth Coefficient (per degree-day). Must be non-negative.
+        Thermal Growth Coefficient (per degree-day). Must be positive.
     temp_sum: float
         Cumulative temperature above maintenance (degree-days). Must be non-negative.
     """
-    if initial_weight_g < 0:
-        raise ValueError("initial_weight_g must be non-negative")
-    if tgc < 0:
-        raise ValueError("tgc must be non-negative")
     if initial_weight_g <= 0:
         raise ValueError("initial_weight_g must be positive")
     if tgc <= 0:
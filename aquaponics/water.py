@@ -32,10 +32,8 @@ def do_saturation(temp_c: float) -> float:
     Parameters
     ----------
     temp_c: float
-        Water temperature in Celsius. Must be non-negative.
+        Water temperature in Celsius. Must be between 0 and 40.
     """
-    if temp_c < 0:
-        raise ValueError("temp_c must be non-negative")
     if not (0 <= temp_c <= 40):
         raise ValueError("temp_c must be between 0 and 40")
     temp_k = temp_c + 273.15
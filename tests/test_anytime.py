@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import lp
+from app.anytime import RELAXED, dual_bound, lagrangian_bound, solve_within
+from app.benchmark import synthetic_catalog
+from app.main import app
+from app.optimization import feed_program, menu_program, optimize_feed, optimize_menu
+
+
+def _menu(items=3000, nutrients=100):
+    catalog = synthetic_catalog(items, nutrients, seed=1)
+    return menu_program(
+        catalog["ingredients"],
+        catalog["menu_requirements"],
+        catalog["preferences"],
+        catalog["caps"],
+        catalog["inventory"],
+    )
+
+
+@pytest.mark.parametrize("backend", ["glop", "highs"])
+def test_time_limit_returns_best_feasible_with_valid_gap(backend):
+    program = _menu()
+    optimum = lp.solve(program, backend).objective
+    result = solve_within(program, backend, time_limit=0.005)
+    assert result.status in (lp.OPTIMAL, lp.FEASIBLE)
+    assert program.violation(result.x) < 1e-6
+    assert result.elapsed < 1.0
+    assert result.objective >= optimum - 1e-6
+    assert result.gap is not None and result.gap >= 0
+    # The reported gap brackets the true optimum.
+    scale = max(1.0, abs(result.objective))
+    assert result.objective - result.gap * scale <= optimum + 1e-6
+
+    unlimited = solve_within(program, backend, time_limit=60)
+    assert unlimited.status == lp.OPTIMAL and unlimited.gap == 0.0
+    assert unlimited.objective == pytest.approx(optimum, rel=1e-6)
+
+
+def test_lagrangian_bounds_are_valid_and_tight_at_the_duals():
+    program = _menu(300, 20)
+    result = lp.solve(program, "highs")
+    bound, _ = lagrangian_bound(program, result.row_duals)
+    assert bound == pytest.approx(result.objective, rel=1e-6)
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        y = rng.random(program.shape[0])
+        assert dual_bound(program, result.objective, y) <= result.objective + 1e-6
+    # Subgradient steps from zero tighten the trivial bound.
+    assert dual_bound(program, result.objective) > dual_bound(
+        program, result.objective, iterations=0
+    )
+
+
+def test_infeasible_problems_return_minimum_violation_plans():
+    ingredients = [
+        {"name": "kale", "cost": 1.0, "nutrients": {"protein": 1.0, "iron": 1.0}},
+        {"name": "tofu", "cost": 3.0, "nutrients": {"protein": 2.0}},
+    ]
+    requirements = {"protein": 10.0, "iron": 4.0}
+    inventory = {"kale": 2.0, "tofu": 1.0}
+    with pytest.raises(ValueError):
+        optimize_menu(ingredients, requirements, inventory=inventory)
+    report = optimize_menu(
+        ingredients, requirements, inventory=inventory, time_limit=5
+    )
+    assert report["status"] == RELAXED
+    assert report["plan"] == pytest.approx({"kale": 2.0, "tofu": 1.0})
+    assert report["violations"] == pytest.approx({"protein": 6.0, "iron": 2.0})
+    assert report["objective"] == pytest.approx(5.0)
+
+    # The cheapest plan at the minimum violation: only 0.5 of the feed can
+    # be made, and it is made from the cheaper ingredient where possible.
+    feed = optimize_feed(
+        ingredients,
+        {"protein": 1.0},
+        caps={"kale": 0.25, "tofu": 0.25},
+        time_limit=5,
+    )
+    assert feed["status"] == RELAXED
+    assert feed["plan"] == pytest.approx({"kale": 0.25, "tofu": 0.25})
+    assert feed["violations"] == pytest.approx({"protein": 0.25, "total": 0.5})
+
+
+def test_reports_and_endpoint():
+    ingredients = [
+        {"name": "soy", "cost": 0.8, "nutrients": {"protein": 0.5}},
+        {"name": "fishmeal", "cost": 2.0, "nutrients": {"protein": 0.65}},
+    ]
+    program = feed_program(ingredients, {"protein": 0.55})
+    assert solve_within(program, "greedy").status == lp.INFEASIBLE
+    report = optimize_feed(ingredients, {"protein": 0.55}, time_limit=5)
+    assert report["status"] == lp.OPTIMAL and report["gap"] == 0.0
+    assert report["elapsed"] >= 0 and report["violations"] == {}
+
+    client = TestClient(app)
+    body = client.post(
+        "/optimize/fish-feed",
+        json={
+            "ingredients": ingredients,
+            "requirements": {"protein": 0.9},
+            "time_limit": 0.5,
+        },
+    ).json()
+    assert body["status"] == RELAXED
+    assert body["plan"] == pytest.approx({"soy": 0.0, "fishmeal": 1.0}, abs=1e-6)
+    bad = client.post(
+        "/optimize/human-menu",
+        json={"ingredients": ingredients, "requirements": {}, "time_limit": 0},
+    )
+    assert bad.status_code == 422
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.archive import ReadingArchive, aggregate_readings
+from app.database import get_session
+from app.main import app
+from app.models import EventLog, WaterReading
+
+T0 = datetime(2024, 1, 30)
+
+
+def _setup(session):
+    for day in range(5):
+        for parameter, value in (("pH", 7.0 + day / 10), ("temp", 20.0 + day)):
+            session.add(
+                WaterReading(
+                    parameter=parameter,
+                    value=value,
+                    timestamp=T0 + timedelta(days=day),
+                    location="tank1" if parameter == "temp" else None,
+                )
+            )
+    session.commit()
+    session.add(EventLog(reading_id=1, message="pH out of range"))
+    session.commit()
+
+
+def _engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def test_archive_moves_rows_into_monthly_segments(tmp_path):
+    archive = ReadingArchive(tmp_path)
+    with Session(_engine()) as session:
+        _setup(session)
+        moved = archive.archive(session, T0 + timedelta(days=3))
+        remaining = session.exec(select(WaterReading)).all()
+
+        assert moved == 6
+        assert len(remaining) == 4
+        assert archive.months() == ["2024-01", "2024-02"]
+        segment = archive.segment("2024-01")
+        assert isinstance(segment.columns["value"], np.memmap)
+        assert segment.parameters == ["pH", "temp"]
+
+        latest = archive.latest(parameter="pH", limit=2)
+        assert [r["value"] for r in latest] == pytest.approx([7.2, 7.1])
+        oldest = list(archive.scan(parameter="pH"))[0]
+        assert oldest["reading_id"] == 1 and oldest["breach"] is True
+
+        stats = aggregate_readings(session, archive, parameter="temp")
+        assert stats["temp"]["count"] == 5
+        assert stats["temp"]["mean"] == pytest.approx(22.0)
+        assert stats["temp"]["min"] == 20.0 and stats["temp"]["max"] == 24.0
+
+
+def test_archive_merges_into_existing_segment(tmp_path):
+    archive = ReadingArchive(tmp_path)
+    with Session(_engine()) as session:
+        _setup(session)
+        archive.archive(session, T0 + timedelta(days=1))
+        archive.archive(session, T0 + timedelta(days=2))
+        assert archive.archive(session, T0) == 0
+    segment = archive.segment("2024-01")
+    assert len(segment) == 4
+    assert np.all(np.diff(segment.columns["timestamp"]) >= 0)
+
+
+def test_list_readings_reads_archive_transparently(tmp_path, monkeypatch):
+    engine = _engine()
+    archive = ReadingArchive(tmp_path)
+    with Session(engine) as session:
+        _setup(session)
+        archive.archive(session, T0 + timedelta(days=3))
+
+    def override():
+        with Session(engine) as session:
+            yield session
+
+    monkeypatch.setattr("app.main.archive", archive)
+    app.dependency_overrides[get_session] = override
+    try:
+        client = TestClient(app)
+        rows = client.get("/readings", params={"parameter": "pH"}).json()
+        assert [r["value"] for r in rows] == pytest.approx([7.4, 7.3, 7.2, 7.1, 7.0])
+        assert rows[-1]["breach"] is True
+        limited = client.get("/readings", params={"limit": 3}).json()
+        assert len(limited) == 3
+        stats = client.get("/readings/aggregate").json()
+        assert stats["pH"]["count"] == 5
+    finally:
+        app.dependency_overrides.clear()
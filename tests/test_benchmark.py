@@ -0,0 +1,62 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.benchmark import _cli, compare, run, synthetic_catalog
+from app.optimization import optimize_feed, optimize_menu
+
+
+def test_synthetic_catalogs_are_feasible():
+    catalog = synthetic_catalog(200, 30, seed=3)
+    assert len(catalog["ingredients"]) == 200
+    assert catalog["caps"] and catalog["inventory"] and catalog["preferences"]
+    density = np.mean([len(i["nutrients"]) / 30 for i in catalog["ingredients"]])
+    assert 0.2 < density < 0.4
+    menu = optimize_menu(
+        catalog["ingredients"],
+        catalog["menu_requirements"],
+        catalog["preferences"],
+        catalog["caps"],
+        catalog["inventory"],
+    )
+    feed = optimize_feed(
+        catalog["ingredients"],
+        catalog["feed_requirements"],
+        catalog["caps"],
+        catalog["inventory"],
+    )
+    assert sum(menu.values()) > 0
+    assert sum(feed.values()) == pytest.approx(1.0)
+
+
+def test_run_records_every_backend_and_compares(tmp_path):
+    results = run(sizes=(10, 50), nutrients=(5,), repeat=1)
+    records = results["results"]
+    backends = {r["backend"] for r in records}
+    assert "greedy" in backends and len(backends) >= 2
+    assert len(records) == 2 * 2 * len(backends)
+    for record in records:
+        assert record["solve_s"] >= 0 and record["build_s"] >= 0
+        if record["backend"] != "greedy":
+            assert record["gap"] == pytest.approx(0.0, abs=1e-7)
+        elif record["gap"] is not None:
+            assert record["gap"] >= -1e-9
+    assert results["meta"]["versions"]["numpy"] == np.__version__
+
+    assert not any(row["regression"] for row in compare(results, results))
+    slower = json.loads(json.dumps(results))
+    for record in slower["results"]:
+        record["solve_s"] *= 100
+    rows = compare(results, slower)
+    assert all(row["regression"] for row in rows if row["solve_ratio"] is not None)
+
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(slower))
+    args = ["--sizes", "10", "--nutrients", "5", "--repeat", "1"]
+    assert _cli(args + ["--compare", str(baseline)]) == 0
+    output = tmp_path / "out.json"
+    _cli(args + ["--backends", "greedy", "--output", str(output)])
+    assert {r["backend"] for r in json.loads(output.read_text())["results"]} == {
+        "greedy"
+    }
@@ -0,0 +1,185 @@
+import numpy as np
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.catalog import Catalog, CatalogCache
+from app.changes import unwatch, watch
+from app.models import FeedIngredient, FeedRequirement, Ingredient, PersonaRequirement
+from app.optimization import (
+    feed_program,
+    household_program,
+    menu_program,
+    optimize_menu,
+)
+from app.utils import run_optimizations
+
+
+def _catalog(n=60, m=8, seed=0):
+    rng = np.random.default_rng(seed)
+    ingredients = [
+        {
+            "name": f"i{j}",
+            "cost": float(rng.uniform(0.5, 5)),
+            "nutrients": {
+                f"n{k}": float(rng.random()) for k in range(m) if rng.random() < 0.5
+            },
+        }
+        for j in range(n)
+    ]
+    caps = {f"i{j}": 0.5 for j in range(0, n, 3)}
+    inventory = {f"i{j}": float(rng.uniform(0.2, 2)) for j in range(0, n, 2)}
+    preferences = {f"i{j}": 0.3 for j in range(0, n, 5)}
+    return ingredients, caps, inventory, preferences
+
+
+def _same_program(a, b):
+    assert a.names == b.names
+    assert a.row_names == b.row_names
+    np.testing.assert_allclose(a.cost, b.cost)
+    np.testing.assert_allclose(a.matrix.toarray(), b.matrix.toarray())
+    np.testing.assert_array_equal(a.upper, b.upper)
+    np.testing.assert_array_equal(a.row_lower, b.row_lower)
+    np.testing.assert_array_equal(a.row_upper, b.row_upper)
+
+
+def test_catalog_programs_match_dict_programs():
+    ingredients, caps, inventory, preferences = _catalog()
+    catalog = Catalog.from_ingredients(
+        "menu", ingredients, caps, inventory, {"p1": preferences}
+    )
+    requirements = {"n0": 1.0, "n3": 2.0, "missing": 0.0}
+    _same_program(
+        menu_program(catalog, requirements, preferences),
+        menu_program(ingredients, requirements, preferences, caps, inventory),
+    )
+    _same_program(
+        feed_program(catalog, requirements),
+        feed_program(ingredients, requirements, caps, inventory),
+    )
+    household = {"p1": {"n0": 1.0}, "p2": {"n1": 1.0, "n2": 0.5}}
+    _same_program(
+        household_program(catalog, household, {"p1": preferences}),
+        household_program(ingredients, household, {"p1": preferences}, caps, inventory),
+    )
+    # Explicit limits override the catalog's own.
+    program = menu_program(catalog, requirements, caps={"i0": 0.1}, inventory={})
+    assert program.upper[0] == pytest.approx(0.1)
+    assert catalog.ingredients() == [
+        {**ing, "nutrients": {k: v for k, v in sorted(ing["nutrients"].items())}}
+        for ing in ingredients
+    ]
+
+
+def _engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(
+            [
+                Ingredient(
+                    name="a",
+                    cost_per_kg=1,
+                    stock_on_hand=5,
+                    nutrients={"protein": 1},
+                    preferences={"p1": 0.5},
+                    cap=4,
+                ),
+                Ingredient(
+                    name="b", cost_per_kg=2, stock_on_hand=5, nutrients={"protein": 2}
+                ),
+                FeedIngredient(
+                    name="soy",
+                    cost_per_kg=0.8,
+                    stock_on_hand=10,
+                    nutrients={"protein": 0.5},
+                ),
+                FeedIngredient(
+                    name="fishmeal",
+                    cost_per_kg=2,
+                    stock_on_hand=10,
+                    nutrients={"protein": 0.65},
+                ),
+                PersonaRequirement(persona="p1", nutrient="protein", amount=3),
+                FeedRequirement(nutrient="protein", amount=0.55),
+            ]
+        )
+        session.commit()
+    return engine
+
+
+def test_cache_patches_prices_and_rebuilds_on_new_ingredients():
+    engine = _engine()
+    cache = CatalogCache()
+    watch(cache)
+    try:
+        with Session(engine) as session:
+            catalog, requirements, preferences, caps, inventory = cache.menu_inputs(
+                session, "p1"
+            )
+            assert catalog.names == ["a", "b"]
+            assert requirements == {"protein": 3}
+            assert preferences == {"a": 0.5}
+            assert caps is None and inventory is None
+            assert cache.get(session, "menu") is catalog
+            assert cache.stats()["builds"] == 1
+
+            b = session.exec(select(Ingredient).where(Ingredient.name == "b")).one()
+            b.cost_per_kg = 0.5
+            b.cap = 1.5
+            session.add(PersonaRequirement(persona="p1", nutrient="fiber", amount=1))
+            session.commit()
+            patched = cache.get(session, "menu")
+            assert patched is not catalog and patched.matrix is catalog.matrix
+            assert patched.cost.tolist() == [1, 0.5] and catalog.cost.tolist() == [1, 2]
+            assert patched.cap.tolist() == [4, 1.5]
+            assert patched.generation > catalog.generation
+            assert cache.stats()["builds"] == 1
+
+            session.add(
+                Ingredient(
+                    name="c", cost_per_kg=1, stock_on_hand=5, nutrients={"fiber": 1}
+                )
+            )
+            session.commit()
+            assert cache.get(session, "menu").names == ["a", "b", "c"]
+            assert cache.stats()["builds"] == 2
+
+            # Inputs agree with the rows in the database.
+            feed, feed_requirements, _, _ = cache.feed_inputs(session)
+            rows = session.exec(select(FeedIngredient)).all()
+            assert feed_requirements == {"protein": 0.55}
+            assert feed.ingredients() == [
+                {"name": f.name, "cost": f.cost_per_kg, "nutrients": f.nutrients}
+                for f in rows
+            ]
+            assert feed.as_dict("inventory") == {f.name: f.stock_on_hand for f in rows}
+            menu = session.exec(select(Ingredient)).all()
+            ingredients = [
+                {"name": i.name, "cost": i.cost_per_kg, "nutrients": i.nutrients}
+                for i in menu
+            ]
+            assert run_optimizations(session, "p1")["menu"] == pytest.approx(
+                optimize_menu(
+                    ingredients,
+                    {"protein": 3, "fiber": 1},
+                    {"a": 0.5},
+                    {i.name: i.cap for i in menu if i.cap is not None},
+                    {i.name: i.stock_on_hand for i in menu},
+                )
+            )
+    finally:
+        unwatch(cache)
+
+
+def test_cache_is_per_database():
+    cache = CatalogCache()
+    first, second = _engine(), _engine()
+    with Session(second) as session:
+        session.add(Ingredient(name="z", nutrients={"protein": 1}))
+        session.commit()
+    with Session(first) as a, Session(second) as b:
+        assert cache.get(a, "menu").names == ["a", "b"]
+        assert cache.get(b, "menu").names == ["a", "b", "z"]
@@ -0,0 +1,292 @@
+import csv
+import time
+
+import pytest
+
+from sqlalchemy import text
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app import changes
+from app.etl import load_fdc_nutrients, load_feedipedia
+from app.etl.bulk import load_csv, migrate_unique_names
+from app.models import (
+    FeedIngredient,
+    HumanFood,
+    Ingredient,
+    Nutrient,
+    SeasonalYield,
+    SourceTag,
+)
+from app.nutrients import find_ingredients, load_profiles
+
+
+def _engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def _write(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["name", "available_on_farm"])
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def test_loading_twice_updates_rows_in_place(tmp_path):
+    engine = _engine()
+    data = _write(
+        tmp_path / "feed.csv",
+        [
+            {"name": "soy", "available_on_farm": "false"},
+            {"name": "kelp", "available_on_farm": "true"},
+        ],
+    )
+    with Session(engine) as session:
+        assert load_feedipedia(session, data) == 2
+        _write(data, [{"name": "soy", "available_on_farm": "TRUE"}])
+        assert load_feedipedia(session, data) == 1
+        feeds = session.exec(select(FeedIngredient).order_by(FeedIngredient.name))
+        assert [(f.name, f.available_on_farm) for f in feeds] == [
+            ("kelp", True),
+            ("soy", True),
+        ]
+        assert len(session.exec(select(SourceTag)).all()) == 1
+
+
+def test_chunks_and_in_file_duplicates(tmp_path):
+    engine = _engine()
+    rows = [
+        {"name": f"food {i % 7}", "available_on_farm": str(i == 9)} for i in range(10)
+    ]
+    data = _write(tmp_path / "foods.csv", rows)
+    with Session(engine) as session:
+        assert load_csv(session, data, HumanFood, "AUSNUT", chunk_size=3) == 10
+        foods = {
+            f.name: f.available_on_farm for f in session.exec(select(HumanFood))
+        }
+    assert len(foods) == 7
+    assert foods["food 2"] is True  # row 9 overrides row 2 in a later chunk
+    assert foods["food 0"] is False
+
+
+def test_missing_file_loads_nothing(tmp_path):
+    with Session(_engine()) as session:
+        assert load_csv(session, tmp_path / "none.csv", HumanFood, "AUSNUT") == 0
+
+
+class _Listener:
+    def __init__(self):
+        self.seen = []
+
+    def apply(self, changes):
+        self.seen.extend(changes)
+
+
+def test_feed_load_notifies_listeners(tmp_path):
+    engine = _engine()
+    listener = _Listener()
+    changes.watch(listener)
+    try:
+        with Session(engine) as session:
+            load_feedipedia(session, _write(tmp_path / "f.csv", [{"name": "soy"}]))
+    finally:
+        changes.unwatch(listener)
+    assert ("feed", None, "rebuild", None) in listener.seen
+
+
+def test_migration_merges_duplicates_and_adds_index():
+    engine = _engine()
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ux_feed_ingredients_source_name"))
+    with Session(engine) as session:
+        tag = SourceTag(name="Feedipedia")
+        session.add(tag)
+        session.flush()
+        feeds = [
+            FeedIngredient(name="soy", source_tag_id=tag.tag_id) for _ in range(3)
+        ]
+        session.add_all(feeds)
+        session.flush()
+        session.add(
+            SeasonalYield(
+                ingredient_id=feeds[2].ingredient_id, season="dry", yield_kg=1
+            )
+        )
+        session.commit()
+        kept = feeds[0].ingredient_id
+
+    assert migrate_unique_names(engine) == 2
+    assert migrate_unique_names(engine) == 0
+    with Session(engine) as session:
+        ids = session.exec(select(FeedIngredient.ingredient_id)).all()
+        assert ids == [kept]
+        assert session.exec(select(SeasonalYield)).one().ingredient_id == kept
+    with engine.connect() as conn:
+        indexes = conn.execute(text("PRAGMA index_list(feed_ingredients)"))
+        names = [row[1] for row in indexes]
+    assert "ux_feed_ingredients_source_name" in names
+
+
+def test_large_file_loads_quickly(tmp_path):
+    engine = _engine()
+    rows = [{"name": f"food {i}", "available_on_farm": "true"} for i in range(50000)]
+    data = _write(tmp_path / "big.csv", rows)
+    with Session(engine) as session:
+        start = time.perf_counter()
+        assert load_csv(session, data, HumanFood, "USDA FDC") == 50000
+        assert time.perf_counter() - start < 5.0
+        assert len(session.exec(select(HumanFood.food_id)).all()) == 50000
+
+
+def _table(path, header, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def _fdc_release(directory, foods=None):
+    directory.mkdir(exist_ok=True)
+    _table(
+        directory / "nutrient.csv",
+        ["id", "name", "unit_name", "nutrient_nbr", "rank"],
+        [
+            [1003, "Protein", "G", "203.0", 600],
+            [1008, "Energy", "KCAL", "208", 300],
+            [1087, "Calcium, Ca", "MG", "301", 5300],
+            [1051, "Water", "G", "255", 100],
+        ],
+    )
+    _table(
+        directory / "food.csv",
+        ["fdc_id", "data_type", "description", "food_category_id"],
+        foods
+        or [
+            [1, "sr_legacy_food", "Tilapia, raw", 15],
+            [2, "foundation_food", "Lettuce, raw", 11],
+            [3, "branded_food", "Fish sticks", 15],
+        ],
+    )
+    amounts = {1: (20.1, 96, 10), 2: (1.4, 15, 36), 3: (11.0, 250, 20)}
+    rows, key = [], 0
+    for fdc_id, (protein, energy, calcium) in amounts.items():
+        for nutrient_id, amount in (
+            (1003, protein), (1008, energy), (1087, calcium), (1051, 80)
+        ):
+            key += 1
+            rows.append([key, fdc_id, nutrient_id, amount, ""])
+    _table(
+        directory / "food_nutrient.csv",
+        ["id", "fdc_id", "nutrient_id", "amount", "data_points"],
+        rows,
+    )
+    return directory
+
+
+def _menu(session):
+    ingredients = session.exec(select(Ingredient).order_by(Ingredient.name)).all()
+    return {i.name: i.nutrients for i in ingredients}
+
+
+def test_fdc_nutrients_are_joined_and_converted(tmp_path):
+    engine = _engine()
+    directory = _fdc_release(tmp_path / "fdc")
+    with Session(engine) as session:
+        stats = load_fdc_nutrients(session, directory)
+        assert stats == {"rows": 12, "resumed_from": 0, "foods": 2, "amounts": 6}
+        menu = _menu(session)
+        assert set(menu) == {"Lettuce, raw", "Tilapia, raw"}
+        assert menu["Tilapia, raw"]["protein"] == pytest.approx(0.201)
+        assert menu["Tilapia, raw"]["energy"] == pytest.approx(960)
+        assert menu["Lettuce, raw"]["calcium"] == pytest.approx(3.6e-4)
+        assert "water" not in menu["Tilapia, raw"]
+        ingredients = session.exec(select(Ingredient)).all()
+        stored = {i.ingredient_id: i.nutrients for i in ingredients}
+        assert load_profiles(session, "menu") == stored
+        units = dict(session.exec(select(Nutrient.name, Nutrient.unit)).all())
+        assert units == {"protein": "kg/kg", "energy": "kcal/kg", "calcium": "kg/kg"}
+        found = find_ingredients(session, "menu", minimums={"protein": 0.1})
+        assert [row["name"] for row in found] == ["Tilapia, raw"]
+
+
+def test_fdc_nutrients_resume_after_interruption(tmp_path):
+    engine = _engine()
+    directory = _fdc_release(tmp_path / "fdc")
+    reports = []
+
+    def interrupt(stats):
+        reports.append(stats)
+        raise KeyboardInterrupt
+
+    with Session(engine) as session:
+        with pytest.raises(KeyboardInterrupt):
+            load_fdc_nutrients(
+                session, directory, progress=interrupt, rows_per_commit=5
+            )
+    assert reports[0]["rows"] == 5
+    assert 0 < reports[0]["bytes"] <= reports[0]["total_bytes"]
+
+    with Session(engine) as session:
+        stats = load_fdc_nutrients(session, directory, rows_per_commit=5)
+        assert stats["resumed_from"] == 5 and stats["rows"] == 12
+        resumed = _menu(session)
+
+    fresh = _engine()
+    with Session(fresh) as session:
+        load_fdc_nutrients(session, directory)
+        assert resumed == _menu(session)
+
+
+def test_fdc_nutrients_reload_is_idempotent(tmp_path):
+    engine = _engine()
+    directory = _fdc_release(tmp_path / "fdc")
+    with Session(engine) as session:
+        load_fdc_nutrients(session, directory)
+        again = load_fdc_nutrients(session, directory)
+        assert again == {"rows": 12, "resumed_from": 12, "foods": 0, "amounts": 0}
+
+        _fdc_release(
+            directory,
+            [
+                [1, "sr_legacy_food", "Tilapia fillet", 15],
+                [2, "foundation_food", "Lettuce, raw", 11],
+            ],
+        )
+        stats = load_fdc_nutrients(session, directory, restart=True)
+        assert stats["resumed_from"] == 0 and stats["amounts"] == 6
+        assert set(_menu(session)) == {"Lettuce, raw", "Tilapia fillet"}
+        assert len(load_profiles(session, "menu")) == 2
+
+
+def test_fdc_nutrients_skip_missing_release(tmp_path):
+    with Session(_engine()) as session:
+        assert load_fdc_nutrients(session, tmp_path)["rows"] == 0
+
+
+def test_fdc_names_stay_unique(tmp_path):
+    engine = _engine()
+    foods = [
+        [1, "sr_legacy_food", "Tilapia, raw", 15],
+        [2, "foundation_food", "Lettuce, raw", 11],
+        [3, "foundation_food", "Lettuce, raw", 11],
+    ]
+    directory = _fdc_release(tmp_path / "fdc", foods)
+    with Session(engine) as session:
+        session.add(Ingredient(name="Tilapia, raw", cost_per_kg=4.0))
+        session.commit()
+        load_fdc_nutrients(session, directory)
+        names = {i.name: i.source for i in session.exec(select(Ingredient))}
+        assert names == {
+            "Tilapia, raw": None,
+            "Tilapia, raw (fdc 1)": "fdc:1",
+            "Lettuce, raw": "fdc:2",
+            "Lettuce, raw (fdc 3)": "fdc:3",
+        }
+
+        load_fdc_nutrients(session, directory, restart=True)
+        assert {i.name for i in session.exec(select(Ingredient))} == set(names)
@@ -0,0 +1,86 @@
+import csv
+from datetime import datetime, timedelta
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.archive import ReadingArchive
+from app.export import iter_chunks, stream_export
+from app.models import FeedLog, WaterReading
+
+T0 = datetime(2024, 1, 1)
+
+
+def _engine(rows=25):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        for i in range(rows):
+            session.add(
+                WaterReading(
+                    parameter="pH", value=7 + i / 100, timestamp=T0 + timedelta(hours=i)
+                )
+            )
+            session.add(FeedLog(batch_id=1, amount_g=10 * i, timestamp=T0 + timedelta(hours=i)))
+        session.commit()
+    return engine
+
+
+def test_chunks_are_bounded():
+    engine = _engine()
+    sizes = [len(c) for c in iter_chunks(engine, "readings", chunk_size=10)]
+    assert sizes == [10, 10, 5]
+
+
+def test_csv_and_ndjson_exports_include_archive(tmp_path):
+    engine = _engine()
+    archive = ReadingArchive(tmp_path)
+    with Session(engine) as session:
+        archive.archive(session, T0 + timedelta(hours=5))
+
+    text = b"".join(
+        stream_export(engine, "readings", "csv", chunk_size=7, archive=archive)
+    ).decode()
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert len(rows) == 25
+    assert [float(r["value"]) for r in rows] == pytest.approx(
+        [7 + i / 100 for i in range(25)]
+    )
+
+    lines = b"".join(
+        stream_export(
+            engine, "feed_logs", "ndjson", start=T0 + timedelta(hours=20), chunk_size=2
+        )
+    ).splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [r["amount_g"] for r in records] == [200, 210, 220, 230, 240]
+    assert records[0]["timestamp"] == (T0 + timedelta(hours=20)).isoformat()
+
+
+def test_parquet_export():
+    pq = pytest.importorskip("pyarrow.parquet")
+    engine = _engine()
+    data = b"".join(stream_export(engine, "readings", "parquet", chunk_size=10))
+    parquet = pq.ParquetFile(io.BytesIO(data))
+    assert parquet.metadata.num_rows == 25
+    assert parquet.metadata.num_row_groups == 3
+
+
+def test_export_endpoint(monkeypatch, tmp_path):
+    from app.main import app
+
+    monkeypatch.setattr("app.main.engine", _engine(3))
+    monkeypatch.setattr("app.main.archive", ReadingArchive(tmp_path))
+    client = TestClient(app)
+    resp = client.get("/export/readings", params={"format": "ndjson"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    assert len(resp.text.splitlines()) == 3
+    assert client.get("/export/nope").status_code == 404
+    assert client.get("/export/readings", params={"format": "xml"}).status_code == 422
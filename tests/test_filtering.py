@@ -0,0 +1,158 @@
+from datetime import datetime, timedelta
+import threading
+
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.database import get_session
+from app.filtering import FilterCache, cache
+from app.main import app
+from app.models import WaterReading
+
+T0 = datetime(2024, 1, 1)
+
+
+def _setup_engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def _add(session, seconds, value, parameter="pH"):
+    session.add(
+        WaterReading(
+            parameter=parameter, value=value, timestamp=T0 + timedelta(seconds=seconds)
+        )
+    )
+    session.commit()
+
+
+def test_cache_extends_incrementally():
+    engine = _setup_engine()
+    cache = FilterCache()
+    with Session(engine) as session:
+        for t, v in enumerate([7.0, 7.0, 7.0, 9.5, 7.0]):
+            _add(session, t * 60, v)
+        first = cache.filtered(session, "pH", window=300)
+        assert [r["filtered"] for r in first] == [7.0] * 5
+        entry = next(iter(cache._entries.values()))
+
+        _add(session, 360, 7.1)
+        second = cache.filtered(session, "pH", window=300)
+        assert next(iter(cache._entries.values())) is entry
+        assert len(second) == 6
+        assert second[:5] == first
+
+        ranged = cache.filtered(
+            session, "pH", window=300, start=T0 + timedelta(seconds=120)
+        )
+        assert [r["value"] for r in ranged] == [7.0, 9.5, 7.0, 7.1]
+
+
+def test_cache_rebuilds_on_out_of_order_reading():
+    engine = _setup_engine()
+    cache = FilterCache()
+    with Session(engine) as session:
+        _add(session, 0, 7.0)
+        _add(session, 120, 7.2)
+        cache.filtered(session, "pH", method="ewma", window=60)
+        _add(session, 60, 7.4)
+        rows = cache.filtered(session, "pH", method="ewma", window=60)
+    assert [r["value"] for r in rows] == [7.0, 7.4, 7.2]
+
+
+def test_filtered_endpoint():
+    engine = _setup_engine()
+    with Session(engine) as session:
+        for t, v in enumerate([7.0, 7.0, 7.0, 9.5, 7.0]):
+            _add(session, t * 60, v)
+
+    def override():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override
+    cache.clear()
+    try:
+        client = TestClient(app)
+        resp = client.get(
+            "/readings/filtered", params={"parameter": "pH", "window": 600}
+        )
+        assert resp.status_code == 200
+        assert [r["filtered"] for r in resp.json()] == [7.0] * 5
+        bad = client.get("/readings/filtered", params={"parameter": "pH", "method": "x"})
+        assert bad.status_code == 422
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_cache_keeps_only_recent_history():
+    engine = _setup_engine()
+    cache = FilterCache(history=600)
+    with Session(engine) as session:
+        for t in range(20):
+            _add(session, t * 60, 7.0 + t / 100)
+        recent = cache.filtered(session, "pH", start=T0 + timedelta(seconds=540))
+        entry = next(iter(cache._entries.values()))
+        assert len(entry.rows) == 11 and recent == entry.rows
+
+        # Older ranges are replayed from the database, not served truncated.
+        assert cache.filtered(session, "pH") == entry.rows
+        full = cache.filtered(session, "pH", start=T0)
+        assert [r["value"] for r in full] == [7.0 + t / 100 for t in range(20)]
+        assert full[-11:] == entry.rows and len(entry.rows) == 11
+
+
+def test_default_requests_reuse_trimmed_entries(monkeypatch):
+    engine = _setup_engine()
+    cache = FilterCache(history=3600)
+    calls = []
+    extend = cache._extend
+
+    def counted(session, key, entry):
+        calls.append(entry)
+        return extend(session, key, entry)
+
+    monkeypatch.setattr(cache, "_extend", counted)
+    with Session(engine) as session:
+        session.add_all(
+            WaterReading(
+                parameter="pH", value=7.0, timestamp=T0 + timedelta(minutes=t)
+            )
+            for t in range(3000)
+        )
+        session.commit()
+        first = cache.filtered(session, "pH")
+        second = cache.filtered(session, "pH")
+    assert len(first) == 61 and second == first
+    entry = next(iter(cache._entries.values()))
+    assert calls == [entry, entry]
+
+
+def test_slow_query_does_not_block_other_streams():
+    engine = _setup_engine()
+    cache = FilterCache()
+    with Session(engine) as session:
+        _add(session, 0, 7.0)
+        _add(session, 0, 20.0, parameter="temperature")
+    entered, release = threading.Event(), threading.Event()
+
+    class SlowSession(Session):
+        def exec(self, *args, **kwargs):
+            entered.set()
+            release.wait(5)
+            return super().exec(*args, **kwargs)
+
+    with SlowSession(engine) as slow, Session(engine) as fast:
+        worker = threading.Thread(target=cache.filtered, args=(slow, "pH"))
+        worker.start()
+        try:
+            assert entered.wait(5)
+            rows = cache.filtered(fast, "temperature")
+            assert [r["value"] for r in rows] == [20.0]
+        finally:
+            release.set()
+            worker.join(5)
@@ -1,5 +1,7 @@
+import math
+
 import pytest
-from aquaponics.filters import hampel_filter, ewma
+from aquaponics.filters import ewma, ewma_time, hampel_filter, hampel_filter_time
 
 def test_hampel_filter_removes_outlier():
     data = [1, 1, 1, 20, 1, 1, 1]
@@ -25,3 +27,27 @@ def test_ewma_basic():
 def test_ewma_invalid_alpha():
     with pytest.raises(ValueError, match="alpha must satisfy 0 < alpha <= 1"):
         ewma([1, 2, 3], alpha=1.5)
+
+
+def test_hampel_filter_time_ignores_dropouts():
+    # The gap between 4 and 100 empties the window instead of stretching it.
+    timestamps = [0, 1, 2, 3, 4, 100, 101, 102, 103]
+    data = [1, 1, 1, 9, 1, 5, 5.1, 4.9, 5]
+    filtered = hampel_filter_time(timestamps, data, window=3)
+    assert filtered[3] == 1
+    assert filtered[5:] == [5, 5.1, 4.9, 5]
+
+
+def test_ewma_time_weights_by_elapsed_time():
+    result = ewma_time([0, 1, 101], [0, 1, 1], tau=1)
+    assert result[1] == pytest.approx(1 - math.exp(-1))
+    assert result[2] == pytest.approx(1.0)
+
+
+def test_time_filters_reject_invalid_input():
+    with pytest.raises(ValueError, match="window must be positive"):
+        hampel_filter_time([0], [1], window=0)
+    with pytest.raises(ValueError, match="tau must be positive"):
+        ewma_time([0], [1], tau=0)
+    with pytest.raises(ValueError, match="non-decreasing"):
+        ewma_time([1, 0], [1, 1], tau=1)
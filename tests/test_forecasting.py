@@ -0,0 +1,79 @@
+import math
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+from aquaponics.forecasting import HoltWinters, fit_holt_winters
+from app.forecasting import ForecastRegistry
+from app.models import WaterReading, WaterTarget
+
+
+def test_linear_trend_forecast():
+    series = [7.0 + 0.01 * t for t in range(200)]
+    (model,) = fit_holt_winters([series], alpha=0.5, beta=0.3)
+    forecast = model.forecast(5)
+    expected = [7.0 + 0.01 * t for t in range(200, 205)]
+    assert forecast == pytest.approx(expected, abs=1e-3)
+
+
+def test_seasonal_forecast():
+    pattern = [0.0, 1.0, 2.0, 1.0]
+    series = [25 + pattern[t % 4] for t in range(80)]
+    (model,) = fit_holt_winters([series], season_length=4)
+    assert model.forecast(4) == pytest.approx(
+        [25 + p for p in pattern], abs=1e-2
+    )
+
+
+def test_incremental_update_matches_batch_fit():
+    series = [math.sin(t / 3) + 0.05 * t for t in range(60)]
+    (partial,) = fit_holt_winters([series[:-1]], season_length=6)
+    (full,) = fit_holt_winters([series], season_length=6)
+    partial.update(series[-1])
+    assert partial.level == pytest.approx(full.level)
+    assert partial.trend == pytest.approx(full.trend)
+    assert partial.season == pytest.approx(full.season)
+    assert partial.forecast(3) == pytest.approx(full.forecast(3))
+
+
+def test_batch_fit_handles_uneven_streams():
+    a = [float(t) for t in range(50)]
+    b = [5.0, 5.1, 4.9, 5.0]
+    together = fit_holt_winters([a, b])
+    alone = fit_holt_winters([a]) + fit_holt_winters([b])
+    for x, y in zip(together, alone):
+        assert x.n == y.n
+        assert x.forecast(2) == pytest.approx(y.forecast(2))
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError, match="alpha must satisfy"):
+        HoltWinters(level=1.0, alpha=0)
+    with pytest.raises(ValueError, match="at least one value"):
+        fit_holt_winters([[]])
+    with pytest.raises(ValueError, match="horizon must be positive"):
+        HoltWinters(level=1.0).forecast(0)
+
+
+def test_registry_fit_update_and_predicted_alerts():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    registry = ForecastRegistry(alpha=0.5, beta=0.5)
+    with Session(engine) as session:
+        for t in range(30):
+            session.add(WaterReading(parameter="pH", value=7.0 - 0.02 * t))
+            session.add(WaterReading(parameter="temp", value=24.0, location="t1"))
+        session.add(WaterTarget(parameter="pH", min_value=6.5, max_value=7.5))
+        session.commit()
+
+        assert registry.fit_from_history(session) == 2
+        assert registry.forecast("unknown") is None
+        registry.update("pH", 6.4)
+        result = registry.forecast("pH", horizon=3)
+        assert result["forecast"][0] < 6.5
+
+        alerts = registry.predicted_alerts(session, horizon=5)
+
+    assert [a["parameter"] for a in alerts] == ["pH"]
+    assert alerts[0]["severity"] == "critical"
+    assert 1 <= alerts[0]["steps_ahead"] <= 5
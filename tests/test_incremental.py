@@ -0,0 +1,214 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.database import get_session
+from app.incremental import IncrementalSolver, OptimizerSessions, optimizers
+from app.main import app
+from app.models import FeedIngredient, FeedRequirement, Ingredient, PersonaRequirement
+from app.optimization import feed_program, menu_program, optimize_feed, optimize_menu
+from app.utils import run_optimizations
+
+
+def _catalog(n=300, m=12, seed=1):
+    rng = np.random.default_rng(seed)
+    ingredients = [
+        {
+            "name": f"i{j}",
+            "cost": float(rng.uniform(0.5, 5)),
+            "nutrients": {
+                f"n{k}": float(rng.random()) for k in range(m) if rng.random() < 0.4
+            },
+        }
+        for j in range(n)
+    ]
+    inventory = {ing["name"]: float(rng.uniform(0.5, 3)) for ing in ingredients}
+    return ingredients, {f"n{k}": 1.0 for k in range(m)}, inventory
+
+
+@pytest.mark.parametrize("backend", ["glop", "highs"])
+def test_incremental_updates_match_cold_solves(backend):
+    ingredients, requirements, inventory = _catalog()
+    caps: dict = {}
+    solver = IncrementalSolver(
+        menu_program(ingredients, requirements, inventory=inventory),
+        backend,
+        inventory=inventory,
+    )
+    solver.solve()
+    rng = np.random.default_rng(7)
+    for _ in range(40):
+        ing = ingredients[int(rng.integers(len(ingredients)))]
+        name = ing["name"]
+        if rng.random() < 0.5:
+            ing["cost"] = float(rng.uniform(0.5, 5))
+            solver.set_cost(name, ing["cost"])
+        elif rng.random() < 0.5:
+            inventory[name] = float(rng.uniform(0, 3))
+            solver.set_limits(name, stock=inventory[name])
+        else:
+            caps[name] = float(rng.uniform(0, 2))
+            solver.set_limits(name, cap=caps[name])
+        plan = solver.plan()
+        cold = optimize_menu(ingredients, requirements, caps=caps, inventory=inventory)
+        cost = {i["name"]: i["cost"] for i in ingredients}
+        assert sum(cost[n] * v for n, v in plan.items()) == pytest.approx(
+            sum(cost[n] * v for n, v in cold.items()), rel=1e-6
+        )
+        assert solver.lp.violation(solver.solution.x) < 1e-6
+    assert solver.stats["reused"] > 0
+    assert solver.stats["cold"] == 1
+
+
+def test_unused_ingredient_changes_skip_the_solver():
+    ingredients = [
+        {"name": "cheap", "cost": 1.0, "nutrients": {"protein": 1}},
+        {"name": "dear", "cost": 9.0, "nutrients": {"protein": 1}},
+    ]
+    solver = IncrementalSolver(menu_program(ingredients, {"protein": 2}))
+    assert solver.plan() == {"cheap": pytest.approx(2), "dear": 0}
+    solver.set_cost("dear", 12.0)
+    solver.set_limits("dear", stock=1.0)
+    solver.set_limits("cheap", stock=5.0)
+    assert solver.plan()["cheap"] == pytest.approx(2)
+    assert solver.stats == {"cold": 1, "warm": 0, "reused": 1}
+
+    solver.set_limits("cheap", stock=1.5)
+    plan = solver.plan()
+    assert plan == {"cheap": pytest.approx(1.5), "dear": pytest.approx(0.5)}
+    assert solver.stats["warm"] == 1
+
+
+def test_feed_session_keeps_fractions_bounded():
+    ingredients = [
+        {"name": "duckweed", "cost": 1.0, "nutrients": {"protein": 0.4}},
+        {"name": "soy", "cost": 0.8, "nutrients": {"protein": 0.5}},
+    ]
+    program = feed_program(ingredients, {"protein": 0.45})
+    solver = IncrementalSolver(program, default_upper=1.0)
+    assert solver.plan()["soy"] == pytest.approx(1.0)
+    solver.set_limits("soy", stock=0.6)
+    plan = solver.plan()
+    cold = optimize_feed(ingredients, {"protein": 0.45}, inventory={"soy": 0.6})
+    assert plan == {name: pytest.approx(v) for name, v in cold.items()}
+    solver.set_limits("soy", stock=None)
+    assert solver.plan()["soy"] == pytest.approx(1.0)
+
+
+def _engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    protein = {"protein": 1}
+    with Session(engine) as session:
+        session.add_all(
+            [
+                Ingredient(
+                    name="a", cost_per_kg=1, stock_on_hand=5, nutrients=protein, cap=4
+                ),
+                Ingredient(
+                    name="b", cost_per_kg=2, stock_on_hand=9, nutrients=protein
+                ),
+                PersonaRequirement(persona="p1", nutrient="protein", amount=6),
+                FeedIngredient(
+                    name="f1",
+                    cost_per_kg=1,
+                    stock_on_hand=1,
+                    nutrients=protein,
+                    cap=0.5,
+                ),
+                FeedIngredient(
+                    name="f2", cost_per_kg=2, stock_on_hand=1, nutrients=protein
+                ),
+                FeedRequirement(nutrient="protein", amount=1),
+            ]
+        )
+        session.commit()
+    return engine
+
+
+def test_sessions_follow_committed_changes():
+    engine = _engine()
+    sessions = OptimizerSessions()
+    sessions.watch()
+    try:
+        with Session(engine) as session:
+            assert sessions.solve(session, "p1") == run_optimizations(session, "p1")
+            a = session.exec(select(Ingredient).where(Ingredient.name == "a")).one()
+            a.stock_on_hand = 3
+            session.commit()
+            assert sessions.solve(session, "p1") == run_optimizations(session, "p1")
+            assert sessions.solve(session, "p1")["menu"]["a"] == pytest.approx(3)
+
+            b = session.exec(select(Ingredient).where(Ingredient.name == "b")).one()
+            b.cost_per_kg = 0.5
+            session.flush()
+            session.rollback()
+            assert sessions.solve(session, "p1")["menu"]["a"] == pytest.approx(3)
+
+            session.add(
+                Ingredient(
+                    name="c",
+                    cost_per_kg=0.1,
+                    stock_on_hand=10,
+                    nutrients={"protein": 1},
+                )
+            )
+            session.commit()
+            assert sessions.solve(session, "p1")["menu"]["c"] == pytest.approx(6)
+        stats = sessions.stats()
+        assert stats["menu:p1"]["cold"] == 1
+        assert stats["feed"]["reused"] >= 2
+    finally:
+        sessions.unwatch()
+
+
+def test_restocking_a_pruned_ingredient_rebuilds_the_session():
+    engine = _engine()
+    sessions = OptimizerSessions()
+    sessions.watch()
+    try:
+        with Session(engine) as session:
+            session.add(
+                Ingredient(name="d", cost_per_kg=0.1, nutrients={"protein": 1})
+            )
+            session.commit()
+            assert "d" not in sessions.solve(session, "p1")["menu"]
+            d = session.exec(select(Ingredient).where(Ingredient.name == "d")).one()
+            d.stock_on_hand = 10
+            session.commit()
+            assert sessions.solve(session, "p1")["menu"]["d"] == pytest.approx(6)
+        assert sessions.stats()["menu:p1"]["cold"] == 1
+    finally:
+        sessions.unwatch()
+
+
+def test_aggregate_endpoint_reuses_sessions():
+    engine = _engine()
+
+    def override():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override
+    optimizers.clear()
+    try:
+        client = TestClient(app)
+        first = client.get("/optimize/aggregate", params={"persona": "p1"}).json()
+        with Session(engine) as session:
+            a = session.exec(select(Ingredient).where(Ingredient.name == "a")).one()
+            ingredient_id = a.ingredient_id
+        resp = client.post(
+            "/inventory", json={"ingredient_id": ingredient_id, "stock_on_hand": 2}
+        )
+        assert resp.status_code == 200
+        second = client.get("/optimize/aggregate", params={"persona": "p1"}).json()
+        assert first["menu"]["a"] == pytest.approx(4)
+        assert second["menu"] == {"a": pytest.approx(2), "b": pytest.approx(4)}
+        assert optimizers.stats()["menu:p1"]["cold"] == 1
+    finally:
+        app.dependency_overrides.clear()
+        optimizers.clear()
@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.changes import watch
+from app.inventory import ingest_inventory, iter_json_array
+from app.models import Ingredient, InventorySnapshot
+
+
+def _engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+async def _chunks(text, size):
+    for start in range(0, len(text), size):
+        yield text[start : start + size]
+
+
+async def _collect(chunks):
+    return [item async for item in iter_json_array(chunks)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_json_array_is_decoded_incrementally(size):
+    items = [{"ingredient_id": 1, "stock_on_hand": 2.5}, 12345, "a,]", [1, {}], None]
+    text = " [ " + " , ".join(json.dumps(i) for i in items) + " ] "
+    assert asyncio.run(_collect(_chunks(text, size))) == items
+    assert asyncio.run(_collect(_chunks("[]", size))) == []
+    with pytest.raises(ValueError):
+        asyncio.run(_collect(_chunks('[{"a": 1}, 12', size)))
+    with pytest.raises(ValueError):
+        asyncio.run(_collect(_chunks('{"a": 1}', size)))
+
+
+class _Listener:
+    def __init__(self):
+        self.changes = []
+
+    def apply(self, changes):
+        self.changes.extend(changes)
+
+
+def test_bulk_ingest_skips_unchanged_rows():
+    engine = _engine()
+    with Session(engine) as session:
+        session.add_all(
+            Ingredient(ingredient_id=i, name=f"i{i}", stock_on_hand=float(i))
+            for i in range(1, 12001)
+        )
+        session.commit()
+
+    # Every third stock changes, and ten ids are unknown.
+    feed = [
+        {"ingredient_id": i, "stock_on_hand": float(i) + (i % 3 == 0)}
+        for i in range(1, 12011)
+    ]
+
+    async def stream():
+        body = json.dumps(feed)
+        for start in range(0, len(body), 65536):
+            yield body[start : start + 65536].encode()
+
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(200, content=stream())
+    )
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, sql, params, context, many: statements.append(sql),
+    )
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            with Session(engine) as session:
+                return await ingest_inventory("http://stock", session, client)
+
+    listener = _Listener()
+    watch(listener)
+    counts = asyncio.run(run())
+    assert counts == {
+        "received": 12010,
+        "updated": 4000,
+        "unchanged": 8000,
+        "unknown": 10,
+    }
+    # Three chunks: a lookup, an UPDATE and a snapshot INSERT each at most.
+    assert len(statements) <= 9
+    with Session(engine) as session:
+        assert session.get(Ingredient, 3).stock_on_hand == 4.0
+        assert session.get(Ingredient, 4).stock_on_hand == 4.0
+        snapshots = session.exec(select(InventorySnapshot)).all()
+        assert len(snapshots) == 4000
+        assert all(s.ingredient_id % 3 == 0 for s in snapshots)
+        assert snapshots[0].timestamp is not None
+    # Caches hear about the Core updates once the ingest commits.
+    assert len(listener.changes) == 4000
+    assert ("menu", "i3", "stock", 4.0) in listener.changes
+
+    statements.clear()
+    assert asyncio.run(run())["updated"] == 0
+    assert len(statements) == 3
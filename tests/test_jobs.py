@@ -0,0 +1,168 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+import app.main as main
+from app.database import get_session
+from app.jobs import JobQueue
+from app.models import FeedIngredient, FeedRequirement, Ingredient, PersonaRequirement
+from app.optimization import optimize_feed
+
+FEED = [
+    {"name": "soy", "cost": 0.8, "nutrients": {"protein": 0.5}},
+    {"name": "fishmeal", "cost": 2.0, "nutrients": {"protein": 0.65}},
+]
+
+
+def _threads(max_workers):
+    return ThreadPoolExecutor(max_workers=max_workers)
+
+
+def test_duplicates_share_one_job():
+    queue = JobQueue(max_workers=1, executor_factory=_threads)
+    release = threading.Event()
+    calls = []
+
+    def solve(value):
+        calls.append(value)
+        release.wait(5)
+        return {"value": value}
+
+    try:
+        first, created = queue.submit("feed", "a", solve, 1)
+        again, duplicate = queue.submit("feed", "a", solve, 1)
+        other, _ = queue.submit("feed", "b", solve, 2)
+        assert created and not duplicate and again is first
+        assert first.coalesced == 1 and other is not first
+        assert other.status == "queued"
+        release.set()
+        assert queue.wait(other.job_id, 5).status == "done"
+        assert queue.wait(first.job_id, 5).report()["result"] == {"value": 1}
+        assert calls == [1, 2]
+        report = other.report()
+        # The second job waited for the first to finish.
+        assert report["queue_wait"] >= first.report()["run_time"] - 1e-3
+        assert report["run_time"] >= 0
+        # Finished problems are solved again when resubmitted.
+        assert queue.submit("feed", "a", solve, 1)[1]
+        stats = queue.stats()
+        assert stats["submitted"] == 3 and stats["coalesced"] == 1
+    finally:
+        queue.shutdown(wait=True)
+
+
+def test_failures_are_reported_and_old_jobs_pruned():
+    queue = JobQueue(max_workers=1, max_finished=2, executor_factory=_threads)
+
+    def infeasible():
+        raise ValueError("No feasible solution found")
+
+    try:
+        failed, _ = queue.submit("menu", "x", infeasible)
+        assert queue.wait(failed.job_id, 5).status == "failed"
+        assert failed.report()["error"] == "No feasible solution found"
+        ids = [queue.submit("menu", str(i), lambda: 1)[0].job_id for i in range(3)]
+        for job_id in ids:
+            queue.wait(job_id, 5)
+        queue._prune()
+        assert queue.get(failed.job_id) is None and queue.get(ids[-1]) is not None
+        assert queue.stats()["failed"] == 1
+    finally:
+        queue.shutdown(wait=True)
+
+
+def test_map_runs_on_the_shared_pool():
+    queue = JobQueue(max_workers=2, executor_factory=_threads)
+    try:
+        assert queue.map(lambda x: x * x, range(5)) == [0, 1, 4, 9, 16]
+        pool = queue._executor
+        assert queue.map(str, [1]) == ["1"] and queue._executor is pool
+        assert queue.stats()["submitted"] == 0
+    finally:
+        queue.shutdown(wait=True)
+
+
+def test_process_pool_solves():
+    queue = JobQueue(max_workers=1)
+    try:
+        job, _ = queue.submit("feed", "k", optimize_feed, FEED, {"protein": 0.55})
+        assert queue.wait(job.job_id, 60).status == "done"
+        assert sum(job.result.values()) == pytest.approx(1.0)
+        assert job.report()["queue_wait"] >= 0
+    finally:
+        queue.shutdown(wait=True)
+
+
+def test_job_endpoints(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(
+            [
+                Ingredient(
+                    name="beans",
+                    cost_per_kg=1,
+                    stock_on_hand=5,
+                    nutrients={"protein": 1},
+                ),
+                FeedIngredient(
+                    name="soy",
+                    cost_per_kg=1,
+                    stock_on_hand=5,
+                    nutrients={"protein": 1},
+                ),
+                PersonaRequirement(persona="p1", nutrient="protein", amount=2),
+                FeedRequirement(nutrient="protein", amount=0.5),
+            ]
+        )
+        session.commit()
+
+    def override():
+        with Session(engine) as session:
+            yield session
+
+    queue = JobQueue(max_workers=1, executor_factory=_threads)
+    monkeypatch.setattr(main, "jobs", queue)
+    main.app.dependency_overrides[get_session] = override
+    try:
+        client = TestClient(main.app)
+        payload = {
+            "kind": "feed",
+            "ingredients": FEED,
+            "requirements": {"protein": 0.55},
+        }
+        submitted = client.post("/optimize/jobs", json=payload)
+        assert submitted.status_code == 202
+        job_id = submitted.json()["job_id"]
+        body = client.get(f"/optimize/jobs/{job_id}", params={"wait": 5}).json()
+        assert body["status"] == "done"
+        assert sum(body["result"].values()) == pytest.approx(1.0)
+
+        aggregate = client.post(
+            "/optimize/jobs", json={"kind": "aggregate", "persona": "p1"}
+        ).json()
+        events = client.get(f"/optimize/jobs/{aggregate['job_id']}/events").text
+        reports = [
+            json.loads(line[len("data: ") :])
+            for line in events.splitlines()
+            if line.startswith("data: ")
+        ]
+        assert reports[-1]["status"] == "done"
+        assert reports[-1]["result"]["menu"] == pytest.approx({"beans": 2.0})
+
+        assert client.post("/optimize/jobs", json={"kind": "x"}).status_code == 422
+        assert (
+            client.post("/optimize/jobs", json={"kind": "plan"}).status_code == 422
+        )
+        assert client.get("/optimize/jobs/missing").status_code == 404
+        assert client.get("/optimize/jobs").json()["done"] == 2
+    finally:
+        main.app.dependency_overrides.clear()
+        queue.shutdown(wait=True)
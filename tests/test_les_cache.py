@@ -0,0 +1,115 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app import main
+from app.database import get_session
+from app.les_cache import LESCache, plan_fingerprint
+
+
+class _FakeLES:
+    base_url = "http://les"
+
+    def __init__(self, version="1.2", delay=0.0):
+        self.version = version
+        self.delay = delay
+        self.calls = 0
+
+    def run_simulation(self, plan):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {"oxygen_demand": sum(plan.values()), "nutrient_cycling": 0.8}
+
+
+def test_fingerprint_ignores_order_noise_and_zeros():
+    plan = {"soy": 0.4, "kelp": 0.6}
+    assert plan_fingerprint(plan, "1") == plan_fingerprint(
+        {"kelp": 0.6000000001, "soy": 0.4, "fishmeal": 0.0}, "1"
+    )
+    assert plan_fingerprint(plan, "1") != plan_fingerprint(plan, "2")
+    moved = {"soy": 0.41, "kelp": 0.59}
+    assert plan_fingerprint(plan, "1") != plan_fingerprint(moved, "1")
+
+
+def test_lru_ttl_and_persistence(tmp_path):
+    now = [1000.0]
+    path = str(tmp_path / "les.sqlite")
+    cache = LESCache(path, max_entries=2, ttl=60, clock=lambda: now[0])
+    client = _FakeLES()
+    assert cache.simulate(client, {"a": 1.0}) == (
+        {"oxygen_demand": 1.0, "nutrient_cycling": 0.8},
+        False,
+    )
+    assert cache.simulate(client, {"a": 1.0})[1] is True
+    now[0] += 1
+    cache.simulate(client, {"b": 2.0})
+    now[0] += 1
+    cache.simulate(client, {"a": 1.0})  # "a" is now more recent than "b"
+    now[0] += 1
+    cache.simulate(client, {"c": 3.0})
+    assert cache.stats()["evicted"] == 1 and client.calls == 3
+    assert cache.simulate(client, {"a": 1.0})[1] is True
+    assert cache.simulate(client, {"b": 2.0})[1] is False
+    cache.close()
+
+    # Entries survive a restart but not the TTL.
+    reopened = LESCache(path, max_entries=2, ttl=60, clock=lambda: now[0])
+    assert reopened.simulate(client, {"b": 2.0})[1] is True
+    now[0] += 61
+    assert reopened.simulate(client, {"b": 2.0})[1] is False
+    assert reopened.stats()["expired"] == 1
+
+
+def test_concurrent_identical_requests_are_coalesced(tmp_path):
+    cache = LESCache(str(tmp_path / "les.sqlite"))
+    client = _FakeLES(delay=0.2)
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(cache.simulate(client, {"soy": 1.0}))
+        )
+        for _ in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.calls == 1
+    assert sorted(cached for _, cached in results) == [False] + [True] * 5
+    assert cache.stats()["coalesced"] == 5
+
+
+def test_simulate_endpoint_reports_cache_hits(tmp_path, monkeypatch):
+    client = _FakeLES()
+    monkeypatch.setattr(main, "get_client", lambda: client)
+    monkeypatch.setattr(main, "les_cache", LESCache(str(tmp_path / "les.sqlite")))
+    payload = {
+        "ingredients": [
+            {"name": "soy", "cost": 0.8, "nutrients": {"protein": 0.5}},
+            {"name": "fishmeal", "cost": 2.0, "nutrients": {"protein": 0.65}},
+        ],
+        "requirements": {"protein": 0.55},
+    }
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+
+    def override():
+        with Session(engine) as session:
+            yield session
+
+    main.app.dependency_overrides[get_session] = override
+    try:
+        http = TestClient(main.app)
+        first = http.post("/simulate/les", json=payload).json()
+        second = http.post("/simulate/les", json=payload).json()
+        assert first["cached"] is False and second["cached"] is True
+        assert first["kpis"] == second["kpis"] and client.calls == 1
+        assert second["report_id"] == first["report_id"] + 1
+        assert http.get("/simulate/les/cache").json()["hits"] == 1
+    finally:
+        main.app.dependency_overrides.clear()
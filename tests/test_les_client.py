@@ -0,0 +1,97 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+import pytest
+
+from app.les_client import LESClient
+
+DELAY = 0.05
+
+
+class _Stub(BaseHTTPRequestHandler):
+    """LES stand-in: echoes the plan size after ``DELAY`` seconds and fails
+    the first ``failures`` requests with 503."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.active += 1
+            self.server.peak = max(self.server.peak, self.server.active)
+            fail = self.server.failures > 0
+            self.server.failures -= fail
+        time.sleep(DELAY)
+        with self.server.lock:
+            self.server.active -= 1
+        status = 503 if fail else 200
+        payload = json.dumps(
+            {"oxygen_demand": sum(body["plan"].values()), "nutrient_cycling": 0.9}
+        ).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Stub)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.connections = httpd.active = httpd.peak = httpd.failures = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_run_many_reuses_bounded_pool(server):
+    plans = [{"soy": float(i)} for i in range(24)]
+    with LESClient(server.url, max_connections=4) as client:
+        start = time.perf_counter()
+        results = client.run_many(plans)
+        elapsed = time.perf_counter() - start
+        again = client.run_simulation({"soy": 1.0, "kelp": 2.0})
+    assert [r["oxygen_demand"] for r in results] == [float(i) for i in range(24)]
+    assert again == {"oxygen_demand": 3.0, "nutrient_cycling": 0.9}
+    assert server.peak <= 4 and server.connections <= 4
+    # One connection at a time tops out at 1 / DELAY plans per second.
+    throughput = len(plans) / elapsed
+    assert throughput > 1.5 / DELAY
+
+
+def test_async_run_many_and_retries(server):
+    server.failures = 2
+    client = LESClient(server.url, max_connections=3, backoff=0.01)
+
+    async def run():
+        try:
+            return await client.arun_many([{"a": 1.0}, {"a": 2.0}, {"a": 3.0}])
+        finally:
+            await client.aclose()
+
+    results = asyncio.run(run())
+    assert [r["oxygen_demand"] for r in results] == [1.0, 2.0, 3.0]
+    assert server.peak <= 3
+
+    server.failures = 10
+    with LESClient(server.url, retries=1, backoff=0.01) as flaky:
+        with pytest.raises(RuntimeError, match="503"):
+            flaky.run_simulation({"a": 1.0})
+    assert server.failures == 8
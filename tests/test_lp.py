@@ -0,0 +1,119 @@
+import time
+
+import numpy as np
+import pytest
+
+from app import lp
+from app.optimization import feed_program, menu_program, optimize_feed, optimize_menu
+
+
+def _catalog(n_ingredients, n_nutrients, density=0.3, seed=0):
+    rng = np.random.default_rng(seed)
+    nutrients = [f"n{i}" for i in range(n_nutrients)]
+    ingredients = []
+    for j in range(n_ingredients):
+        mask = rng.random(n_nutrients) < density
+        ingredients.append(
+            {
+                "name": f"i{j}",
+                "cost": float(rng.uniform(0.5, 5.0)),
+                "nutrients": {
+                    n: float(v)
+                    for n, v, m in zip(nutrients, rng.random(n_nutrients), mask)
+                    if m
+                },
+            }
+        )
+    requirements = {n: 1.0 for n in nutrients}
+    return ingredients, requirements
+
+
+def test_nutrient_matrix_skips_unknown_and_zero():
+    ingredients = [
+        {"name": "a", "nutrients": {"protein": 2, "fat": 0, "fibre": 1}},
+        {"name": "b", "nutrients": {"fat": 3}},
+    ]
+    matrix = lp.nutrient_matrix(ingredients, ["protein", "fat"])
+    assert matrix.shape == (2, 2)
+    assert matrix.nnz == 2
+    assert matrix.toarray().tolist() == [[2, 0], [0, 3]]
+
+
+@pytest.mark.parametrize("backend", ["glop", "highs"])
+def test_exact_backends_agree(backend):
+    ingredients, requirements = _catalog(200, 15)
+    program = menu_program(ingredients, requirements, caps={"i0": 0.5})
+    reference = lp.solve(program, "highs" if backend == "glop" else "glop")
+    result = lp.solve(program, backend)
+    assert result.status == lp.OPTIMAL
+    assert result.objective == pytest.approx(reference.objective, rel=1e-6)
+    assert program.violation(result.x) < 1e-6
+    assert result.row_duals is not None and len(result.row_duals) == len(requirements)
+    # Strong duality: every row is a >= row and bounds are at zero or caps.
+    upper = np.nan_to_num(program.upper, posinf=0)
+    bound_term = float(np.minimum(result.reduced_costs, 0) @ upper)
+    assert result.row_duals @ program.row_lower + bound_term == pytest.approx(
+        result.objective, rel=1e-6
+    )
+
+
+def test_feed_program_duals_include_total_row():
+    ingredients, requirements = _catalog(50, 4, density=0.8)
+    requirements = {n: 0.1 for n in requirements}
+    program = feed_program(ingredients, requirements)
+    glop = lp.solve(program, "glop")
+    highs = lp.solve(program, "highs")
+    assert glop.objective == pytest.approx(highs.objective, rel=1e-6)
+    assert glop.row_duals[-1] == pytest.approx(highs.row_duals[-1], rel=1e-5, abs=1e-9)
+
+
+def test_greedy_is_feasible_but_not_cheaper():
+    ingredients, requirements = _catalog(300, 10)
+    program = menu_program(ingredients, requirements, inventory={"i1": 0.1})
+    greedy = lp.solve(program, "greedy")
+    exact = lp.solve(program, "highs")
+    assert greedy.status == lp.FEASIBLE
+    assert program.violation(greedy.x) < 1e-6
+    assert greedy.objective >= exact.objective - 1e-9
+
+
+def test_greedy_reports_infeasible():
+    ingredients = [{"name": "a", "cost": 1.0, "nutrients": {"protein": 1}}]
+    program = menu_program(ingredients, {"protein": 5}, caps={"a": 2})
+    assert lp.solve(program, "greedy").status == lp.INFEASIBLE
+    with pytest.raises(ValueError, match="No optimal menu found"):
+        optimize_menu(ingredients, {"protein": 5}, caps={"a": 2}, backend="greedy")
+
+
+def test_optimizers_fall_back_to_highs_without_ortools(monkeypatch):
+    monkeypatch.setattr(lp, "pywraplp", None)
+    monkeypatch.delenv("OPTIMIZER_BACKEND", raising=False)
+    assert lp.available_backends() == ["highs", "greedy"]
+    assert isinstance(lp.get_backend(), lp.HighsBackend)
+    with pytest.raises(RuntimeError):
+        lp.get_backend("glop")
+    ingredients = [
+        {"name": "duckweed", "cost": 1.0, "nutrients": {"protein": 0.4}},
+        {"name": "soy", "cost": 0.8, "nutrients": {"protein": 0.5}},
+    ]
+    feed = optimize_feed(ingredients, {"protein": 0.45}, caps={"soy": 0.6})
+    assert feed["soy"] == pytest.approx(0.6)
+    assert sum(feed.values()) == pytest.approx(1.0)
+
+
+def test_backend_from_environment(monkeypatch):
+    monkeypatch.setenv("OPTIMIZER_BACKEND", "greedy")
+    assert isinstance(lp.get_backend(), lp.GreedyBackend)
+    monkeypatch.setenv("OPTIMIZER_BACKEND", "simplex")
+    with pytest.raises(ValueError):
+        lp.get_backend()
+
+
+def test_large_sparse_catalog_assembles_quickly():
+    ingredients, requirements = _catalog(5000, 60, density=0.2)
+    started = time.perf_counter()
+    program = menu_program(ingredients, requirements)
+    result = lp.solve(program)
+    assert result.ok
+    assert program.matrix.nnz < 0.25 * 5000 * 60
+    assert time.perf_counter() - started < 10
@@ -0,0 +1,211 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.catalog import CatalogCache
+from app.database import get_session
+from app.main import app
+from app.models import (
+    FeedIngredient,
+    FeedIngredientNutrient,
+    Ingredient,
+    IngredientNutrient,
+    Nutrient,
+    PersonaRequirement,
+)
+from app.nutrients import find_ingredients, load_profiles, migrate_nutrients
+from app.optimization import optimize_menu
+
+
+def _engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def _rows(session, link):
+    query = select(link.ingredient_id, Nutrient.name, link.amount).join(
+        Nutrient, Nutrient.nutrient_id == link.nutrient_id
+    )
+    return sorted(session.exec(query).all())
+
+
+def test_orm_writes_keep_rows_in_sync():
+    engine = _engine()
+    with Session(engine) as session:
+        kale = Ingredient(name="kale", nutrients={"protein": 0.03, "iron": 0.002})
+        soy = FeedIngredient(name="soy", nutrients={"protein": 0.5, "fat": 0})
+        session.add_all([kale, soy])
+        session.commit()
+        assert _rows(session, IngredientNutrient) == [
+            (kale.ingredient_id, "iron", 0.002),
+            (kale.ingredient_id, "protein", 0.03),
+        ]
+        assert _rows(session, FeedIngredientNutrient) == [
+            (soy.ingredient_id, "protein", 0.5)
+        ]
+
+        kale.nutrients = {"protein": 0.04}
+        kale.cost_per_kg = 3  # not a profile change
+        session.commit()
+        assert _rows(session, IngredientNutrient) == [
+            (kale.ingredient_id, "protein", 0.04)
+        ]
+        # Nutrient names are shared between the two link tables.
+        assert len(session.exec(select(Nutrient)).all()) == 2
+
+        session.delete(kale)
+        session.commit()
+        assert _rows(session, IngredientNutrient) == []
+
+        session.add(Ingredient(name="bean", nutrients={"protein": 0.2}))
+        session.rollback()
+        assert _rows(session, IngredientNutrient) == []
+
+
+def test_migration_backfills_once():
+    engine = _engine()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Ingredient.__table__),
+            [
+                {"name": f"i{j}", "unit": "kg", "nutrients": {"protein": j / 10}}
+                for j in range(12)
+            ],
+        )
+        conn.execute(
+            insert(FeedIngredient.__table__),
+            [{"name": "corn", "unit": "kg", "nutrients": {"protein": 0.1, "fat": 0.1}}],
+        )
+    assert migrate_nutrients(engine) == 11 + 2  # i0 has no protein
+    assert migrate_nutrients(engine) == 0
+    with Session(engine) as session:
+        profiles = load_profiles(session, "menu")
+        assert len(profiles) == 11
+        assert load_profiles(session, "feed", nutrients=["fat"]) == {1: {"fat": 0.1}}
+
+
+def _catalog(session, n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    for j in range(n):
+        session.add(
+            Ingredient(
+                name=f"i{j}",
+                cost_per_kg=float(rng.uniform(0.5, 4)),
+                stock_on_hand=float(rng.choice([0, 1, 2])),
+                nutrients={
+                    f"n{k}": round(float(rng.random()), 3)
+                    for k in range(10)
+                    if rng.random() < 0.25
+                },
+                preferences={"p1": 5.0} if j % 17 == 0 else {},
+            )
+        )
+    for k in range(3):
+        session.add(PersonaRequirement(persona="p1", nutrient=f"n{k}", amount=1))
+        session.add(PersonaRequirement(persona="p2", nutrient=f"n{k + 3}", amount=1))
+    session.commit()
+
+
+def test_find_ingredients_filters_in_sql():
+    engine = _engine()
+    with Session(engine) as session:
+        _catalog(session)
+        found = find_ingredients(
+            session, minimums={"n0": 0.3}, maximums={"n1": 0.5}, max_cost=2
+        )
+        everything = session.exec(select(Ingredient)).all()
+        expected = sorted(
+            (ing.cost_per_kg, ing.name)
+            for ing in everything
+            if ing.nutrients.get("n0", 0) >= 0.3
+            and ing.nutrients.get("n1", 0) <= 0.5
+            and ing.cost_per_kg <= 2
+        )
+        assert [(f["cost"], f["name"]) for f in found] == expected
+        assert all(f["nutrients"]["n0"] >= 0.3 for f in found)
+        stocked = find_ingredients(session, minimums={"n0": 0.3}, in_stock=True)
+        assert stocked and all(f["stock"] > 0 for f in stocked)
+        with pytest.raises(ValueError):
+            find_ingredients(session, kind="fish")
+
+
+def test_pruned_inputs_give_the_same_menus():
+    engine = _engine()
+    cache = CatalogCache()
+    with Session(engine) as session:
+        _catalog(session)
+        catalog, requirements, preferences, _, _ = cache.menu_inputs(session, "p1")
+        everything = session.exec(select(Ingredient)).all()
+        assert len(catalog) < len(everything)
+        # Out of stock items are dropped; preferred items are kept regardless.
+        assert all(catalog.inventory > 0)
+        assert "i17" in catalog.index or everything[17].stock_on_hand == 0
+        required = [catalog.nutrient_index[n] for n in requirements]
+        for j, name in enumerate(catalog.names):
+            assert catalog.matrix[j, required].any() or preferences.get(name, 0) > (
+                catalog.cost[j]
+            )
+        full = optimize_menu(
+            [
+                {"name": i.name, "cost": i.cost_per_kg, "nutrients": i.nutrients}
+                for i in everything
+            ],
+            requirements,
+            {i.name: i.preferences["p1"] for i in everything if "p1" in i.preferences},
+            inventory={i.name: i.stock_on_hand for i in everything},
+        )
+        pruned = optimize_menu(catalog, requirements, preferences)
+        assert {k: v for k, v in full.items() if v > 1e-9} == pytest.approx(
+            {k: v for k, v in pruned.items() if v > 1e-9}
+        )
+        # Planning may buy, so it keeps rows without stock.
+        planning = cache.menu_inputs(session, "p1", in_stock=False)[0]
+        assert len(catalog) < len(planning) < len(everything)
+
+        household, by_persona, household_preferences, _, _ = cache.household_inputs(
+            session, ["p1", "p2"]
+        )
+        assert by_persona["p2"] == {"n3": 1, "n4": 1, "n5": 1}
+        assert household_preferences["p1"] == preferences
+        assert set(catalog.names) <= set(household.names)
+
+        session.add(FeedIngredient(name="filler", stock_on_hand=5, cost_per_kg=0.1))
+        session.add(FeedIngredient(name="empty", nutrients={"protein": 1}))
+        session.commit()
+        cache.clear()
+        feed = cache.feed_inputs(session)[0]
+        assert feed.names == ["filler"]
+        assert cache.feed_inputs(session, in_stock=False)[0].names == [
+            "filler",
+            "empty",
+        ]
+
+
+def test_search_endpoint():
+    engine = _engine()
+
+    def override():
+        with Session(engine) as session:
+            yield session
+
+    with Session(engine) as session:
+        _catalog(session)
+    app.dependency_overrides[get_session] = override
+    try:
+        client = TestClient(app)
+        params = {"min": ["n0:0.3", "n2:0.1"], "max_cost": 3}
+        found = client.get("/ingredients/search", params=params).json()
+        assert found
+        for item in found:
+            assert item["nutrients"]["n0"] >= 0.3 and item["nutrients"]["n2"] >= 0.1
+            assert item["cost"] <= 3
+        bad = client.get("/ingredients/search", params={"min": "protein"})
+        assert bad.status_code == 422
+    finally:
+        app.dependency_overrides.clear()
@@ -1,4 +1,6 @@
-from app.optimization import optimize_feed, optimize_menu
+import pytest
+
+from app.optimization import optimize_feed, optimize_household, optimize_menu
 from sqlmodel import SQLModel, Session, create_engine
 
 from app.models import (
@@ -7,7 +9,7 @@ from app.models import (
     Ingredient,
     PersonaRequirement,
 )
-from app.utils import run_optimizations
+from app.utils import run_household, run_optimizations
 
 
 def test_optimize_feed():
@@ -102,3 +104,88 @@ def test_run_optimizations_with_db():
     feed = result["feed"]
     assert feed["f1"] <= 0.5 + 1e-6
     assert abs(sum(feed.values()) - 1.0) < 1e-6
+
+
+HOUSEHOLD = [
+    {"name": "tilapia", "cost": 1.0, "nutrients": {"protein": 1}},
+    {"name": "beans", "cost": 3.0, "nutrients": {"protein": 1, "fibre": 1}},
+]
+
+
+def test_optimize_household_shares_inventory():
+    requirements = {"ana": {"protein": 4}, "ben": {"protein": 3, "fibre": 1}}
+    inventory = {"tilapia": 5}
+    joint = optimize_household(HOUSEHOLD, requirements, inventory=inventory)
+    assert joint["ana"]["tilapia"] + joint["ben"]["tilapia"] <= 5 + 1e-6
+    for persona, req in requirements.items():
+        for nutrient, amount in req.items():
+            got = sum(
+                joint[persona][i["name"]] * i["nutrients"].get(nutrient, 0)
+                for i in HOUSEHOLD
+            )
+            assert got >= amount - 1e-6
+
+    independent = optimize_household(
+        HOUSEHOLD, requirements, inventory=inventory, shared_inventory=False
+    )
+    assert independent["ana"]["tilapia"] + independent["ben"]["tilapia"] > 5
+    assert independent["ben"] == optimize_menu(
+        HOUSEHOLD, requirements["ben"], inventory=inventory
+    )
+
+
+def test_optimize_household_matches_separate_solves_without_contention():
+    requirements = {"ana": {"protein": 2}, "ben": {"protein": 1, "fibre": 1}}
+    preferences = {"ana": {"beans": 2.5}}
+    joint = optimize_household(HOUSEHOLD, requirements, preferences)
+    assert joint["ana"] == pytest.approx(
+        optimize_menu(HOUSEHOLD, requirements["ana"], preferences["ana"])
+    )
+    parallel = optimize_household(
+        HOUSEHOLD, requirements, preferences, shared_inventory=False, workers=2
+    )
+    assert parallel == {p: pytest.approx(plan) for p, plan in joint.items()}
+
+
+def test_run_household_with_db():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(
+            Ingredient(
+                name="a",
+                cost_per_kg=1,
+                stock_on_hand=5,
+                nutrients={"protein": 1},
+                preferences={"p2": 0.5},
+            )
+        )
+        session.add(
+            Ingredient(
+                name="b", cost_per_kg=2, stock_on_hand=9, nutrients={"protein": 1}
+            )
+        )
+        session.add(PersonaRequirement(persona="p1", nutrient="protein", amount=4))
+        session.add(PersonaRequirement(persona="p2", nutrient="protein", amount=3))
+        session.add(
+            FeedIngredient(
+                name="f1", cost_per_kg=1, stock_on_hand=1, nutrients={"protein": 1}
+            )
+        )
+        session.add(FeedRequirement(nutrient="protein", amount=1))
+        session.commit()
+        result = run_household(session, ["p1", "p2"])
+        serial = run_household(session, ["p1", "p2"], shared_inventory=False)
+        parallel = run_household(
+            session, ["p1", "p2"], shared_inventory=False, workers=2
+        )
+
+    assert parallel == serial
+    assert serial["menus"]["p1"]["a"] == pytest.approx(4)
+
+    menus = result["menus"]
+    assert menus["p1"]["a"] + menus["p2"]["a"] == pytest.approx(5)
+    # p2 prefers "a", so it keeps all of it for p2's 3 units.
+    assert menus["p2"]["a"] == pytest.approx(3)
+    assert menus["p1"]["b"] == pytest.approx(2)
+    assert result["feed"] == {"f1": pytest.approx(1.0)}
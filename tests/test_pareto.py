@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.benchmark import synthetic_catalog
+from app.jobs import jobs
+from app.main import app
+from app.pareto import pareto_front
+
+FEED = [
+    {"name": "soy", "cost": 1.0, "nutrients": {"protein": 0.6}},
+    {"name": "duckweed", "cost": 2.0, "nutrients": {"protein": 0.6}},
+    {"name": "fishmeal", "cost": 3.0, "nutrients": {"protein": 0.7}},
+]
+
+
+def test_epsilon_front_of_a_simple_feed():
+    front = pareto_front(
+        "feed", FEED, {"protein": 0.5}, on_farm=["duckweed"], points=5
+    )
+    assert front["objectives"] == ["cost", "purchased"]
+    assert np.array(front["front"]) == pytest.approx(
+        np.array([[1.0, 1.0], [1.25, 0.75], [1.5, 0.5], [1.75, 0.25], [2.0, 0.0]]),
+        abs=1e-6,
+    )
+    assert front["names"] == ["soy", "duckweed"]
+    assert np.array(front["plans"]) == pytest.approx(
+        np.array([[1.0, 0.0], [0.75, 0.25], [0.5, 0.5], [0.25, 0.75], [0.0, 1.0]]),
+        abs=1e-6,
+    )
+
+
+@pytest.mark.parametrize("backend", ["glop", "highs"])
+def test_methods_and_workers_agree(backend):
+    catalog = synthetic_catalog(300, 15, seed=4)
+    on_farm = [ing["name"] for ing in catalog["ingredients"][::5]]
+    args = ("menu", catalog["ingredients"], catalog["menu_requirements"])
+    kwargs = dict(
+        on_farm=on_farm,
+        preferences=catalog["preferences"],
+        caps=catalog["caps"],
+        inventory=catalog["inventory"],
+        points=9,
+        backend=backend,
+    )
+    serial = pareto_front(*args, workers=1, **kwargs)
+    parallel = pareto_front(*args, workers=2, **kwargs)
+    assert np.array(parallel["front"]) == pytest.approx(
+        np.array(serial["front"]), rel=1e-6, abs=1e-7
+    )
+    costs, purchased = np.array(serial["front"]).T
+    assert (np.diff(costs) > 0).all() and (np.diff(purchased) < 0).all()
+
+    # Weighted sums find supported points of the convex front, so none lies
+    # above the chords between sampled epsilon points.
+    weighted = pareto_front(*args, method="weighted", **kwargs)
+    assert weighted["front"][0] == pytest.approx(serial["front"][0], rel=1e-6, abs=1e-7)
+    assert weighted["front"][-1] == pytest.approx(
+        serial["front"][-1], rel=1e-6, abs=1e-7
+    )
+    for cost, value in weighted["front"]:
+        assert cost <= np.interp(-value, -purchased, costs) * (1 + 1e-6)
+
+
+def test_surplus_objective_and_errors():
+    front = pareto_front(
+        "feed",
+        FEED,
+        {"protein": 0.5},
+        objective="surplus",
+        caps={"fishmeal": 0.5},
+        points=3,
+    )
+    # Overshooting 0.5 protein by 0.1 is a 20% surplus at any mix of soy and
+    # duckweed; only the cheapest such plan is on the front.
+    assert np.array(front["front"]) == pytest.approx(np.array([[1.0, 0.2]]))
+    with pytest.raises(ValueError):
+        pareto_front("feed", FEED, {"protein": 0.5}, method="random")
+    with pytest.raises(ValueError):
+        pareto_front("fish", FEED, {"protein": 0.5})
+    with pytest.raises(ValueError):
+        pareto_front("feed", FEED, {"protein": 0.5}, objective="carbon")
+
+    client = TestClient(app)
+    body = client.post(
+        "/optimize/pareto",
+        json={
+            "kind": "feed",
+            "ingredients": FEED,
+            "requirements": {"protein": 0.5},
+            "on_farm": ["duckweed"],
+            "points": 3,
+        },
+    ).json()
+    assert np.array(body["front"]) == pytest.approx(
+        np.array([[1.0, 1.0], [1.5, 0.5], [2.0, 0.0]]), abs=1e-6
+    )
+    bad = client.post(
+        "/optimize/pareto",
+        json={"ingredients": FEED, "requirements": {}, "objective": "carbon"},
+    )
+    assert bad.status_code == 422
+
+
+def test_endpoint_spreads_points_over_the_job_pool(monkeypatch):
+    chunks = []
+    run = jobs.map
+
+    def spy(fn, tasks):
+        tasks = list(tasks)
+        chunks.append(len(tasks))
+        return run(fn, tasks)
+
+    monkeypatch.setattr(jobs, "map", spy)
+    client = TestClient(app)
+    request = {
+        "kind": "feed",
+        "ingredients": FEED,
+        "requirements": {"protein": 0.5},
+        "on_farm": ["duckweed"],
+        "points": 5,
+    }
+    serial = client.post("/optimize/pareto", json=request).json()
+    assert chunks == []
+    parallel = client.post("/optimize/pareto", json={**request, "workers": 2})
+    assert parallel.status_code == 200 and chunks == [2]
+    assert np.array(parallel.json()["front"]) == pytest.approx(
+        np.array(serial["front"]), abs=1e-9
+    )
@@ -0,0 +1,258 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.database import get_seasonal_yields, get_session
+from app.main import app
+from app.models import (
+    FeedIngredient,
+    FeedRequirement,
+    HumanFood,
+    Ingredient,
+    PersonaRequirement,
+    ProcessingLossFactor,
+    SeasonalYield,
+)
+from app.planning import PlanningInputs, period_seasons, plan_periods, planning_program
+
+PROTEIN = {"protein": 1.0}
+
+
+def _inputs(**overrides):
+    values = dict(
+        menu_ingredients=[
+            {"name": "tomato", "cost": 3.0, "nutrients": PROTEIN},
+            {"name": "beans", "cost": 1.0, "nutrients": PROTEIN},
+        ],
+        menu_requirements={"protein": 2.0},
+        feed_ingredients=[
+            {"name": "duckweed", "cost": 2.0, "nutrients": {"protein": 0.4}},
+            {"name": "fishmeal", "cost": 3.0, "nutrients": {"protein": 0.6}},
+        ],
+        feed_requirements={"protein": 0.5},
+        seasons=["Winter", "Summer", "Summer", "Autumn"],
+        feed_demand=10.0,
+    )
+    values.update(overrides)
+    return PlanningInputs(**values)
+
+
+def test_period_seasons():
+    weeks = period_seasons(52)
+    assert weeks[0] == "Winter" and weeks[26] == "Summer"
+    assert [weeks.count(s) for s in ("Winter", "Spring", "Summer", "Autumn")] == [
+        13,
+        13,
+        13,
+        13,
+    ]
+    assert period_seasons(1, start_week=27, hemisphere="south") == ["Winter"]
+    assert period_seasons(5, "season", start_week=10) == [
+        "Spring",
+        "Summer",
+        "Autumn",
+        "Winter",
+        "Spring",
+    ]
+    with pytest.raises(ValueError):
+        period_seasons(4, "month")
+
+
+def test_harvest_is_carried_into_later_periods():
+    inputs = _inputs(
+        yields={"menu": {"tomato": {"Summer": 5.0}}},
+        stock={"feed": {"fishmeal": 3.0}},
+        holding_cost=0.01,
+    )
+    result = plan_periods(inputs)
+    winter, summer, late_summer, autumn = result["periods"]
+    assert winter["buy"]["beans"] == pytest.approx(2.0)
+    assert summer["harvest"]["tomato"] == pytest.approx(2.0)
+    # Autumn eats tomatoes picked late in summer rather than buying beans.
+    assert late_summer["harvest"]["tomato"] == pytest.approx(4.0)
+    assert late_summer["carry"]["tomato"] == pytest.approx(2.0)
+    assert "beans" not in autumn["buy"] and "tomato" not in autumn["buy"]
+    assert autumn["menu"]["tomato"] == pytest.approx(2.0)
+    # Feed: 10 kg at 50% protein needs half duckweed, half fishmeal; the
+    # opening fishmeal stock covers part of the first period.
+    for period in result["periods"]:
+        assert sum(period["feed"].values()) == pytest.approx(10.0)
+    assert winter["buy"]["fishmeal"] == pytest.approx(2.0)
+    feed_cost = 4 * 5 * 2.0 + (4 * 5 - 3) * 3.0
+    assert result["cost"] == pytest.approx(2.0 + feed_cost + 0.01 * 2)
+
+
+def test_caps_and_purchasable_limits():
+    inputs = _inputs(
+        caps={"feed": {"duckweed": 0.25}, "menu": {"beans": 1.0}},
+        purchasable={"menu": {"tomato": False}},
+        yields={"menu": {"tomato": {"Winter": 1.0}}},
+        seasons=["Winter"],
+    )
+    (period,) = plan_periods(inputs)["periods"]
+    assert period["feed"] == pytest.approx({"duckweed": 2.5, "fishmeal": 7.5})
+    assert period["menu"] == pytest.approx({"beans": 1.0, "tomato": 1.0})
+    inputs.yields = {}
+    with pytest.raises(ValueError):
+        plan_periods(inputs)
+
+
+@pytest.mark.parametrize("backend", ["glop", "highs"])
+def test_large_horizon_is_sparse_and_consistent(backend):
+    rng = np.random.default_rng(0)
+
+    def catalog(n, m, prefix):
+        return [
+            {
+                "name": f"{prefix}{j}",
+                "cost": float(rng.uniform(0.5, 5)),
+                "nutrients": {f"n{k}": float(rng.random()) for k in range(m)},
+            }
+            for j in range(n)
+        ]
+
+    menu, feed = catalog(40, 5, "m"), catalog(20, 3, "f")
+    yields = {"menu": {f"m{j}": {"Summer": 3.0} for j in range(5)}}
+    inputs = _inputs(
+        menu_ingredients=menu,
+        menu_requirements={f"n{k}": 4.0 for k in range(5)},
+        feed_ingredients=feed,
+        feed_requirements={f"n{k}": 0.4 for k in range(3)},
+        seasons=period_seasons(52),
+        feed_demand=20.0,
+        yields=yields,
+        caps={"feed": {f"f{j}": 0.3 for j in range(20)}},
+        holding_cost=0.05,
+    )
+    program, _ = planning_program(inputs)
+    assert program.shape == (52 * (60 + 5 + 3 + 1), 3 * 52 * 60 + 13 * 5)
+    assert program.matrix.nnz < 52 * (4 * 60 + 5 * 40 + 3 * 20 + 20) + 13 * 5
+    result = plan_periods(inputs, backend)
+    assert result["cost"] == pytest.approx(plan_periods(inputs, "highs")["cost"])
+    for period in result["periods"]:
+        assert sum(period["feed"].values()) == pytest.approx(20.0)
+
+
+def _engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        tomato = HumanFood(name="tomato", available_on_farm=True)
+        duckweed = FeedIngredient(
+            name="duckweed", cost_per_kg=2, nutrients={"protein": 0.4}
+        )
+        session.add_all(
+            [
+                tomato,
+                duckweed,
+                Ingredient(name="tomato", cost_per_kg=3, nutrients=PROTEIN),
+                Ingredient(name="beans", cost_per_kg=1, nutrients=PROTEIN),
+                FeedIngredient(
+                    name="fishmeal", cost_per_kg=1.5, nutrients={"protein": 0.6}
+                ),
+                PersonaRequirement(persona="p1", nutrient="protein", amount=0.2),
+                FeedRequirement(nutrient="protein", amount=0.5),
+            ]
+        )
+        session.flush()
+        session.add_all(
+            [
+                SeasonalYield(food_id=tomato.food_id, season="Summer", yield_kg=26),
+                SeasonalYield(
+                    ingredient_id=duckweed.ingredient_id, season="Summer", yield_kg=130
+                ),
+                ProcessingLossFactor(
+                    food_id=tomato.food_id, process="Cleaning", loss_factor=0.1
+                ),
+                ProcessingLossFactor(
+                    food_id=tomato.food_id, process="Trimming", loss_factor=0.5
+                ),
+            ]
+        )
+        session.commit()
+    return engine
+
+
+def test_seasonal_yields_net_of_losses():
+    with Session(_engine()) as session:
+        yields = get_seasonal_yields(session, periods_per_season=13)
+    assert yields["menu"]["tomato"]["Summer"] == pytest.approx(2 * 0.9 * 0.5)
+    assert yields["feed"]["duckweed"]["Summer"] == pytest.approx(10.0)
+
+
+def test_plan_endpoint():
+    engine = _engine()
+
+    def override():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override
+    try:
+        client = TestClient(app)
+        params = {"persona": "p1", "periods": 52, "feed_kg": 1, "start_week": 1}
+        body = client.get("/optimize/plan", params=params).json()
+        assert len(body["periods"]) == 52
+        summer = body["periods"][30]
+        assert summer["season"] == "Summer"
+        # 0.9 kg of tomato a week covers most of the 1.4 kg protein need.
+        assert summer["harvest"]["tomato"] == pytest.approx(0.9)
+        assert summer["buy"]["beans"] == pytest.approx(0.5)
+        assert body["periods"][0]["menu"] == pytest.approx({"beans": 1.4})
+        bad = client.get("/optimize/plan", params={**params, "granularity": "x"})
+        assert bad.status_code == 422
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_plan_endpoint_with_uncapped_feed_and_no_feed_demand():
+    engine = _engine()
+
+    def override():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override
+    try:
+        client = TestClient(app)
+        resp = client.get("/optimize/plan", params={"persona": "p1", "periods": 4})
+        assert resp.status_code == 200
+        body = resp.json()
+        assert all(sum(p["feed"].values()) == 0 for p in body["periods"])
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_zero_feed_demand_leaves_no_nan_bounds():
+    program, _ = planning_program(_inputs(feed_demand=0.0))
+    assert not np.isnan(program.upper).any()
+
+
+def test_plan_never_buys_unpriced_reference_foods():
+    engine = _engine()
+    with Session(engine) as session:
+        session.add(
+            Ingredient(name="Tilapia, raw", source="fdc:1", nutrients={"protein": 0.2})
+        )
+        session.commit()
+
+    def override():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override
+    try:
+        client = TestClient(app)
+        resp = client.get("/optimize/plan", params={"persona": "p1", "periods": 4})
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["cost"] > 0
+        for period in body["periods"]:
+            assert period["buy"].get("Tilapia, raw", 0) == 0
+            assert period["buy"]["beans"] == pytest.approx(1.4)
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,111 @@
+from datetime import datetime
+import json
+
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.database import get_session
+from app.main import app
+from app.reports import (
+    diff_reports,
+    get_report,
+    list_reports,
+    migrate_files,
+    save_report,
+)
+
+
+def _engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def test_reports_in_the_same_second_are_all_kept():
+    engine = _engine()
+    moment = datetime(2024, 5, 1, 12, 0, 0)
+    with Session(engine) as session:
+        ids = [
+            save_report(
+                session,
+                {"soy": 1 - share, "kelp": share},
+                {
+                    "oxygen_demand": 300 + 100 * share,
+                    "nutrient_cycling": share,
+                    "label": "run",
+                },
+                created_at=moment,
+            )
+            for share in (0.0, 0.5, 1.0)
+        ]
+        listed = list_reports(session)
+        assert [r["report_id"] for r in listed] == ids[::-1]
+        assert "plan" not in listed[0]
+
+        matches = list_reports(
+            session,
+            minimums={"nutrient_cycling": 0.25},
+            maximums={"oxygen_demand": 360},
+        )
+        assert [r["report_id"] for r in matches] == [ids[1]]
+        assert list_reports(session, minimums={"missing": 0}) == []
+        assert len(list_reports(session, limit=1, offset=1)) == 1
+
+        full = get_report(session, ids[0])
+        assert full["plan"] == {"soy": 1.0, "kelp": 0.0}
+        assert get_report(session, 999) is None
+
+        diff = diff_reports(session, ids[0], ids[2])
+        assert diff["plan"]["kelp"] == {"a": 0.0, "b": 1.0, "delta": 1.0}
+        assert diff["kpis"]["oxygen_demand"]["delta"] == 100
+        assert diff["kpis"]["label"] == {"a": "run", "b": "run", "delta": None}
+
+
+def test_migrate_legacy_files_is_idempotent(tmp_path):
+    for stamp, demand in (("20240101120000", 410.0), ("20240102120000", 390.0)):
+        (tmp_path / f"scenario_{stamp}.json").write_text(
+            json.dumps(
+                {
+                    "plan": {"soy": 1.0},
+                    "kpis": {"oxygen_demand": demand},
+                    "timestamp": stamp,
+                }
+            )
+        )
+    (tmp_path / "notes.json").write_text("{}")
+    engine = _engine()
+    with Session(engine) as session:
+        assert migrate_files(session, str(tmp_path)) == 2
+        assert migrate_files(session, str(tmp_path)) == 0
+        listed = list_reports(session, maximums={"oxygen_demand": 400})
+    assert len(listed) == 1
+    assert listed[0]["source"] == "file:scenario_20240102120000.json"
+    assert listed[0]["created_at"] == datetime(2024, 1, 2, 12, 0, 0)
+
+
+def test_report_endpoints():
+    engine = _engine()
+    with Session(engine) as session:
+        a = save_report(session, {"soy": 1.0}, {"oxygen_demand": 400.0})
+        b = save_report(session, {"kelp": 1.0}, {"oxygen_demand": 350.0})
+
+    def override():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override
+    try:
+        client = TestClient(app)
+        listed = client.get("/reports", params={"max": "oxygen_demand:380"}).json()
+        assert [r["report_id"] for r in listed] == [b]
+        assert client.get(f"/reports/{a}").json()["plan"] == {"soy": 1.0}
+        diff = client.get("/reports/diff", params={"a": a, "b": b}).json()
+        assert diff["kpis"]["oxygen_demand"]["delta"] == -50.0
+        assert client.get("/reports/diff", params={"a": a, "b": 99}).status_code == 404
+        assert client.get("/reports/99").status_code == 404
+        assert client.get("/reports", params={"min": "bad"}).status_code == 422
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,162 @@
+from dataclasses import replace
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import lp
+from app.main import app
+from app.optimization import feed_program, menu_program, optimize_feed
+from app.sensitivity import Sensitivity
+
+FEED = [
+    {"name": "soy", "cost": 0.8, "nutrients": {"protein": 0.5}},
+    {"name": "duckweed", "cost": 1.0, "nutrients": {"protein": 0.4}},
+    {"name": "fishmeal", "cost": 2.0, "nutrients": {"protein": 0.65}},
+]
+
+
+def _catalog(n=80, m=6, seed=0):
+    rng = np.random.default_rng(seed)
+    ingredients = [
+        {
+            "name": f"i{j}",
+            "cost": float(rng.uniform(0.5, 5)),
+            "nutrients": {f"n{k}": float(rng.random()) for k in range(m)},
+        }
+        for j in range(n)
+    ]
+    caps = {f"i{j}": 0.4 for j in range(n // 4)}
+    return menu_program(ingredients, {f"n{k}": 1.0 for k in range(m)}, caps=caps)
+
+
+def _resolve(program, cost=None, row_lower=None):
+    changed = replace(
+        program,
+        cost=program.cost if cost is None else cost,
+        row_lower=program.row_lower if row_lower is None else row_lower,
+    )
+    return lp.solve(changed, "highs")
+
+
+def test_feed_ranges_match_hand_calculation():
+    program = feed_program(FEED, {"protein": 0.55})
+    analysis = Sensitivity(program, lp.solve(program))
+    # Optimum mixes soy and fishmeal: 2/3 soy, 1/3 fishmeal.
+    assert analysis.solution.x == pytest.approx([2 / 3, 0, 1 / 3])
+    report = analysis.report()
+    assert report["duals"]["protein"] == pytest.approx(8.0)
+    assert report["duals"]["total"] == pytest.approx(-3.2)
+    # Duckweed becomes worth using once its price drops below 0.4 * 8 - 3.2.
+    assert report["cost_ranges"]["duckweed"] == [pytest.approx(0.0), None]
+    assert report["cost_ranges"]["soy"][1] == pytest.approx(1.4)
+    assert report["requirement_ranges"]["protein"] == [
+        pytest.approx(0.5),
+        pytest.approx(0.65),
+    ]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_duals_and_ranges_agree_with_resolves(seed):
+    program = _catalog(seed=seed)
+    solution = lp.solve(program, "glop")
+    analysis = Sensitivity(program, solution)
+    assert analysis.available
+    highs = lp.solve(program, "highs")
+    assert analysis.duals == pytest.approx(highs.row_duals, abs=1e-6)
+    for j in range(0, len(program.cost), 7):
+        ends = ((analysis.cost_lower[j], 1e-4), (analysis.cost_upper[j], -1e-4))
+        for end, step in ends:
+            if not np.isfinite(end):
+                continue
+            cost = program.cost.copy()
+            cost[j] = end + step
+            expected = solution.objective + (cost[j] - program.cost[j]) * solution.x[j]
+            assert _resolve(program, cost=cost).objective == pytest.approx(expected)
+    for i in range(len(program.row_lower)):
+        ends = ((analysis.rhs_lower[i], 1e-5), (analysis.rhs_upper[i], -1e-5))
+        for end, step in ends:
+            if not np.isfinite(end):
+                continue
+            row_lower = program.row_lower.copy()
+            row_lower[i] = end + step
+            delta = row_lower[i] - program.row_lower[i]
+            assert _resolve(program, row_lower=row_lower).objective == pytest.approx(
+                solution.objective + analysis.duals[i] * delta
+            )
+
+
+def test_what_if_answers_inside_ranges_and_resolves_outside():
+    program = _catalog(seed=3)
+    analysis = Sensitivity(program, lp.solve(program))
+    scenarios = [
+        {"prices": {"i3": p}, "requirements": {"n1": q}}
+        for p in (0.5, 1.0, 9.0)
+        for q in (0.5, 1.2, 3.0)
+    ]
+    results = analysis.what_if(scenarios)
+    assert any(not r["resolved"] for r in results)
+    assert any(r["resolved"] for r in results)
+    for scenario, result in zip(scenarios, results):
+        cost = program.cost.copy()
+        cost[3] = scenario["prices"]["i3"]
+        row_lower = program.row_lower.copy()
+        row_lower[1] = scenario["requirements"]["n1"]
+        expected = _resolve(program, cost=cost, row_lower=row_lower)
+        assert result["objective"] == pytest.approx(expected.objective)
+        plan = np.array([result["plan"][name] for name in program.names])
+        changed = replace(program, row_lower=row_lower)
+        assert changed.violation(plan) < 1e-6
+    with pytest.raises(ValueError):
+        analysis.what_if([{"prices": {"unknown": 1.0}}])
+
+
+def test_sweep_resolves_only_at_basis_changes():
+    program = _catalog(seed=4)
+    analysis = Sensitivity(program, lp.solve(program))
+    values = np.linspace(0.1, 6.0, 120)
+    swept = analysis.sweep(values, price="i5")
+    expected = []
+    for v in values:
+        cost = program.cost.copy()
+        cost[5] = v
+        expected.append(_resolve(program, cost=cost).objective)
+    assert [r["objective"] for r in swept] == pytest.approx(expected)
+    assert sum(r["resolved"] for r in swept) < len(values) / 10
+
+    requirement = analysis.sweep(np.linspace(0.0, 3.0, 60), requirement="n0")
+    assert sum(r["resolved"] for r in requirement) < 20
+    with pytest.raises(ValueError):
+        analysis.sweep([1.0])
+
+
+def test_optimize_feed_returns_sensitivity():
+    result = optimize_feed(FEED, {"protein": 0.55}, sensitivity=True)
+    assert set(result) == {"plan", "sensitivity"}
+    assert result["sensitivity"]["duals"]["protein"] == pytest.approx(8.0)
+
+
+def test_what_if_endpoint():
+    client = TestClient(app)
+    payload = {
+        "ingredients": FEED,
+        "requirements": {"protein": 0.55},
+        "kind": "feed",
+        "scenarios": [
+            {"price_changes": {"soy": 0.15}},
+            {"prices": {"soy": 1.5}},
+            {"requirements": {"protein": 0.6}},
+        ],
+    }
+    body = client.post("/optimize/what-if", json=payload).json()
+    assert body["baseline"]["objective"] == pytest.approx(0.8 * 2 / 3 + 2 / 3)
+    soy, dear_soy, protein = body["scenarios"]
+    # +15% on soy stays inside its range: same plan, objective up 0.12 * 2/3.
+    assert not soy["resolved"]
+    assert soy["objective"] == pytest.approx(body["baseline"]["objective"] + 0.08)
+    # Above 1.4 soy leaves its range and duckweed takes its place.
+    assert dear_soy["resolved"]
+    assert dear_soy["plan"]["duckweed"] > 0
+    assert protein["objective"] == pytest.approx(body["baseline"]["objective"] + 0.4)
+    bad = client.post("/optimize/what-if", json={**payload, "kind": "x"})
+    assert bad.status_code == 422
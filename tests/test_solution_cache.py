@@ -0,0 +1,103 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.changes import unwatch, watch
+from app.main import app
+from app.models import Ingredient
+from app.solution_cache import SolutionCache, canonical_key, solutions
+
+INGREDIENTS = [
+    {"name": "lettuce", "cost": 2.0, "nutrients": {"energy": 0.1, "protein": 0.02}},
+    {"name": "tilapia", "cost": 5.0, "nutrients": {"energy": 1.0, "protein": 0.2}},
+]
+
+
+def test_canonical_key_ignores_order_and_float_noise():
+    shuffled = [
+        {
+            "name": "tilapia",
+            "cost": 5.0 + 1e-12,
+            "nutrients": {"protein": 0.2, "energy": 1.0},
+        },
+        {
+            "name": "lettuce",
+            "cost": 2.0,
+            "nutrients": {"protein": 0.02, "energy": 0.1, "fat": 0},
+        },
+    ]
+    requirements = {"protein": 0.1}
+    key = canonical_key("menu", INGREDIENTS, requirements)
+    assert canonical_key("menu", shuffled, requirements) == key
+    assert canonical_key("feed", INGREDIENTS, requirements) != key
+    assert canonical_key("menu", INGREDIENTS, requirements, caps={"lettuce": 1}) != key
+    assert canonical_key("menu", INGREDIENTS, {"protein": 0.11}) != key
+
+
+def test_lru_ttl_and_stats():
+    now = [0.0]
+    cache = SolutionCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        return {"x": value}
+
+    assert cache.cached("menu", "a", ["x"], lambda: compute(1)) == {"x": 1}
+    assert cache.cached("menu", "a", ["x"], lambda: compute(2)) == {"x": 1}
+    cache.cached("menu", "b", ["x"], lambda: compute(3))
+    cache.cached("menu", "a", ["x"], lambda: compute(4))
+    cache.cached("menu", "c", ["x"], lambda: compute(5))  # evicts "b"
+    assert cache.get("b") is None
+    now[0] = 11
+    assert cache.get("a") is None
+    assert calls == [1, 3, 5]
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["evicted"] == 1
+    assert stats["expired"] == 1
+    assert stats["hit_rate"] == pytest.approx(2 / 7)
+
+
+def test_committed_ingredient_changes_evict_entries():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    cache = SolutionCache()
+    watch(cache)
+    try:
+        cache.optimize_menu(INGREDIENTS, {"protein": 0.1})
+        cache.optimize_feed(INGREDIENTS, {"protein": 0.1})
+        cache.optimize_menu([INGREDIENTS[1]], {"protein": 0.1})
+        with Session(engine) as session:
+            lettuce = Ingredient(name="lettuce", cost_per_kg=2.0)
+            session.add(lettuce)
+            session.commit()
+            # A new catalog row drops every menu entry but leaves the feed alone.
+            assert cache.stats()["entries"] == 1
+            cache.optimize_menu(INGREDIENTS, {"protein": 0.1})
+            cache.optimize_menu([INGREDIENTS[1]], {"protein": 0.1})
+            lettuce.cost_per_kg = 2.5
+            session.commit()
+        assert cache.stats()["entries"] == 2
+        assert cache.stats()["invalidated"] == 3
+    finally:
+        unwatch(cache)
+
+
+def test_endpoints_serve_repeated_payloads_from_cache():
+    solutions.clear()
+    client = TestClient(app)
+    payload = {"ingredients": INGREDIENTS, "requirements": {"protein": 0.1}}
+    before = solutions.stats()
+    first = client.post("/optimize/human-menu", json=payload).json()
+    second = client.post(
+        "/optimize/human-menu", json={**payload, "ingredients": INGREDIENTS[::-1]}
+    ).json()
+    capped = client.post(
+        "/optimize/human-menu", json={**payload, "caps": {"lettuce": 1.0}}
+    ).json()
+    assert first == second
+    assert capped["lettuce"] <= 1.0 + 1e-9
+    stats = client.get("/optimize/cache").json()
+    assert stats["hits"] - before["hits"] == 1
+    assert stats["misses"] - before["misses"] == 2
@@ -0,0 +1,80 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.optimization import optimize_feed
+from app.surrogate import SurrogateLES, SystemParameters, screen
+from app.utils import tan_load_check
+from aquaponics.dynamics import cstr_concentration
+from aquaponics.water import tan_capacity_q10
+
+INGREDIENTS = [
+    {"name": "soy", "cost": 0.8, "nutrients": {"protein": 0.45}},
+    {"name": "fishmeal", "cost": 2.0, "nutrients": {"protein": 0.65}},
+    {"name": "duckweed", "cost": 0.5, "nutrients": {"protein": 0.3}},
+]
+PROTEIN = {i["name"]: i["nutrients"]["protein"] for i in INGREDIENTS}
+
+
+def test_vectorised_estimates_match_scalar_models():
+    params = SystemParameters(feed_kg_per_day=1.5, biofilter_area_m2=130.0)
+    surrogate = SurrogateLES(INGREDIENTS, params)
+    plans = [{"soy": 0.5, "fishmeal": 0.5}, {"duckweed": 1.0}, {"fishmeal": 1.0}]
+    kpis = surrogate.run_many(plans)
+    capacity = tan_capacity_q10(130.0, params.nitrification_rate, params.temp_c)
+    for plan, result in zip(plans, kpis):
+        protein = sum(a * PROTEIN[n] for n, a in plan.items()) * 1500
+        utilization, ok = tan_load_check(protein, capacity)
+        tan = protein * 0.092
+        nitrified = min(tan, capacity)
+        assert result["biofilter_utilization"] == pytest.approx(utilization)
+        assert result["within_capacity"] is ok
+        assert result["nutrient_cycling"] == pytest.approx(nitrified / tan)
+        assert result["oxygen_demand"] == pytest.approx(1500 * 0.25 + 4.57 * nitrified)
+        excess = (tan - nitrified) * 1000 / params.exchange_l_per_day
+        assert result["tan_mg_l"] == pytest.approx(
+            cstr_concentration(0.0, excess, 1000.0, 10000.0, 7.0)
+        )
+    # Only the all-fishmeal plan overloads the biofilter.
+    assert [r["within_capacity"] for r in kpis] == [True, True, False]
+    assert kpis[2]["nutrient_cycling"] < 1 and kpis[2]["nh3_mg_l"] > 0
+    assert surrogate.run_simulation(plans[0]) == kpis[0]
+    with pytest.raises(ValueError):
+        surrogate.run_simulation({"kelp": 1.0})
+
+
+class _CountingLES:
+    def __init__(self):
+        self.plans = []
+
+    def run_simulation(self, plan):
+        self.plans.append(plan)
+        return {"oxygen_demand": math.fsum(plan.values())}
+
+
+def test_screen_sends_only_the_best_plans():
+    surrogate = SurrogateLES(INGREDIENTS, SystemParameters(biofilter_area_m2=80.0))
+    rng = np.random.default_rng(0)
+    plans = [dict(zip(surrogate.names, row)) for row in rng.dirichlet([1, 1, 1], 5000)]
+    client = _CountingLES()
+    best = screen(plans, surrogate, client, k=5)
+    assert len(client.plans) == 5 and [b["plan"] for b in best] == client.plans
+    estimates = surrogate.evaluate(plans)["oxygen_demand"]
+    assert [b["index"] for b in best] == list(np.argsort(estimates)[:5])
+    assert all(b["kpis"] is not None for b in best)
+
+    # Maximising cycling ranks overloaded plans last.
+    ranked = screen(
+        plans, surrogate, k=len(plans), kpi="nutrient_cycling", maximize=True
+    )
+    flags = [r["estimate"]["within_capacity"] for r in ranked]
+    assert flags == sorted(flags, reverse=True) and ranked[0]["kpis"] is None
+
+
+def test_surrogate_stands_in_for_les():
+    report = optimize_feed(
+        INGREDIENTS, {"protein": 0.4}, les_client=SurrogateLES(INGREDIENTS)
+    )
+    assert report["kpis"]["oxygen_demand"] > 0
+    assert 0 < report["kpis"]["nutrient_cycling"] <= 1
@@ -0,0 +1,152 @@
+import asyncio
+from datetime import date
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.main import app
+from app.models import AdjustmentLog, Ingredient, StockBatch, YieldForecast
+from app.sync import SyncScheduler
+
+
+def _engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(
+            [
+                Ingredient(ingredient_id=1, name="soy", stock_on_hand=1.0),
+                Ingredient(ingredient_id=2, name="kelp", stock_on_hand=2.0),
+                StockBatch(batch_id=1, species_id=1, expected_yield_kg=10.0),
+                StockBatch(batch_id=2, species_id=1, expected_yield_kg=20.0),
+            ]
+        )
+        session.commit()
+    return engine
+
+
+class _Server:
+    """Stock feed with ETags and a forecast feed with cursors."""
+
+    def __init__(self):
+        self.requests = []
+        self.fail_stocks = False
+        self.active = self.peak = 0
+
+    async def __call__(self, request):
+        self.requests.append(request)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.1)
+        self.active -= 1
+        if request.url.path == "/stocks":
+            if self.fail_stocks:
+                return httpx.Response(500)
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            body = [
+                {"ingredient_id": 1, "stock_on_hand": 5.0},
+                {"ingredient_id": 2, "stock_on_hand": 2.0},
+            ]
+            return httpx.Response(200, json=body, headers={"ETag": '"v1"'})
+        cursor = request.url.params.get("cursor")
+        body = []
+        if cursor is None:
+            body = [
+                {
+                    "batch_id": 1,
+                    "expected_yield_kg": 12.0,
+                    "expected_harvest_date": "2024-06-01",
+                },
+                {"batch_id": 2, "expected_yield_kg": 20.0},
+            ]
+        return httpx.Response(
+            200, content=json.dumps(body), headers={"X-Next-Cursor": f"{cursor}+"}
+        )
+
+
+def test_sources_sync_concurrently_and_incrementally():
+    engine = _engine()
+    server = _Server()
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(server))
+        syncer = SyncScheduler(
+            {"stocks": "http://feed/stocks", "forecasts": "http://feed/forecasts"},
+            lambda: Session(engine),
+            client=client,
+        )
+        first = await syncer.sync_once()
+        second = await syncer.sync_once()
+        server.fail_stocks = True
+        third = await syncer.sync_once()
+        await client.aclose()
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert server.peak == 2  # both sources are pulled at the same time
+    assert first["stocks"]["last_counts"] == {
+        "received": 2,
+        "updated": 1,
+        "unchanged": 1,
+        "unknown": 0,
+    }
+    assert first["forecasts"]["last_counts"]["updated"] == 1
+    assert first["forecasts"]["last_counts"]["unchanged"] == 1
+    assert first["stocks"]["last_duration_s"] >= 0.1
+
+    # The second round sends the ETag and the cursor back.
+    second_round = {r.url.path: r for r in server.requests[2:4]}
+    stocks, forecasts = second_round["/stocks"], second_round["/forecasts"]
+    assert stocks.headers["If-None-Match"] == '"v1"'
+    assert forecasts.url.params["cursor"] == "None+"
+    assert second["stocks"]["not_modified"] == 1
+    assert second["stocks"]["last_counts"] == {}
+    assert second["forecasts"]["last_counts"]["received"] == 0
+    assert second["forecasts"]["cursor"] == "None++"
+
+    assert third["stocks"]["errors"] == 1 and "500" in third["stocks"]["last_error"]
+    assert third["forecasts"]["errors"] == 0
+
+    with Session(engine) as session:
+        assert session.get(Ingredient, 1).stock_on_hand == 5.0
+        batch = session.get(StockBatch, 1)
+        assert batch.expected_yield_kg == 12.0
+        assert batch.expected_harvest_date == date(2024, 6, 1)
+        logs = session.exec(select(AdjustmentLog)).all()
+        changes = {(log.field_name, log.previous_value, log.new_value) for log in logs}
+        assert changes == {
+            ("expected_yield_kg", "10.0", "12.0"),
+            ("expected_harvest_date", "None", "2024-06-01"),
+        }
+        assert len(session.exec(select(YieldForecast)).all()) == 1
+
+
+def test_sync_stats_endpoint():
+    assert TestClient(app).get("/sync").status_code == 200
+
+
+def test_overlapping_rounds_do_not_pull_a_source_twice():
+    engine = _engine()
+    server = _Server()
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(server))
+        syncer = SyncScheduler(
+            {"forecasts": "http://feed/forecasts"},
+            lambda: Session(engine),
+            client=client,
+        )
+        rounds = await asyncio.gather(syncer.sync_once(), syncer.sync_once())
+        await client.aclose()
+        return rounds
+
+    first, second = asyncio.run(run())
+    assert len(server.requests) == 1
+    assert second["forecasts"]["skipped"] == 1
+    assert first["forecasts"]["runs"] == 1 and first["forecasts"]["cursor"] == "None+"
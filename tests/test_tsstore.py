@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.models import TimeSeriesChunk, WaterReading
+from app.tsstore import (
+    TimeSeriesStore,
+    decode_timestamps,
+    decode_values,
+    encode_timestamps,
+    encode_values,
+)
+
+T0 = datetime(2024, 3, 1)
+
+
+def _series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = [T0 + timedelta(seconds=10 * i) for i in range(n)]
+    values = np.round(7.0 + np.cumsum(rng.normal(0, 0.01, n)), 3)
+    return timestamps, values
+
+
+def test_encodings_round_trip():
+    micros = np.array([0, 1_000, 2_000, 3_500, 3_500, 9_000_000], dtype=np.int64)
+    assert np.array_equal(decode_timestamps(encode_timestamps(micros), 0), micros)
+
+    values = np.array([7.0, 7.01, 6.99, 1e300, -0.0, 7.0])
+    encoding, blob = encode_values(values)
+    assert encoding == "xor"
+    assert np.array_equal(decode_values(blob, encoding), values)
+
+    encoding, blob = encode_values(values[:3], precision=0.001)
+    assert decode_values(blob, encoding) == pytest.approx(values[:3], abs=5e-4)
+
+
+def _chunk_counts(store, stream):
+    with Session(store.engine) as session:
+        query = (
+            select(TimeSeriesChunk.count)
+            .where(TimeSeriesChunk.stream == stream)
+            .order_by(TimeSeriesChunk.start_us, TimeSeriesChunk.chunk_id)
+        )
+        return session.exec(query).all()
+
+
+def test_range_scan_and_bounds():
+    store = TimeSeriesStore(create_engine("sqlite://"), chunk_size=100)
+    SQLModel.metadata.create_all(store.engine)
+    timestamps, values = _series(250)
+    store.append("pH", timestamps[:120], values[:120])
+    store.append("pH", timestamps[120:], values[120:])
+    assert _chunk_counts(store, "pH") == [100, 100, 50]
+
+    ts, vals = store.range("pH")
+    assert ts.dtype == np.dtype("datetime64[us]")
+    assert np.array_equal(vals, values)
+
+    ts, vals = store.range("pH", start=timestamps[95], end=timestamps[205])
+    assert len(ts) == 111
+    assert ts[0].astype(datetime) == timestamps[95]
+    assert np.array_equal(vals, values[95:206])
+
+    with pytest.raises(ValueError, match="non-decreasing"):
+        store.append("pH", [T0], [7.0])
+
+
+def test_appends_are_durable_and_compacted(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ts.db'}")
+    SQLModel.metadata.create_all(engine)
+    timestamps, values = _series(25)
+    store = TimeSeriesStore(engine, chunk_size=10, precisions={"DO": 0.001})
+    for i in range(23):
+        store.append("DO", timestamps[i : i + 1], values[i : i + 1])
+    assert _chunk_counts(store, "DO") == [10, 10, 3]
+
+    # A new process sees every acknowledged sample and the stored order.
+    restarted = TimeSeriesStore(create_engine(f"sqlite:///{tmp_path / 'ts.db'}"))
+    assert np.allclose(restarted.range("DO")[1], values[:23])
+    with pytest.raises(ValueError, match="non-decreasing"):
+        restarted.append("DO", [timestamps[5]], [1.0])
+    restarted.append("DO", timestamps[23:], values[23:])
+    assert np.allclose(store.range("DO")[1], values)
+
+
+def test_compression_beats_row_storage(tmp_path):
+    timestamps, values = _series(5_000)
+
+    rows_engine = create_engine(f"sqlite:///{tmp_path / 'rows.db'}")
+    SQLModel.metadata.create_all(rows_engine)
+    with Session(rows_engine) as session:
+        session.add_all(
+            WaterReading(parameter="pH", value=float(v), timestamp=t, location="tank1")
+            for t, v in zip(timestamps, values)
+        )
+        session.commit()
+
+    store = TimeSeriesStore(
+        create_engine(f"sqlite:///{tmp_path / 'chunks.db'}"),
+        precisions={"pH@tank1": 0.001},
+    )
+    SQLModel.metadata.create_all(store.engine)
+    store.append("pH@tank1", timestamps, values)
+
+    def db_bytes(engine):
+        with engine.connect() as conn:
+            pages = conn.execute(text("PRAGMA page_count")).scalar()
+            free = conn.execute(text("PRAGMA freelist_count")).scalar()
+            size = conn.execute(text("PRAGMA page_size")).scalar()
+        return (pages - free) * size
+
+    rows_size = db_bytes(rows_engine) - db_bytes(create_engine("sqlite://"))
+    assert store.size() * 10 < rows_size
+    assert np.allclose(store.range("pH@tank1")[1], values)
+
+
+def test_stream_endpoints(monkeypatch):
+    from app.main import app
+
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    store = TimeSeriesStore(engine, chunk_size=2)
+    SQLModel.metadata.create_all(store.engine)
+    monkeypatch.setattr("app.main.stream_store", store)
+    client = TestClient(app)
+    payload = {
+        "timestamps": [(T0 + timedelta(seconds=i)).isoformat() for i in range(3)],
+        "values": [1.0, 2.0, 3.0],
+    }
+    assert client.post("/streams/flow", json=payload).json()["appended"] == 3
+    data = client.get("/streams/flow", params={"start": T0.isoformat()}).json()
+    assert data["values"] == [1.0, 2.0, 3.0]
+    assert client.post("/streams/flow", json=payload).status_code == 422
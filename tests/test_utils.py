@@ -9,11 +9,11 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 # Stub out modules with syntax errors so app.utils can be imported.
 database_stub = types.ModuleType("app.database")
-database_stub.get_menu_inputs = lambda *args, **kwargs: ([], {})
-database_stub.get_feed_inputs = lambda *args, **kwargs: ([], {})
+database_stub.get_seasonal_yields = lambda *args, **kwargs: {}
 optimization_stub = types.ModuleType("app.optimization")
 optimization_stub.optimize_menu = lambda *args, **kwargs: {}
 optimization_stub.optimize_feed = lambda *args, **kwargs: {}
+optimization_stub.optimize_household = lambda *args, **kwargs: {}
 
 sys.modules.setdefault("app.database", database_stub)
 sys.modules.setdefault("app.optimization", optimization_stub)
@@ -34,26 +34,26 @@ def test_tan_load_check_invalid_capacity(biofilter_cap_g):
 
 
 def test_run_optimizations_aggregates_results(monkeypatch):
-    def fake_get_menu_inputs(session, persona):
-        assert session == "dummy_session"
-        assert persona == "p1"
-        return (1, 2)
+    class FakeCatalogs:
+        def menu_inputs(self, session, persona):
+            assert session == "dummy_session"
+            assert persona == "p1"
+            return (1, 2)
+
+        def feed_inputs(self, session):
+            assert session == "dummy_session"
+            return (3, 4)
 
     def fake_optimize_menu(a, b):
         assert (a, b) == (1, 2)
         return {"menu_result": 42}
 
-    def fake_get_feed_inputs(session):
-        assert session == "dummy_session"
-        return (3, 4)
-
     def fake_optimize_feed(a, b):
         assert (a, b) == (3, 4)
         return {"feed_result": 24}
 
-    monkeypatch.setattr("app.utils.get_menu_inputs", fake_get_menu_inputs)
+    monkeypatch.setattr("app.utils.catalogs", FakeCatalogs())
     monkeypatch.setattr("app.utils.optimize_menu", fake_optimize_menu)
-    monkeypatch.setattr("app.utils.get_feed_inputs", fake_get_feed_inputs)
     monkeypatch.setattr("app.utils.optimize_feed", fake_optimize_feed)
 
     result = run_optimizations("dummy_session", "p1")